@@ -7,13 +7,6 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.config import PAGE_TITLE, PAGE_ICON, LAYOUT, STATUS_FILE
-from src.database import get_database
-from src.ui.dashboard import (
-    render_structure_filters,
-    render_macro_filters,
-    render_macro_view,
-    render_market_intelligence_view
-)
 from src.ui.footer import render_footer
 from src.ui.styles import get_custom_css
 # Technical components removed for clean UI
@@ -31,12 +24,16 @@ def main():
     # Inject Custom CSS
     st.markdown(get_custom_css(), unsafe_allow_html=True)
 
-    try:
-        db = get_database()
-    except Exception as e:
-        st.error(f"Database Initialization Error: {e}")
-        st.stop()
-        
+    # Heavy modules (altair, views, google-cloud) are imported by the page that runs,
+    # after the sidebar is drawn; the database object is shared by the whole process
+    def get_db():
+        from src.database import get_database
+        try:
+            return get_database()
+        except Exception as e:
+            st.error(f"Database Initialization Error: {e}")
+            st.stop()
+
     # --- PAGE DEFINITIONS ---
     def page_structure():
         st.title("Estrutura de Mercado")
@@ -46,6 +43,8 @@ def main():
         *Foco: Market Share (Capital), Especialização Regional e Solidez.*
         """)
         st.markdown("---")
+        from src.ui.market import render_structure_filters, render_market_intelligence_view
+        db = get_db()
         filters = render_structure_filters(db)
         render_market_intelligence_view(db, filters)
 
@@ -57,8 +56,10 @@ def main():
         *Foco: Sazonalidade, Tendência e Ciclos Econômicos.*
         """)
         st.markdown("---")
+        from src.ui.dashboard import render_macro_filters, render_macro_view
+        db = get_db()
         filters = render_macro_filters(db)
-        render_macro_view(filters)
+        render_macro_view(filters, db)
 
 
 
@@ -101,6 +102,13 @@ def main():
     
     pg.run()
 
+    # Private bytes of this session (for the process memory report); ?debug=memory shows it
+    from src import memory
+    memory.record_session(st.session_state)
+    if st.query_params.get("debug") == "memory":
+        with st.sidebar.expander("Memória do processo", expanded=False):
+            st.json(memory.memory_report())
+
     # --- SIDEBAR FOOTER (Fixed at Bottom via Layout Order) ---
     with st.sidebar:
 
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import logging
+import datetime
+from src.config import BQ_DATASET, DATA_DIR, GCS_STAGING_URI, INGESTION_WORK_DIR
+from src.ingestion import discover_sources
+from src.ingestion.pipeline import run_pipeline
+from src.ingestion.manifest import ensure_manifest, read_manifest, record_entries, parse_release, MANIFEST_SCHEMA
+from src.ingestion.sources import source_name
+from src.ingestion.cdc import snapshot_table, ensure_cdc_tables, build_delta, apply_delta
+from scripts.ingest_data_bq import get_bq_client, get_storage_client, create_dataset_if_not_exists
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CDC_TABLES = ["empresas", "estabelecimentos"]
+
+def release_date_of(files):
+    """Date of the release stamped in the file names (today if absent)."""
+    dates = [d for _, d in (parse_release(source_name(f)) for f in files) if d]
+    return max(dates) if dates else datetime.date.today()
+
+def promote_manifest(client, table):
+    """
+    Copies the snapshot's manifest entries to the serving table, so the regular
+    ingestion sees its shards as current and does not reload them.
+    """
+    manifest = read_manifest(client, BQ_DATASET)
+    loaded = manifest[manifest["table_name"] == snapshot_table(table)].copy()
+    if loaded.empty:
+        return
+    loaded["table_name"] = table
+    columns = [f.name for f in MANIFEST_SCHEMA if f.name != "loaded_at"]
+    record_entries(client, BQ_DATASET, loaded[columns].to_dict("records"))
+
+def refresh_with_cdc(tables=CDC_TABLES):
+    """
+    Loads the current release into the snapshot tables (resumable through the
+    manifest), diffs it against the previous hashes and applies only the delta.
+    """
+    client = get_bq_client()
+    create_dataset_if_not_exists(client)
+    storage_client = get_storage_client() if GCS_STAGING_URI else None
+    ensure_manifest(client, BQ_DATASET)
+    manifest = read_manifest(client, BQ_DATASET)
+    sources = discover_sources(DATA_DIR)
+
+    os.makedirs(INGESTION_WORK_DIR, exist_ok=True)
+    work_dir = str(INGESTION_WORK_DIR)
+    for table in tables:
+        files = sources.get(table, [])
+        if not files:
+            logger.warning(f"{table}: no files, skipping.")
+            continue
+        snapshot_date = release_date_of(files)
+        logger.info(f"{table}: release {snapshot_date}, {len(files)} files")
+
+        t0 = time.time()
+        run_pipeline(client, BQ_DATASET, table, files, work_dir, manifest=manifest,
+                     staging_uri=GCS_STAGING_URI, storage_client=storage_client,
+                     target=snapshot_table(table))
+        ensure_cdc_tables(client, BQ_DATASET, table)
+        counts = build_delta(client, BQ_DATASET, table, snapshot_date)
+        logger.info(f"{table}: delta {counts or 'empty'}")
+        if counts:
+            apply_delta(client, BQ_DATASET, table, snapshot_date)
+        promote_manifest(client, table)
+        logger.info(f"{table}: done in {time.time() - t0:.1f}s")
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.apply_cdc [empresas] [estabelecimentos]
+    selected = sys.argv[1:] or CDC_TABLES
+    unknown = [t for t in selected if t not in CDC_TABLES]
+    if unknown:
+        logger.error(f"Tables without CDC keys: {unknown}. Options: {CDC_TABLES}")
+        exit(1)
+    refresh_with_cdc(selected)
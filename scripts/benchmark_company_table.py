@@ -0,0 +1,183 @@
+"""
+Benchmark of the company-listing display columns (src/ui/tables.py).
+
+Builds a synthetic listing shaped like get_filtered_companies (seeded: nulls, missing
+contacts, ~300 distinct CNAEs), formats it with the previous row-wise path and with
+format_company_table and reports rows/s for both. The display columns are compared
+on a listing without nulls: with nulls the outputs differ on purpose (the row-wise
+path printed 'nan' for missing address and contact parts).
+
+Usage: python -m scripts.benchmark_company_table [rows ...] [--seed N]
+"""
+import sys
+import time
+import logging
+import numpy as np
+import pandas as pd
+from src.utils import get_status_description, format_cnae
+from src.classification import get_industrial_typology
+from src.ui.tables import format_company_table
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DISPLAY_COLUMNS = ["cnpj_real", "tipo_label", "Status", "Data Abertura", "Porte", "Capital (R$)", "Cidade/UF",
+                   "Subclasse", "Tipo Indústria", "Posição Cadeia", "Endereço", "Contato"]
+
+def synthetic_listing(rows: int, seed: int = 42, nulls: bool = True) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    def pick(values, null_share=0.0):
+        out = np.array(values, dtype=object)[rng.integers(0, len(values), rows)]
+        if nulls and null_share:
+            out[rng.random(rows) < null_share] = None
+        return out
+
+    cnaes = [f"{d:02d}{rng.integers(10000, 99999)}" for d in range(5, 34) for _ in range(10)]
+    return pd.DataFrame({
+        "cnpj_basico": [f"{i:08d}" for i in rng.integers(0, 10 ** 8, rows)],
+        "razao_social": [f"EMPRESA SINTETICA {i}" for i in range(rows)],
+        "porte_empresa": pick(["00", "01", "03", "05"], 0.05),
+        "capital_social": np.round(rng.lognormal(11, 2.5, rows), 2),
+        "natureza_juridica": pick(["2062", "2135", "2305"]),
+        "natureza_desc": pick(["Sociedade Empresária Limitada", "Empresário (Individual)"]),
+        "cnae_fiscal_principal": pick(cnaes),
+        "cnae_desc": pick(["Fabricação de produtos", "Extração de minerais"]),
+        "uf": pick(["SP", "MG", "RS", "PR", "SC"]),
+        "municipio_codigo": pick(["7107", "4123"]),
+        "municipio_nome": pick(["Sao Paulo", "Belo Horizonte", "Curitiba"]),
+        "situacao_cadastral": pick(["02", "04", "08"]),
+        "data_inicio_atividade": pick(["20100115", "19991231", "20230301"]),
+        "cnpj_ordem": pick(["0001", "0002"]),
+        "cnpj_dv": pick(["11", "42"]),
+        "identificador_matriz_filial": pick(["1", "2"]),
+        "tipo_logradouro": pick(["RUA", "AVENIDA"], 0.1),
+        "logradouro": pick(["DAS INDUSTRIAS", "BRASIL", "SETE"]),
+        "numero": pick(["100", "S/N", "2500"], 0.1),
+        "complemento": pick(["GALPAO 2", "SALA 3"], 0.7),
+        "bairro": pick(["CENTRO", "DISTRITO INDUSTRIAL"], 0.1),
+        "cep": pick(["01001000", "30110000"], 0.05),
+        "ddd_1": pick(["11", "31"], 0.3),
+        "telefone_1": pick(["33334444", "40028922"], 0.3),
+        "correio_eletronico": pick(["CONTATO@EMPRESA.COM.BR", "Vendas@Fabrica.com"], 0.4),
+    })
+
+def format_rowwise(df_companies: pd.DataFrame) -> pd.DataFrame:
+    """Previous display path: DataFrame.apply per row (kept as the reference)."""
+    df_disp = df_companies.copy()
+
+    # Format CNPJ
+    if 'cnpj_ordem' in df_disp.columns and 'cnpj_dv' in df_disp.columns:
+         df_disp['cnpj_basico'] = df_disp['cnpj_basico'].astype(str).str.zfill(8)
+         df_disp['cnpj_ordem'] = df_disp['cnpj_ordem'].astype(str).str.zfill(4)
+         df_disp['cnpj_dv'] = df_disp['cnpj_dv'].astype(str).str.zfill(2)
+         df_disp['cnpj_real'] = df_disp['cnpj_basico'].str[:2] + "." + df_disp['cnpj_basico'].str[2:5] + "." + df_disp['cnpj_basico'].str[5:] + "/" + df_disp['cnpj_ordem'] + "-" + df_disp['cnpj_dv']
+    else:
+         df_disp['cnpj_real'] = df_disp['cnpj_basico']
+
+    # Enrich Porte
+    porte_map = {'00': 'N/D', '01': 'Micro', '03': 'Pequeno', '05': 'Médio/Gd'}
+    if 'porte_empresa' in df_disp.columns:
+        df_disp['Porte'] = df_disp['porte_empresa'].fillna('00').apply(lambda x: porte_map.get(str(x), str(x)))
+    else: df_disp['Porte'] = '-'
+
+    # Enrich Status
+    if 'situacao_cadastral' in df_disp.columns:
+        df_disp['Status'] = df_disp['situacao_cadastral'].apply(get_status_description)
+    else: df_disp['Status'] = '-'
+
+    # Enrich Type
+    if 'identificador_matriz_filial' in df_disp.columns:
+        df_disp['tipo_label'] = df_disp['identificador_matriz_filial'].map({'1': 'MATRIZ', '2': 'FILIAL'}).fillna('?')
+    else: df_disp['tipo_label'] = '-'
+
+    # Capital Format
+    df_disp['Capital (R$)'] = df_disp['capital_social'].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+
+    # Descriptions (Safe Get)
+    if 'cnae_desc' not in df_disp.columns: df_disp['cnae_desc'] = df_disp.get('cnae_fiscal_principal', '-')
+    if 'natureza_desc' not in df_disp.columns: df_disp['natureza_desc'] = df_disp.get('natureza_juridica', '-')
+
+    # Format Date
+    if 'data_inicio_atividade' in df_disp.columns:
+        df_disp['Data Abertura'] = pd.to_datetime(df_disp['data_inicio_atividade'], errors='coerce').dt.strftime('%d/%m/%Y')
+    else: df_disp['Data Abertura'] = '-'
+
+    # Format Address
+    def get_address(row):
+        parts = [row.get('tipo_logradouro', ''), row.get('logradouro', ''), row.get('numero', '')]
+        addr = " ".join([str(p) for p in parts if p]).strip()
+        if row.get('complemento'): addr += f" ({row['complemento']})"
+        if row.get('bairro'): addr += f" - {row['bairro']}"
+        if row.get('cep'): addr += f", CEP {row['cep']}"
+        return addr.strip() or '-'
+
+    df_disp['Endereço'] = df_disp.apply(get_address, axis=1)
+    df_disp['Cidade/UF'] = df_disp['municipio_nome'] + "/" + df_disp['uf']
+
+    # Format Contact
+    def get_contact(row):
+        contacts = []
+        if row.get('correio_eletronico'): contacts.append(str(row['correio_eletronico']).lower())
+        if row.get('telefone_1'):
+            ddd = str(row.get('ddd_1', '')).strip()
+            tel = str(row.get('telefone_1', '')).strip()
+            if tel: contacts.append(f"({ddd}) {tel}")
+        return " | ".join(contacts) or '-'
+
+    df_disp['Contato'] = df_disp.apply(get_contact, axis=1)
+
+    # Format Subclass (Code + Description)
+    if 'cnae_fiscal_principal' in df_disp.columns:
+        df_disp['Subclasse'] = df_disp.apply(
+            lambda x: f"{format_cnae(x.get('cnae_fiscal_principal', ''))} - {x.get('cnae_desc', '')}",
+            axis=1
+        )
+
+        # Enrich Typology (Level 1 Analysis)
+        # Apply classification to each row based on CNAE
+        typ_series = df_disp['cnae_fiscal_principal'].fillna('').apply(get_industrial_typology)
+        df_disp['Tipo Indústria'] = typ_series.apply(lambda x: x['tipo_industria'])
+        df_disp['Posição Cadeia'] = typ_series.apply(lambda x: x['cadeia_valor'])
+
+    else:
+         df_disp['Subclasse'] = df_disp.get('cnae_desc', '-')
+         df_disp['Tipo Indústria'] = '-'
+         df_disp['Posição Cadeia'] = '-'
+    return df_disp
+
+def benchmark(rows: int, seed: int = 42):
+    df = synthetic_listing(rows, seed)
+    timings = {}
+    outputs = {}
+    for name, fn in (("rowwise", format_rowwise), ("vectorized", format_company_table)):
+        t0 = time.perf_counter()
+        outputs[name] = fn(df)
+        timings[name] = time.perf_counter() - t0
+        logger.info(f"{rows:>9,} rows  {name:<10} {timings[name]:8.3f}s  {rows / timings[name]:>12,.0f} rows/s")
+    logger.info(f"{rows:>9,} rows  speedup {timings['rowwise'] / timings['vectorized']:.1f}x")
+    return timings
+
+def check_equivalence(rows: int = 5_000, seed: int = 42) -> list:
+    """Display columns where the two paths disagree on a listing without nulls."""
+    df = synthetic_listing(rows, seed, nulls=False)
+    before, after = format_rowwise(df), format_company_table(df)
+    return [c for c in DISPLAY_COLUMNS if not before[c].astype(str).equals(after[c].astype(str))]
+
+if __name__ == "__main__":
+    args, opts = [], {}
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg.startswith("--"):
+            opts[arg] = next(argv, None)
+        else:
+            args.append(arg)
+    seed = int(opts.get("--seed", 42))
+    mismatched = check_equivalence(seed=seed)
+    if mismatched:
+        logger.warning(f"Display columns that differ: {mismatched}")
+    else:
+        logger.info("Display columns match the row-wise path")
+    for rows in [int(a) for a in args] or [1_000, 10_000, 100_000]:
+        benchmark(rows, seed=seed)
@@ -0,0 +1,151 @@
+"""
+Scale benchmark of every ingestion path and the local backend on synthetic RFB data.
+
+Generates a seeded dataset (scripts/generate_synthetic_rfb.py) unless --data points
+to an existing one, then runs each path in a fresh process and reports rows/s, MB/s
+and peak RSS (the largest single process, pool workers included):
+
+    pandas     previous chunked pandas reader (scripts/benchmark_reader.py)
+    arrow      Arrow block reader, streamed (src/ingestion/reader.py)
+    parquet    parse + clean + write stages of the BigQuery pipeline, all cores
+    sqlite     bulk SQLite build (scripts/legacy_sqlite/ingest_data.py)
+    queries    SQLiteDatabase queries against the built database
+
+Results are also appended to the ingestion metrics log as 'benchmark' events.
+
+Usage: python -m scripts.benchmark_ingestion [rows] [--seed N] [--data DIR] [--paths pandas,arrow,...]
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from src.ingestion import discover_sources, open_source, iter_tables
+from src.ingestion.telemetry import emit
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PATHS = ["pandas", "arrow", "parquet", "sqlite", "queries"]
+MAIN_TABLES = ["empresas", "estabelecimentos"]
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux; children = pool workers already joined
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+def _input_bytes(sources: dict) -> int:
+    return sum(os.path.getsize(s) for t in MAIN_TABLES for s in sources.get(t, []))
+
+def run_path(name: str, data_dir: str, work_dir: str) -> dict:
+    """Runs one path in the current (fresh) process; returns rows, seconds and peak RSS."""
+    logging.disable(logging.WARNING)  # malformed-row warnings are expected here
+    sources = discover_sources(data_dir)
+    t0 = time.perf_counter()
+    rows = 0
+
+    if name == "pandas":
+        from scripts.benchmark_reader import read_with_pandas
+        rows = sum(read_with_pandas(src, t) for t in MAIN_TABLES for src in sources.get(t, []))
+    elif name == "arrow":
+        for table in MAIN_TABLES:
+            for src in sources.get(table, []):
+                with open_source(src) as stream:
+                    rows += sum(block.num_rows for block in iter_tables(stream, table))
+    elif name == "parquet":
+        from src.ingestion.pipeline import parse_files
+        for table in MAIN_TABLES:
+            _, n = parse_files(table, sources.get(table, []), os.path.join(work_dir, "parts", table))
+            rows += n
+    elif name == "sqlite":
+        from scripts.legacy_sqlite.ingest_data import build_database
+        build_database(data_dir, db_file=os.path.join(work_dir, "bench.db"),
+                       status_file=os.path.join(work_dir, "status.json"))
+        import sqlite3
+        conn = sqlite3.connect(os.path.join(work_dir, "bench.db"))
+        rows = sum(conn.execute(f"SELECT count(*) FROM {t}").fetchone()[0] for t in MAIN_TABLES)
+        conn.close()
+    elif name == "queries":
+        from src.database import SQLiteDatabase
+        db = SQLiteDatabase()
+        db.db_path = Path(work_dir) / "bench.db"
+        if not db.db_path.exists():
+            return {"error": "run the sqlite path first"}
+        timings = {}
+        for label, call in (
+            ("count", lambda: db.get_total_companies()),
+            ("search_name", lambda: db.search_companies("SINTETICA 10", "name")),
+            ("search_cnpj", lambda: db.search_companies("01000", "cnpj")),
+            ("stats_natureza", lambda: db.get_stats_natureza_juridica()),
+            ("stats_capital", lambda: db.get_stats_capital_social()),
+        ):
+            q0 = time.perf_counter()
+            call()
+            timings[label] = round(time.perf_counter() - q0, 3)
+        rows = db.get_total_companies()
+        return {"rows": rows, "seconds": sum(timings.values()), "peak_rss_mb": _peak_rss_mb(), "queries": timings}
+
+    return {"rows": rows, "seconds": time.perf_counter() - t0, "peak_rss_mb": _peak_rss_mb()}
+
+def benchmark(data_dir: str, paths=PATHS) -> dict:
+    work_dir = tempfile.mkdtemp(prefix="rfb_bench_")
+    size_mb = _input_bytes(discover_sources(data_dir)) / 1024 ** 2
+    results = {}
+    try:
+        for name in paths:
+            # Fresh interpreter per path: peak RSS is not inherited from earlier paths
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = pool.submit(run_path, name, data_dir, work_dir).result()
+            results[name] = result
+            if "error" in result:
+                logger.warning(f"{name}: {result['error']}")
+                continue
+            seconds = result["seconds"]
+            rate = result["rows"] / seconds if seconds > 0 else 0.0
+            line = (f"{name:<8} {result['rows']:>12,} rows  {seconds:8.2f}s  {rate:>12,.0f} rows/s  "
+                    f"{size_mb / seconds if seconds > 0 else 0:7.1f} MB/s  peak {result['peak_rss_mb']:,.0f} MB")
+            if "queries" in result:
+                line = f"{name:<8} " + "  ".join(f"{q} {s:.3f}s" for q, s in result["queries"].items()) + \
+                       f"  peak {result['peak_rss_mb']:,.0f} MB"
+            logger.info(line)
+            emit("benchmark", run=name, rows=result["rows"], seconds=round(seconds, 3),
+                 rows_s=round(rate), peak_rss_mb=round(result["peak_rss_mb"]), input_mb=round(size_mb, 1))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+if __name__ == "__main__":
+    args, opts = [], {}
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg.startswith("--"):
+            opts[arg] = next(argv, None)
+        else:
+            args.append(arg)
+    paths = opts.get("--paths", ",".join(PATHS)).split(",")
+    unknown = [p for p in paths if p not in PATHS]
+    if unknown:
+        print(f"Unknown paths: {unknown}. Options: {PATHS}")
+        exit(1)
+
+    data_dir = opts.get("--data")
+    generated = None
+    if not data_dir:
+        from scripts.generate_synthetic_rfb import generate
+        rows = int(args[0]) if args else 100_000
+        generated = data_dir = tempfile.mkdtemp(prefix="rfb_synthetic_")
+        t0 = time.time()
+        totals = generate(data_dir, rows, seed=int(opts.get("--seed", 42)))
+        logger.info(f"Synthetic dataset: {totals} in {time.time() - t0:.1f}s")
+    try:
+        benchmark(data_dir, paths)
+    finally:
+        if generated:
+            shutil.rmtree(generated, ignore_errors=True)
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import logging
+import pandas as pd
+from src.ingestion import read_file, column_names, table_for_file, expand_sources, open_source
+from src.ingestion.sources import source_name, split_source
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ENCODING = 'latin-1'
+PANDAS_CHUNK = 50000
+
+def read_with_pandas(path, table):
+    """Previous ingestion path: pandas chunks + string replacement for capital_social."""
+    rows = 0
+    with open_source(path) as stream:
+        for chunk in pd.read_csv(stream, sep=';', encoding=ENCODING, header=None, names=column_names(table),
+                                 dtype=str, chunksize=PANDAS_CHUNK, on_bad_lines='skip'):
+            if 'capital_social' in chunk.columns:
+                chunk['capital_social'] = chunk['capital_social'].astype(str).str.replace(',', '.', regex=False)
+                chunk['capital_social'] = pd.to_numeric(chunk['capital_social'], errors='coerce').fillna(0.0)
+            rows += len(chunk)
+    return rows
+
+def read_with_arrow(path, table):
+    return read_file(path, table).num_rows
+
+def benchmark(path):
+    table = table_for_file(source_name(path))
+    if not table:
+        logger.error(f"Unrecognized RFB file: {path}")
+        return
+    # Compressed size for zip members (what is actually read from disk)
+    size_mb = os.path.getsize(split_source(path)[0]) / 1024 ** 2
+    logger.info(f"{source_name(path)} ({table}, {size_mb:,.0f} MB)")
+
+    results = {}
+    for name, reader in (("pandas", read_with_pandas), ("arrow", read_with_arrow)):
+        t0 = time.perf_counter()
+        try:
+            rows = reader(path, table)
+        except Exception as e:
+            logger.error(f"  {name}: failed ({e})")
+            continue
+        elapsed = time.perf_counter() - t0
+        results[name] = rows
+        logger.info(f"  {name:<7} {rows:>12,} rows  {elapsed:7.1f}s  {rows / elapsed:>12,.0f} rows/s  {size_mb / elapsed:7.1f} MB/s")
+
+    if len(results) == 2 and results["pandas"] != results["arrow"]:
+        logger.info(f"  row difference (arrow - pandas): {results['arrow'] - results['pandas']:+,}")
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.benchmark_reader <rfb file or zip> [...]
+    if len(sys.argv) < 2:
+        print("Usage: python -m scripts.benchmark_reader <arquivo RFB ou .zip> [...]")
+        exit(1)
+    for sources in expand_sources(sys.argv[1:]).values():
+        for source in sources:
+            benchmark(source)
@@ -0,0 +1,24 @@
+import sys
+import logging
+import pandas as pd
+from src.cnae import CSV_PATH, ARTIFACT_PATH, LEVELS, build_artifact, save_artifact
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def load_source(from_api: bool) -> pd.DataFrame:
+    """Hierarchy rows from the curated CSV (process_cnae.py) or the IBGE API."""
+    if from_api:
+        from scripts.refresh_cnae_dimension import fetch_cnae_data, process_cnae_data
+        return process_cnae_data(fetch_cnae_data())
+    logger.info(f"Reading {CSV_PATH}...")
+    return pd.read_csv(CSV_PATH, dtype=str)
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.build_cnae_artifact [--api]
+    df = load_source("--api" in sys.argv)
+    arrays = build_artifact(df)
+    save_artifact(arrays, ARTIFACT_PATH)
+    sizes = ", ".join(f"{level}={len(arrays[f'{level}_code'])}" for level in LEVELS)
+    logger.info(f"Saved {ARTIFACT_PATH} ({sizes})")
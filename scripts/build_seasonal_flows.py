@@ -0,0 +1,108 @@
+import time
+import logging
+import datetime
+import pandas as pd
+from google.cloud import bigquery
+from src import clients
+from src.config import BQ_DATASET
+from src.seasonal import decompose_flows
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = "fluxos_sazonais"
+START_MONTH = "200001"
+KEY_COLS = ['sector_code', 'uf', 'porte', 'kind']
+
+# Openings (all statuses and still active) and closings (situacao 08) per industrial division x UF x porte
+OPENINGS_SQL = """
+    SELECT
+        SUBSTR(st.data_inicio_atividade, 1, 6) as month_year,
+        SUBSTR(st.cnae_fiscal_principal, 1, 2) as sector_code,
+        st.uf,
+        e.porte_empresa as porte,
+        count(*) as abertura,
+        COUNTIF(st.situacao_cadastral = '02') as abertura_ativa
+    FROM `{dataset}.empresas` e
+    JOIN `{dataset}.estabelecimentos` st
+        ON e.cnpj_basico = st.cnpj_basico
+    WHERE CAST(SUBSTR(st.cnae_fiscal_principal, 1, 2) AS INT64) BETWEEN 5 AND 33
+      AND st.uf != 'EX'
+      AND SUBSTR(st.data_inicio_atividade, 1, 6) >= @start_month
+    GROUP BY month_year, sector_code, st.uf, porte
+"""
+
+CLOSINGS_SQL = """
+    SELECT
+        SUBSTR(st.data_situacao_cadastral, 1, 6) as month_year,
+        SUBSTR(st.cnae_fiscal_principal, 1, 2) as sector_code,
+        st.uf,
+        e.porte_empresa as porte,
+        'baixa' as kind,
+        count(*) as count
+    FROM `{dataset}.empresas` e
+    JOIN `{dataset}.estabelecimentos` st
+        ON e.cnpj_basico = st.cnpj_basico
+    WHERE CAST(SUBSTR(st.cnae_fiscal_principal, 1, 2) AS INT64) BETWEEN 5 AND 33
+      AND st.uf != 'EX'
+      AND st.situacao_cadastral = '08'
+      AND SUBSTR(st.data_situacao_cadastral, 1, 6) >= @start_month
+    GROUP BY month_year, sector_code, st.uf, porte
+"""
+
+SCHEMA = [
+    bigquery.SchemaField("month_year", "STRING"),
+    bigquery.SchemaField("sector_code", "STRING"),
+    bigquery.SchemaField("uf", "STRING"),
+    bigquery.SchemaField("porte", "STRING"),
+    bigquery.SchemaField("kind", "STRING"),
+    bigquery.SchemaField("count", "FLOAT"),
+    bigquery.SchemaField("trend", "FLOAT"),
+    bigquery.SchemaField("seasonal", "FLOAT"),
+    bigquery.SchemaField("adjusted", "FLOAT"),
+    bigquery.SchemaField("updated_at", "TIMESTAMP"),
+]
+
+def build_seasonal_flows():
+    # Same credentials as the other loaders: Streamlit secrets or the JSON key file (src/clients.py)
+    client = clients.bigquery_client()
+    t0 = time.time()
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("start_month", "STRING", START_MONTH)
+    ])
+    df_open = client.query(OPENINGS_SQL.format(dataset=BQ_DATASET), job_config=job_config).to_dataframe()
+    df_close = client.query(CLOSINGS_SQL.format(dataset=BQ_DATASET), job_config=job_config).to_dataframe()
+    df_open = df_open.melt(
+        id_vars=['month_year', 'sector_code', 'uf', 'porte'], value_vars=['abertura', 'abertura_ativa'],
+        var_name='kind', value_name='count'
+    )
+    df_flows = pd.concat([df_open, df_close], ignore_index=True)
+    df_flows['porte'] = df_flows['porte'].fillna('00')
+    # Drop malformed dates and months in the future (bad registrations)
+    current_month = datetime.date.today().strftime('%Y%m')
+    df_flows = df_flows[df_flows['month_year'].str.fullmatch(r'\d{6}') & (df_flows['month_year'] <= current_month)]
+    logger.info(f"Fetched {len(df_flows)} monthly flow rows in {time.time() - t0:.1f}s")
+
+    t0 = time.time()
+    df_out = decompose_flows(df_flows, key_cols=KEY_COLS)
+    n_series = df_out.groupby(KEY_COLS).ngroups
+    logger.info(f"Decomposed {n_series} series ({len(df_out)} rows) in {time.time() - t0:.1f}s")
+
+    df_out['updated_at'] = pd.Timestamp.now(tz='UTC')
+    table_id = f"{client.project}.{BQ_DATASET}.{TABLE_NAME}"
+    load_config = bigquery.LoadJobConfig(
+        schema=SCHEMA,
+        write_disposition="WRITE_TRUNCATE",
+        clustering_fields=["kind", "porte", "sector_code", "uf"]
+    )
+    job = client.load_table_from_dataframe(df_out, table_id, job_config=load_config)
+    job.result()
+    logger.info(f"Loaded {len(df_out)} rows into {table_id}")
+
+if __name__ == "__main__":
+    try:
+        build_seasonal_flows()
+    except Exception as e:
+        logger.error(f"Seasonal build failed: {e}")
+        exit(1)
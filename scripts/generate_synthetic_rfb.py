@@ -0,0 +1,293 @@
+"""
+Deterministic synthetic RFB CNPJ dataset, in the exact layout of the official files.
+
+Writes K3241.K03200Y<n>.D<release>.EMPRECSV / .ESTABELE shards plus the six
+reference files (latin-1, ';'-delimited, every field quoted, no header). Seeded, so
+the same (rows, seed) always produces the same bytes. Distributions follow the real
+base: UF and municipality concentration (SP/MG/RJ, capitals), Zipf-skewed CNAE
+(mostly services, ~15% industry), porte and natureza shares, lognormal capital by
+porte, more recent opening dates, and baixada/ativa status mix. A small share of
+rows carries dirty bytes (NUL/control, embedded newlines, doubled quotes) and a few
+malformed lines are appended, so every reader path meets what the real dumps contain.
+
+Usage: python -m scripts.generate_synthetic_rfb <out_dir> [rows] [--seed N] [--files N] [--dirty RATE]
+"""
+import io
+import os
+import sys
+import time
+import logging
+import datetime
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from src import cnae
+from src.ingestion import column_names
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ENCODING = 'latin-1'
+RELEASE = datetime.date(2025, 12, 13)
+CHUNK_COMPANIES = 250_000
+DEFAULT_FILES = 10
+DIRTY_RATE = 1e-4
+
+# Share of establishments and number of municipalities per UF (approximate RFB base)
+UF_SHARES = {
+    "SP": (0.285, 645), "MG": (0.110, 853), "RJ": (0.085, 92), "PR": (0.070, 399), "RS": (0.065, 497),
+    "SC": (0.050, 295), "BA": (0.045, 417), "GO": (0.035, 246), "PE": (0.030, 185), "CE": (0.028, 184),
+    "DF": (0.022, 1), "ES": (0.020, 78), "PA": (0.020, 144), "MT": (0.018, 141), "MS": (0.014, 79),
+    "MA": (0.013, 217), "PB": (0.011, 223), "RN": (0.010, 167), "AM": (0.010, 62), "AL": (0.008, 102),
+    "PI": (0.008, 224), "SE": (0.006, 75), "RO": (0.006, 52), "TO": (0.005, 139), "AC": (0.002, 22),
+    "AP": (0.002, 16), "RR": (0.002, 15),
+}
+PORTES = (["00", "01", "03", "05"], [0.15, 0.65, 0.08, 0.12])
+CAPITAL_MEDIAN = {"00": 5_000, "01": 10_000, "03": 150_000, "05": 1_000_000}
+NATUREZAS = (["2135", "2062", "2305", "2240", "2046", "2054", "3999", "2143", "1031"],
+             [0.32, 0.45, 0.06, 0.05, 0.01, 0.03, 0.05, 0.02, 0.01])
+SITUACOES = (["02", "08", "04", "03", "01"], [0.55, 0.35, 0.07, 0.02, 0.01])
+MOTIVO_BY_SITUACAO = {"02": "00", "08": "01", "04": "63", "03": "60", "01": "71"}
+SERVICE_CNAES = [
+    ("4781400", "Comércio varejista de artigos do vestuário e acessórios"),
+    ("9492800", "Atividades de organizações políticas"),
+    ("5611201", "Restaurantes e similares"),
+    ("9602501", "Cabeleireiros, manicure e pedicure"),
+    ("4712100", "Comércio varejista de mercadorias em geral - minimercados"),
+    ("7319002", "Promoção de vendas"),
+    ("4930202", "Transporte rodoviário de carga, intermunicipal"),
+    ("8219999", "Preparação de documentos e serviços de apoio administrativo"),
+    ("4399103", "Obras de alvenaria"),
+    ("4744099", "Comércio varejista de materiais de construção em geral"),
+    ("8599699", "Outras atividades de ensino não especificadas"),
+    ("4520001", "Serviços de manutenção e reparação mecânica de veículos"),
+    ("6201501", "Desenvolvimento de programas de computador sob encomenda"),
+    ("8630504", "Atividade odontológica"),
+    ("4721102", "Padaria e confeitaria com predominância de revenda"),
+]
+INDUSTRY_SHARE = 0.15
+LOGRADOUROS = ["RUA", "AVENIDA", "TRAVESSA", "RODOVIA", "ESTRADA", "ALAMEDA", "PRACA"]
+REFERENCES = {
+    "NATJUCSV": [("2135", "Empresário (Individual)"), ("2062", "Sociedade Empresária Limitada"),
+                 ("2305", "Empresa Individual de Responsabilidade Limitada"), ("2240", "Sociedade Simples Limitada"),
+                 ("2046", "Sociedade Anônima Aberta"), ("2054", "Sociedade Anônima Fechada"),
+                 ("3999", "Associação Privada"), ("2143", "Cooperativa"), ("1031", "Órgão Público do Poder Executivo Municipal")],
+    "MOTICSV": [("00", "SEM MOTIVO"), ("01", "EXTINCAO POR ENCERRAMENTO LIQUIDACAO VOLUNTARIA"),
+                ("60", "ART. 60 LEI 8.934/94"), ("63", "OMISSAO DE DECLARACOES"), ("71", "INAPTIDAO")],
+    "PAISCSV": [("105", "BRASIL"), ("249", "ESTADOS UNIDOS"), ("607", "PORTUGAL")],
+    "QUALSCSV": [("49", "Sócio-Administrador"), ("50", "Empresário"), ("65", "Titular Pessoa Física"), ("16", "Presidente")],
+}
+
+def _zipf_weights(n: int, rng, exponent: float = 1.1) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+def build_universe(seed: int) -> dict:
+    """Fixed code lists and sampling weights (municipalities, CNAEs) for a seed."""
+    rng = np.random.default_rng(seed)
+    ufs = list(UF_SHARES)
+    muni_codes, muni_ufs, muni_weights, muni_names = [], [], [], []
+    code = 1
+    for uf in ufs:
+        share, count = UF_SHARES[uf]
+        # Capital first and heaviest, long tail of small towns
+        w = 1.0 / np.arange(1, count + 1) ** 1.3
+        muni_weights.extend(share * w / w.sum())
+        for i in range(count):
+            muni_codes.append(f"{code:04d}")
+            muni_ufs.append(uf)
+            muni_names.append(f"MUNICIPIO {code:04d} {uf}" if i else f"CAPITAL {uf}")
+            code += 1
+    muni_weights = np.array(muni_weights) / np.sum(muni_weights)
+
+    industry = [(c, label.split(" - ", 1)[1]) for c, label in zip(cnae.codes("sub"), cnae.labels("sub"))] \
+        if cnae.is_available() else [("1011201", "Frigorífico - abate de bovinos")]
+    service_w = _zipf_weights(len(SERVICE_CNAES), rng)
+    industry_w = _zipf_weights(len(industry), rng)
+    cnae_codes = [c for c, _ in SERVICE_CNAES] + [c for c, _ in industry]
+    cnae_weights = np.concatenate([(1 - INDUSTRY_SHARE) * service_w, INDUSTRY_SHARE * industry_w])
+    return {
+        "muni_codes": np.array(muni_codes), "muni_ufs": np.array(muni_ufs), "muni_names": muni_names,
+        "muni_weights": muni_weights, "cnae_codes": np.array(cnae_codes), "cnae_weights": cnae_weights,
+        "cnae_descs": [d for _, d in SERVICE_CNAES] + [d for _, d in industry],
+    }
+
+def _str(values) -> pa.Array:
+    return pa.array(np.asarray(values).astype(str))
+
+def _pad(ints, width: int) -> pa.Array:
+    return pc.utf8_lpad(pc.cast(pa.array(ints), pa.string()), width=width, padding='0')
+
+def _dates(days_before, rng_floor: datetime.date = datetime.date(1960, 1, 1)) -> pa.Array:
+    release = np.datetime64(RELEASE, 'D')
+    dates = np.maximum(release - days_before.astype('timedelta64[D]'), np.datetime64(rng_floor, 'D'))
+    return pc.strftime(pa.array(dates.astype('datetime64[s]')), format='%Y%m%d')
+
+def _capital(porte, rng) -> pa.Array:
+    medians = np.vectorize(CAPITAL_MEDIAN.get)(porte)
+    cents = np.round(rng.lognormal(np.log(medians), 1.6) * 100).astype(np.int64)
+    # Decimal comma, as in the RFB files ('1000,00')
+    return pc.binary_join_element_wise(pc.cast(pa.array(cents // 100), pa.string()), _pad(cents % 100, 2), ',')
+
+def _dirty(values: np.ndarray, rng, rate: float) -> np.ndarray:
+    """Injects NUL/control bytes, embedded newlines and quotes into a small share of values."""
+    idx = np.flatnonzero(rng.random(len(values)) < rate)
+    tokens = ["\x00", "\x1a", "\n", '"', "\x0b"]
+    for k, i in enumerate(idx):
+        v = values[i]
+        values[i] = v[:3] + tokens[k % len(tokens)] + v[3:]
+    return values
+
+def company_chunk(start: int, count: int, step: int, rng, dirty_rate: float) -> pa.Table:
+    basico = 1_000_000 + (start + np.arange(count)) * step
+    porte = rng.choice(PORTES[0], size=count, p=PORTES[1])
+    natureza = rng.choice(NATUREZAS[0], size=count, p=NATUREZAS[1])
+    names = np.char.add(np.char.add("EMPRESA SINTETICA ", basico.astype(str)),
+                        np.where(natureza == "2135", " ME", " LTDA")).astype(object)
+    names = _dirty(names, rng, dirty_rate)
+    return pa.table({
+        "cnpj_basico": _pad(basico, 8),
+        "razao_social": pa.array(names, pa.string()),
+        "natureza_juridica": _str(natureza),
+        "qualificacao_responsavel": _str(rng.choice(["49", "50", "65", "16"], size=count, p=[0.6, 0.25, 0.1, 0.05])),
+        "capital_social": _capital(porte, rng),
+        "porte_empresa": _str(porte),
+        "ente_federativo": pa.array([""] * count),
+    })
+
+def establishment_chunk(start: int, count: int, step: int, universe: dict, rng, dirty_rate: float) -> pa.Table:
+    basico = 1_000_000 + (start + np.arange(count)) * step
+    # One head office per company; ~8% of companies also have branches (geometric count)
+    branches = np.where(rng.random(count) < 0.08, rng.geometric(0.3, size=count), 0)
+    per_company = 1 + branches
+    n = int(per_company.sum())
+    basico = np.repeat(basico, per_company)
+    first = np.repeat(np.cumsum(per_company) - per_company, per_company)
+    ordem = np.arange(n) - first + 1
+
+    muni_idx = rng.choice(len(universe["muni_codes"]), size=n, p=universe["muni_weights"])
+    cnae_idx = rng.choice(len(universe["cnae_codes"]), size=n, p=universe["cnae_weights"])
+    situacao = rng.choice(SITUACOES[0], size=n, p=SITUACOES[1])
+    # Openings skew recent (exponential, mean ~9 years); status date between opening and release
+    age = rng.exponential(9 * 365, size=n).astype(np.int64)
+    since_status = np.where(situacao == "02", age, (age * rng.random(n)).astype(np.int64))
+    secondary = np.where(rng.random(n) < 0.3, universe["cnae_codes"][rng.choice(len(universe["cnae_codes"]), size=n)], "")
+    fantasia = np.where(rng.random(n) < 0.5, np.char.add("FANTASIA ", basico.astype(str)), "").astype(object)
+    fantasia = _dirty(fantasia, rng, dirty_rate)
+    empty = pa.array([""] * n)
+
+    columns = {
+        "cnpj_basico": _pad(basico, 8),
+        "cnpj_ordem": _pad(ordem, 4),
+        "cnpj_dv": _pad(rng.integers(0, 100, size=n), 2),
+        "identificador_matriz_filial": _str(np.where(ordem == 1, "1", "2")),
+        "nome_fantasia": pa.array(fantasia, pa.string()),
+        "situacao_cadastral": _str(situacao),
+        "data_situacao_cadastral": _dates(since_status),
+        "motivo_situacao_cadastral": _str(np.vectorize(MOTIVO_BY_SITUACAO.get)(situacao)),
+        "nome_cidade_exterior": empty,
+        "pais": empty,
+        "data_inicio_atividade": _dates(age),
+        "cnae_fiscal_principal": _str(universe["cnae_codes"][cnae_idx]),
+        "cnae_fiscal_secundaria": _str(secondary),
+        "tipo_logradouro": _str(rng.choice(LOGRADOUROS, size=n)),
+        "logradouro": pc.binary_join_element_wise("LOGRADOURO ", _pad(rng.integers(1, 5000, size=n), 4), ""),
+        "numero": _pad(rng.integers(1, 3000, size=n), 1),
+        "complemento": empty,
+        "bairro": pc.binary_join_element_wise("BAIRRO ", _pad(rng.integers(1, 200, size=n), 3), ""),
+        "cep": _pad(rng.integers(1_000_000, 99_999_999, size=n), 8),
+        "uf": _str(universe["muni_ufs"][muni_idx]),
+        "municipio": _str(universe["muni_codes"][muni_idx]),
+        "ddd_1": _pad(rng.integers(11, 99, size=n), 2),
+        "telefone_1": _pad(rng.integers(20_000_000, 99_999_999, size=n), 8),
+        "ddd_2": empty, "telefone_2": empty, "ddd_fax": empty, "fax": empty,
+        "correio_eletronico": pc.binary_join_element_wise("CONTATO", _pad(basico, 8), "@EXEMPLO.COM.BR", ""),
+        "situacao_especial": empty, "data_situacao_especial": empty,
+    }
+    return pa.table([columns[c] for c in column_names("estabelecimentos")], names=column_names("estabelecimentos"))
+
+def _bad_lines(table: str, count: int) -> bytes:
+    """Malformed records (truncated and with extra fields); readers must skip them."""
+    width = len(column_names(table))
+    lines = []
+    for i in range(count):
+        fields = width - 3 if i % 2 == 0 else width + 2
+        lines.append(";".join(f'"RUIM{j}"' for j in range(fields)))
+    return ("\n".join(lines) + "\n").encode(ENCODING) if lines else b""
+
+def to_rfb_bytes(table: pa.Table) -> bytes:
+    buf = io.BytesIO()
+    pacsv.write_csv(table, buf, pacsv.WriteOptions(include_header=False, delimiter=';', quoting_style='all_valid'))
+    return buf.getvalue().decode('utf-8').encode(ENCODING, errors='replace')
+
+def _release_tag() -> str:
+    return f"D{RELEASE.year % 10}{RELEASE.month:02d}{RELEASE.day:02d}"
+
+def write_references(out_dir: str, universe: dict):
+    tag = _release_tag()
+    refs = dict(REFERENCES)
+    refs["MUNICCSV"] = list(zip(universe["muni_codes"].tolist(), universe["muni_names"]))
+    refs["CNAECSV"] = list(zip(universe["cnae_codes"].tolist(), universe["cnae_descs"]))
+    for suffix, rows in refs.items():
+        table = pa.table({"codigo": [c for c, _ in rows], "descricao": [d for _, d in rows]})
+        with open(os.path.join(out_dir, f"F.K03200$Z.{tag}.{suffix}"), 'wb') as f:
+            f.write(to_rfb_bytes(table))
+
+def generate(out_dir: str, rows: int = 100_000, seed: int = 42, files: int = DEFAULT_FILES,
+             dirty_rate: float = DIRTY_RATE) -> dict:
+    """
+    Writes `rows` companies (and ~1.2x establishments) split into `files` shards.
+    Returns {'empresas': rows, 'estabelecimentos': rows, 'bad_lines': n} (valid rows only).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    universe = build_universe(seed)
+    write_references(out_dir, universe)
+    tag = _release_tag()
+    step = max(1, 98_000_000 // max(rows, 1))
+    per_file = -(-rows // files)
+    totals = {"empresas": 0, "estabelecimentos": 0, "bad_lines": 0}
+
+    for shard in range(files):
+        lo, hi = shard * per_file, min(rows, (shard + 1) * per_file)
+        if lo >= hi:
+            break
+        # Independent stream per shard: same output regardless of chunking or file count order
+        rng = np.random.default_rng([seed, shard])
+        paths = {t: os.path.join(out_dir, f"K3241.K03200Y{shard}.{tag}.{suffix}")
+                 for t, suffix in (("empresas", "EMPRECSV"), ("estabelecimentos", "ESTABELE"))}
+        with open(paths["empresas"], 'wb') as emp, open(paths["estabelecimentos"], 'wb') as est:
+            for start in range(lo, hi, CHUNK_COMPANIES):
+                count = min(CHUNK_COMPANIES, hi - start)
+                companies = company_chunk(start, count, step, rng, dirty_rate)
+                establishments = establishment_chunk(start, count, step, universe, rng, dirty_rate)
+                bad = int(rng.poisson(dirty_rate * count))
+                emp.write(to_rfb_bytes(companies) + _bad_lines("empresas", bad))
+                est.write(to_rfb_bytes(establishments) + _bad_lines("estabelecimentos", bad))
+                totals["empresas"] += companies.num_rows
+                totals["estabelecimentos"] += establishments.num_rows
+                totals["bad_lines"] += 2 * bad
+        logger.info(f"Shard {shard}: companies {lo:,}-{hi:,}")
+    return totals
+
+if __name__ == "__main__":
+    args, opts = [], {}
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg.startswith("--"):
+            opts[arg] = next(argv, None)
+        else:
+            args.append(arg)
+    if not args:
+        print(__doc__)
+        exit(1)
+
+    t0 = time.time()
+    totals = generate(
+        args[0], int(args[1]) if len(args) > 1 else 100_000,
+        seed=int(opts.get("--seed", 42)), files=int(opts.get("--files", DEFAULT_FILES)),
+        dirty_rate=float(opts.get("--dirty", DIRTY_RATE)),
+    )
+    logger.info(f"Done in {time.time() - t0:.1f}s: {totals}")
@@ -1,22 +1,27 @@
 import os
-import glob
+import sys
 import time
-import datetime
-import pandas as pd
+import logging
 from google.cloud import bigquery
-from google.oauth2 import service_account
-from src.config import GCP_PROJECT_ID, BQ_DATASET, GCP_CREDENTIALS_JSON, DATA_DIR
+from src import clients
+from src.config import BQ_DATASET, DATA_DIR, GCS_STAGING_URI, INGESTION_WORK_DIR
+from src.ingestion import LAYOUTS, discover_sources
+from src.ingestion.sources import discover_bucket_sources
+from src.ingestion.pipeline import run_pipeline
+from src.ingestion.manifest import ensure_manifest, read_manifest
 
-# Configuration
-ENCODING = 'latin-1'
-BATCH_SIZE = 10000
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Main tables first; references are small and load in seconds
+DEFAULT_TABLES = ["empresas", "estabelecimentos", "naturezas", "municipios", "cnaes", "motivos", "paises", "qualificacoes"]
 
 def get_bq_client():
-    if GCP_CREDENTIALS_JSON and os.path.exists(GCP_CREDENTIALS_JSON):
-        credentials = service_account.Credentials.from_service_account_file(GCP_CREDENTIALS_JSON)
-        return bigquery.Client(credentials=credentials, project=GCP_PROJECT_ID)
-    else:
-        return bigquery.Client(project=GCP_PROJECT_ID)
+    return clients.bigquery_client()
+
+def get_storage_client():
+    return clients.storage_client()
 
 def create_dataset_if_not_exists(client):
     dataset_id = f"{client.project}.{BQ_DATASET}"
@@ -30,96 +35,53 @@ def create_dataset_if_not_exists(client):
         client.create_dataset(dataset, timeout=30)
         print(f"Created dataset {dataset_id}")
 
-def ingest_companies_bq():
+def ingest_tables_bq(tables=DEFAULT_TABLES, force=False, bucket_uri=None):
+    """
+    Parses every RFB file in DATA_DIR (or in `bucket_uri`, read as a stream) in
+    parallel (official zip archives are read directly, member by member, without
+    extracting) and swaps each changed file into its partition. Files already in the
+    ingestion manifest with the same size and checksum are skipped, and a file
+    interrupted mid-parse resumes from its last checkpointed chunk, so re-running after
+    a failure resumes instead of duplicating.
+    """
     client = get_bq_client()
     create_dataset_if_not_exists(client)
-    
-    table_id = f"{client.project}.{BQ_DATASET}.empresas"
-    
-    # Define Schema
-    job_config = bigquery.LoadJobConfig(
-        schema=[
-            bigquery.SchemaField("cnpj_basico", "STRING"),
-            bigquery.SchemaField("razao_social", "STRING"),
-            bigquery.SchemaField("natureza_juridica", "STRING"),
-            bigquery.SchemaField("qualificacao_responsavel", "STRING"),
-            bigquery.SchemaField("capital_social", "FLOAT"),
-            bigquery.SchemaField("porte_empresa", "STRING"),
-            bigquery.SchemaField("ente_federativo", "STRING"),
-        ],
-        write_disposition=bigquery.WriteDisposition.WRITE_APPEND, # Critical: Append mode
-        source_format=bigquery.SourceFormat.CSV,
-    )
-
-    files = glob.glob(os.path.join(DATA_DIR, "*EMPRECSV"))
-    files = sorted(files)
-    
-    print(f"Found {len(files)} company files to process.")
-    
-    for file_path in files:
-        filename = os.path.basename(file_path)
-        print(f"Processing {filename}...")
-        
-        # We need to pre-process with pandas to handle 'capital_social' float conversion 
-        # because raw CSV has European format (comma dec) and BQ expects dot or clean float.
-        # Direct CSV load might fail on "1.000,00".
-        
-        # Using chunks to avoid memory issues
-        chunk_size = 50000
-        for chunk in pd.read_csv(file_path, sep=';', encoding=ENCODING, 
-                                 header=None, names=[
-                                     'cnpj_basico', 'razao_social', 'natureza_juridica', 
-                                     'qualificacao_responsavel', 'capital_social', 
-                                     'porte_empresa', 'ente_federativo'
-                                 ],
-                                 dtype={'cnpj_basico': str, 'natureza_juridica': str},
-                                 chunksize=chunk_size):
-            
-            # Data Cleaning
-            chunk['capital_social'] = chunk['capital_social'].astype(str).str.replace(',', '.', regex=False)
-            chunk['capital_social'] = pd.to_numeric(chunk['capital_social'], errors='coerce').fillna(0.0)
-            
-            # Upload Chunk
-            job = client.load_table_from_dataframe(
-                chunk, table_id, job_config=job_config
-            )
-            job.result() # Wait for job to complete
-            
-            print(f"  Uploaded chunk of {len(chunk)} rows.")
+    storage_client = get_storage_client() if GCS_STAGING_URI or bucket_uri else None
 
-    print("Company ingestion complete.")
-
-def ingest_references_bq():
-    client = get_bq_client()
-    # Similar logic for Naturezas but REPLACE usually makes sense for dim tables
-    # But user asked for Append generally. For Dimensions, usually we Replace.
-    # I'll stick to Replace for dimensions as they are small and static.
-    
-    refs = [
-        ("naturezas", "F.K03200$Z.D51213.NATJUCSV"),
-        # Add municipos if needed
-    ]
-    
-    for table_name, csv_name in refs:
-        file_path = os.path.join(DATA_DIR, csv_name)
-        if not os.path.exists(file_path):
-            continue
-            
-        print(f"Ingesting {table_name}...")
-        table_id = f"{client.project}.{BQ_DATASET}.{table_name}"
-        
-        df = pd.read_csv(file_path, sep=';', encoding=ENCODING, header=None, names=['codigo', 'descricao'], dtype=str)
-        
-        job_config = bigquery.LoadJobConfig(
-            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE, # Replace dimensions
+    ensure_manifest(client, BQ_DATASET)
+    manifest = read_manifest(client, BQ_DATASET)
+    if bucket_uri:
+        sources = discover_bucket_sources(bucket_uri, storage_client)
+    else:
+        sources = discover_sources(DATA_DIR)
+    report = {}
+    # Persistent work dir: parts and chunk checkpoints of an interrupted run are resumed
+    os.makedirs(INGESTION_WORK_DIR, exist_ok=True)
+    for table in tables:
+        files = sources.get(table, [])
+        logger.info(f"{table}: {len(files)} files")
+        t0 = time.time()
+        report[table] = run_pipeline(
+            client, BQ_DATASET, table, files, str(INGESTION_WORK_DIR), manifest=manifest,
+            staging_uri=GCS_STAGING_URI, storage_client=storage_client, bucket_uri=bucket_uri, force=force
         )
-        
-        job = client.load_table_from_dataframe(df, table_id, job_config=job_config)
-        job.result()
-        print(f"Finished {table_name}")
+        logger.info(f"{table}: done in {time.time() - t0:.1f}s")
+
+    logger.info("--- Throughput (rows/s) ---")
+    for table, stages in report.items():
+        summary = ", ".join(f"{stage}={info['rows_per_s']:,}" for stage, info in stages.items())
+        logger.info(f"{table}: {summary or 'unchanged'}")
+    return report
 
 if __name__ == "__main__":
     print("Starting BigQuery Ingestion...")
-    # ingest_references_bq() # Uncomment if needed
-    ingest_companies_bq()
+    # Optional: table names as arguments (e.g. python -m scripts.ingest_data_bq empresas)
+    # and --full to reload every file regardless of the manifest
+    force = "--full" in sys.argv
+    selected = [a for a in sys.argv[1:] if not a.startswith("--")] or DEFAULT_TABLES
+    unknown = [t for t in selected if t not in LAYOUTS]
+    if unknown:
+        logger.error(f"Unknown tables: {unknown}. Options: {list(LAYOUTS)}")
+        exit(1)
+    ingest_tables_bq(selected, force=force)
     print("Done.")
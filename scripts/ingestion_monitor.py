@@ -0,0 +1,66 @@
+import sys
+import time
+import datetime
+from collections import defaultdict
+from src.config import METRICS_FILE
+from src.ingestion.telemetry import read_events
+
+POLL_SECONDS = 1.0
+
+def format_event(e):
+    ts = datetime.datetime.fromtimestamp(e.get("ts", 0)).strftime("%H:%M:%S")
+    kind = e.get("event")
+    if kind == "chunk":
+        return (f"{ts} chunk  {e['table']:<16} {e['file']} #{e['index']:<4} @{e['offset'] / 1024 ** 2:,.0f} MB  "
+                f"read {e['read_mb_s']:,.0f} MB/s  parse {e['parse_rows_s']:,.0f}  clean {e['clean_rows_s']:,.0f}  "
+                f"write {e['write_rows_s']:,.0f} rows/s")
+    if kind == "load":
+        return f"{ts} load   {e['table']:<16} shard {e['shard']:<3} {e['rows']:,} rows  {e['load_rows_s']:,.0f} rows/s  ({e['pending']} pending)"
+    if kind == "sqlite":
+        return f"{ts} sqlite {e['table']:<16} {e['rows']:,} rows  {e['load_rows_s']:,.0f} rows/s  queue {e.get('queue_depth')}"
+    if kind == "queue":
+        return f"{ts} queue  {e['table']:<16} {e['stage']}: {e['pending']} pending"
+    if kind == "resume":
+        where = "complete" if e.get("complete") else f"from {e.get('offset', 0) / 1024 ** 2:,.0f} MB"
+        return f"{ts} resume {e['table']:<16} {e['file']} ({e['chunks']} chunks, {where})"
+    if kind == "stage":
+        return f"{ts} stage  {e['stage']:<16} {e['rows']:,} rows in {e['seconds']}s ({e['rows_per_s']:,} rows/s)"
+    if kind == "step":
+        return f"{ts} step   {e['step']:<16} {e['script']} {e['status']} in {e['seconds']}s ({e['attempts']} attempt(s))"
+    if kind == "benchmark":
+        return f"{ts} bench  {e['run']:<16} {e['rows']:,} rows in {e['seconds']}s ({e['rows_s']:,} rows/s, peak {e['peak_rss_mb']:,} MB)"
+    return f"{ts} {kind} {e}"
+
+def summarize(events):
+    """Mean per-chunk throughput by table."""
+    sums = defaultdict(lambda: defaultdict(float))
+    for e in events:
+        if e.get("event") == "chunk":
+            s = sums[e["table"]]
+            s["chunks"] += 1
+            s["rows"] += e["rows"]
+            for key in ("read_mb_s", "parse_rows_s", "clean_rows_s", "write_rows_s"):
+                s[key] += e[key]
+    for table, s in sums.items():
+        n = s["chunks"]
+        print(f"{table}: {int(n)} chunks, {int(s['rows']):,} rows | read {s['read_mb_s'] / n:,.0f} MB/s, "
+              f"parse {s['parse_rows_s'] / n:,.0f}, clean {s['clean_rows_s'] / n:,.0f}, write {s['write_rows_s'] / n:,.0f} rows/s")
+
+if __name__ == "__main__":
+    # Usage: python -m scripts.ingestion_monitor [--follow]
+    follow = "--follow" in sys.argv
+    events, offset = read_events(METRICS_FILE)
+    for e in events[-50:]:
+        print(format_event(e))
+    if not follow:
+        print("---")
+        summarize(events)
+        exit(0)
+    try:
+        while True:
+            time.sleep(POLL_SECONDS)
+            new, offset = read_events(METRICS_FILE, offset)
+            for e in new:
+                print(format_event(e))
+    except KeyboardInterrupt:
+        pass
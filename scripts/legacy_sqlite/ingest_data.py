@@ -1,202 +1,199 @@
-import csv
-import sqlite3
+"""
+Bulk loader of the local SQLite database (legacy/offline path), for every RFB table.
+
+Worker processes parse the sources (files or zip members) with the Arrow reader and
+send row blocks over a bounded queue to a single writer. The writer builds a fresh
+database file with bulk-load PRAGMAs (no journal, no fsync, large page cache, temp
+store in memory), one transaction per table, and creates the indexes only after all
+rows are in. The finished file atomically replaces DB_FILE, so an interrupted build
+never leaves a half-loaded database behind. Writer throughput and queue depth go to
+the ingestion metrics log (see scripts/ingestion_monitor.py).
+
+Usage: python -m scripts.legacy_sqlite.ingest_data [directory with the RFB files or zips]
+"""
 import os
-import glob
+import sys
 import time
 import json
+import queue
+import sqlite3
 import datetime
+import multiprocessing
+from src.config import DATA_DIR, DB_FILE, STATUS_FILE
+from src.ingestion import LAYOUTS, column_names, discover_sources, open_source, iter_tables
+from src.ingestion.sources import source_name
+from src.ingestion.telemetry import emit, rate
 
-# Configuration
-DATA_DIR = r"C:\Users\ercaavi\Downloads\Empresas0"
-DB_FILE = os.path.join(DATA_DIR, "cnpj_data.db")
-STATUS_FILE = os.path.join(DATA_DIR, "ingestion_status.json")
-ENCODING = 'latin-1'
-
-def create_database():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # Main companies table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS empresas (
-            cnpj_basico TEXT,
-            razao_social TEXT,
-            natureza_juridica TEXT,
-            qualificacao_responsavel TEXT,
-            capital_social REAL,
-            porte_empresa TEXT,
-            ente_federativo TEXT
-        )
-    """)
-    
-    # Reference tables
-    cursor.execute("CREATE TABLE IF NOT EXISTS naturezas (codigo TEXT PRIMARY KEY, descricao TEXT)")
-    cursor.execute("CREATE TABLE IF NOT EXISTS municipios (codigo TEXT PRIMARY KEY, descricao TEXT)")
-    
-    # Internal Control table for Incremental Updates
-    cursor.execute("""
+BLOCK_BYTES = 16 * 1024 * 1024
+QUEUE_BLOCKS = 8           # Bounded queue: at most this many parsed blocks in memory
+STATUS_INTERVAL = 2.0      # Seconds between ingestion_status.json updates
+SQLITE_TYPES = {"STRING": "TEXT", "FLOAT": "REAL", "INT64": "INTEGER"}
+
+# Main tables first (longest), references last
+TABLE_ORDER = ["estabelecimentos", "empresas", "naturezas", "municipios", "cnaes", "motivos", "paises", "qualificacoes"]
+
+INDEXES = {
+    "empresas": [
+        ("idx_cnpj_basico", "cnpj_basico"),
+        ("idx_razao_social", "razao_social"),
+        ("idx_nat_juridica", "natureza_juridica"),
+    ],
+    "estabelecimentos": [
+        ("idx_estab_cnpj_basico", "cnpj_basico"),
+        ("idx_estab_cnae", "cnae_fiscal_principal"),
+        ("idx_estab_uf_municipio", "uf, municipio"),
+        ("idx_estab_situacao", "situacao_cadastral"),
+    ],
+}
+
+BULK_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -1048576",   # 1 GB (negative = KiB)
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA locking_mode = EXCLUSIVE",
+]
+
+def create_schema(conn):
+    for table, layout in LAYOUTS.items():
+        columns = ", ".join(f"{name} {SQLITE_TYPES[bq_type]}" for name, bq_type in layout["columns"])
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS processed_files (
             filename TEXT PRIMARY KEY,
+            table_name TEXT,
+            rows INTEGER,
             processed_at DATETIME
         )
     """)
-    
-    # Indexes
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_razao_social ON empresas(razao_social)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cnpj_basico ON empresas(cnpj_basico)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nat_juridica ON empresas(natureza_juridica)")
-    
-    conn.commit()
-    conn.close()
-    print(f"Database schema initialized/verified at {DB_FILE}")
 
-def is_file_processed(filename):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT 1 FROM processed_files WHERE filename = ?", (filename,))
-        return cursor.fetchone() is not None
-    except sqlite3.OperationalError:
-        return False
-    finally:
-        conn.close()
-
-def mark_file_processed(filename):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("INSERT OR REPLACE INTO processed_files (filename, processed_at) VALUES (?, ?)", 
-                  (filename, datetime.datetime.now()))
-    conn.commit()
-    conn.close()
+def create_indexes(conn):
+    for table, indexes in INDEXES.items():
+        for name, columns in indexes:
+            t0 = time.time()
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+            print(f"  {name}: {time.time() - t0:.1f}s")
+    # Reference tables are looked up by code
+    for table, layout in LAYOUTS.items():
+        if table not in INDEXES and "codigo" in column_names(table):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_codigo ON {table}(codigo)")
 
-def ingest_reference_table(filename, table_name):
-    filepath = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(filepath):
-        print(f"Warning: Reference file {filename} not found.")
-        return
+def _init_worker(out_queue):
+    global _out_queue
+    _out_queue = out_queue
 
-    print(f"Ingesting {filename} into {table_name}...")
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    with open(filepath, 'r', encoding=ENCODING) as f:
-        reader = csv.reader(f, delimiter=';', quotechar='"')
-        batch = []
-        for row in reader:
-            if len(row) >= 2:
-                batch.append((row[0], row[1]))
-                
-        cursor.executemany(f"INSERT OR REPLACE INTO {table_name} VALUES (?, ?)", batch)
-        conn.commit()
-    
-    conn.close()
-    print(f"Finished {table_name}.")
+def _parse_source(task):
+    """Worker: streams one source as row blocks to the writer; the last message carries the totals."""
+    source, table = task
+    stats, rows = {}, 0
+    try:
+        with open_source(source) as stream:
+            for block in iter_tables(stream, table, block_bytes=BLOCK_BYTES, stats=stats):
+                columns = [col.to_pylist() for col in block.columns]
+                _out_queue.put(("rows", table, source, list(zip(*columns))))
+                rows += block.num_rows
+        _out_queue.put(("done", table, source, (rows, stats.get("invalid_rows", 0))))
+    except Exception as e:
+        _out_queue.put(("error", table, source, str(e)))
 
-def update_status(current_file, local_rows, total_rows, start_time, status="Running"):
-    elapsed = time.time() - start_time
+def update_status(current_file, total_rows, start_time, status="Running", path=STATUS_FILE):
     status_data = {
-        "current_file": os.path.basename(current_file),
-        "rows_processed_file": local_rows,
+        "current_file": current_file,
         "total_rows_processed": total_rows,
-        "elapsed_seconds": int(elapsed),
+        "elapsed_seconds": int(time.time() - start_time),
         "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "status": status
     }
-    with open(STATUS_FILE, 'w') as f:
+    with open(path, 'w') as f:
         json.dump(status_data, f)
 
-def ingest_companies():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    files = glob.glob(os.path.join(DATA_DIR, "*EMPRECSV"))
-    # Sort files to ensure deterministic order
-    files = sorted(files)
-    
-    # Initialize status
+def _queue_depth(q):
+    try:
+        return q.qsize()
+    except NotImplementedError:  # macOS
+        return None
+
+def load_table(conn, table, sources, workers, start_time, total_rows, status_file=STATUS_FILE):
+    """Parses `sources` in a process pool and inserts every block in a single transaction."""
+    placeholders = ", ".join("?" for _ in column_names(table))
+    insert_sql = f"INSERT INTO {table} VALUES ({placeholders})"
+    out_queue = multiprocessing.Queue(maxsize=QUEUE_BLOCKS)
+    pending = set(sources)
+    table_rows, last_status = 0, 0.0
+    t0 = time.time()
+
+    with multiprocessing.Pool(min(workers, len(sources)), initializer=_init_worker, initargs=(out_queue,)) as pool:
+        result = pool.map_async(_parse_source, [(src, table) for src in sources])
+        conn.execute("BEGIN")
+        while pending:
+            try:
+                kind, _, source, payload = out_queue.get(timeout=5)
+            except queue.Empty:
+                if result.ready() and not result.successful():
+                    result.get()  # Re-raises the worker crash
+                continue
+            if kind == "rows":
+                conn.executemany(insert_sql, payload)
+                table_rows += len(payload)
+                if time.time() - last_status > STATUS_INTERVAL:
+                    print(f"  {table}: {table_rows:,} rows", end='\r')
+                    update_status(source_name(source), total_rows + table_rows, start_time, path=status_file)
+                    emit("sqlite", table=table, rows=table_rows, load_rows_s=rate(table_rows, time.time() - t0),
+                         queue_depth=_queue_depth(out_queue))
+                    last_status = time.time()
+            elif kind == "done":
+                rows, invalid = payload
+                conn.execute("INSERT OR REPLACE INTO processed_files VALUES (?, ?, ?, ?)",
+                             (source_name(source), table, rows, datetime.datetime.now().isoformat(" ")))
+                pending.discard(source)
+                emit("queue", table=table, stage="parse", pending=len(pending))
+                print(f"  {source_name(source)}: {rows:,} rows" + (f" ({invalid} malformed skipped)" if invalid else ""))
+            else:
+                raise RuntimeError(f"{source_name(source)}: {payload}")
+        conn.execute("COMMIT")
+        result.get()
+    return table_rows
+
+def build_database(data_dir=DATA_DIR, workers=None, db_file=DB_FILE, status_file=STATUS_FILE):
+    sources = discover_sources(data_dir)
+    if not sources:
+        print(f"No RFB files found in {data_dir}")
+        return
+    workers = workers or os.cpu_count() or 1
+    building = f"{db_file}.building"
+    if os.path.exists(building):
+        # Leftover of an interrupted build (no journal, so it cannot be trusted)
+        os.remove(building)
+
     start_time = time.time()
-    
-    print(f"Found {len(files)} company files to check: {[os.path.basename(f) for f in files]}")
-    
-    total_processed = 0
-    batch_size = 20000
-    
-    for i, file_path in enumerate(files):
-        filename = os.path.basename(file_path)
-        
-        if is_file_processed(filename):
-            print(f"Skipping {filename} (already processed).")
-            continue
+    conn = sqlite3.connect(building, isolation_level=None)
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+    create_schema(conn)
 
-        print(f"Processing {filename}...")
-        update_status(file_path, 0, total_processed, start_time)
-        
-        batch = []
-        local_count = 0
-        
-        try:
-            with open(file_path, 'r', encoding=ENCODING) as f:
-                reader = csv.reader(f, delimiter=';', quotechar='"')
-                
-                for row in reader:
-                    if len(row) < 7:
-                        continue
-                        
-                    try:
-                        capital = float(row[4].replace(',', '.'))
-                    except ValueError:
-                        capital = 0.0
-
-                    data = (
-                        row[0], # CNPJ BASICO
-                        row[1], # RAZAO SOCIAL
-                        row[2], # NATUREZA JURIDICA
-                        row[3], # QUALIFICACAO RESP
-                        capital, # CAPITAL SOCIAL
-                        row[5], # PORTE
-                        row[6]  # ENTE FEDERATIVO
-                    )
-                    
-                    batch.append(data)
-                    local_count += 1
-                    
-                    if len(batch) >= batch_size:
-                        cursor.executemany("INSERT INTO empresas VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
-                        conn.commit()
-                        total_processed += len(batch)
-                        batch = []
-                        print(f"  Rows: {total_processed:,}", end='\r')
-                        # Update status file every batch
-                        update_status(file_path, local_count, total_processed, start_time)
-                
-                # Remaining for this file
-                if batch:
-                    cursor.executemany("INSERT INTO empresas VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
-                    conn.commit()
-                    total_processed += len(batch)
-                    update_status(file_path, local_count, total_processed, start_time)
-            
-            # Mark as done
-            mark_file_processed(filename)
-                    
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-            # Optional: Decide if we should stop or continue. For now, we continue.
+    total_rows = 0
+    for table in TABLE_ORDER:
+        files = sources.get(table, [])
+        if not files:
+            print(f"Warning: no files for {table}.")
+            continue
+        print(f"Loading {table} ({len(files)} files, {workers} workers)...")
+        t0 = time.time()
+        rows = load_table(conn, table, files, workers, start_time, total_rows, status_file)
+        total_rows += rows
+        elapsed = time.time() - t0
+        print(f"{table}: {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
 
+    print("Creating indexes...")
+    update_status("Indexing", total_rows, start_time, path=status_file)
+    create_indexes(conn)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA journal_mode = DELETE")
     conn.close()
-    
-    # Final status
-    update_status("Completed", 0, total_processed, start_time, status="Done")
-        
-    print(f"\nTotal new companies ingested: {total_processed:,}")
+    os.replace(building, db_file)
+
+    update_status("Completed", total_rows, start_time, status="Done", path=status_file)
+    print(f"\nDatabase built at {db_file}: {total_rows:,} rows in {time.time() - start_time:.1f}s")
 
 if __name__ == "__main__":
-    # Ensure schema exists (including new control table)
-    create_database()
-    
-    # Ingest References (kept as replace for updates)
-    ingest_reference_table("F.K03200$Z.D51213.NATJUCSV", "naturezas")
-    ingest_reference_table("F.K03200$Z.D51213.MUNICCSV", "municipios")
-    
-    # Ingest Companies (Incremental)
-    ingest_companies()
+    build_database(sys.argv[1] if len(sys.argv) > 1 else DATA_DIR)
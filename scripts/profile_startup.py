@@ -0,0 +1,98 @@
+"""
+Cold-start profile of the dashboard process.
+
+Measures, each in a fresh interpreter so nothing is already imported or cached:
+
+    imports    `import app, src.ui.market` (script start + landing page) under
+               -X importtime: cumulative time per third-party package and per
+               project module, slowest first
+    init       first call of each startup step (config, credentials, BigQuery client,
+               database object, CNAE artifact, SIDRA catalog, each page's view module)
+
+Import timings include the first-run work of modules loaded at import time; init
+timings run in the order the app needs them, so each excludes the imports before it.
+
+Usage: python -m scripts.profile_startup [--top N]
+"""
+import sys
+import time
+import logging
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.config import PROJECT_ROOT
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def import_times(modules=("app", "src.ui.market")) -> list:
+    """(name, depth, self_us, cumulative_us) per module imported by `import <modules>`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    if result.returncode != 0:
+        logger.warning(f"import {', '.join(modules)} failed: {result.stderr.strip().splitlines()[-1:]}")
+    return rows
+
+def init_times() -> dict:
+    """Seconds of the first call of each startup step (run in a fresh process)."""
+    logging.disable(logging.WARNING)  # bare-mode warnings of st.cache_data
+    timings = {}
+
+    def step(label, call):
+        t0 = time.perf_counter()
+        try:
+            call()
+            timings[label] = round(time.perf_counter() - t0, 3)
+        except Exception as e:
+            timings[label] = f"error: {e}"
+
+    step("config", lambda: __import__("src.config"))
+    from src import clients
+    step("credentials", clients.credentials)
+    step("bigquery_client", clients.bigquery_client)
+    from src.database import get_database
+    step("database", get_database)
+    from src import cnae
+    step("cnae_artifact", cnae.load_artifact)
+    step("market_page_module", lambda: __import__("src.ui.market"))
+    step("macro_page_module", lambda: __import__("src.ui.dashboard"))
+    from src import ibge
+    step("sidra_catalog", ibge.load_catalog)
+    return timings
+
+def report(rows: list, timings: dict, top: int = 15):
+    total = sum(r[2] for r in rows) / 1e6
+    logger.info(f"--- Third-party packages (all imports: {total:.2f}s) ---")
+    # The outermost import of a package carries its whole cumulative time
+    direct = {}
+    for name, _, _, cumulative in rows:
+        package = name.split(".")[0]
+        if package not in ("src", "app") and cumulative > direct.get(package, 0):
+            direct[package] = cumulative
+    for package, cumulative in sorted(direct.items(), key=lambda p: -p[1])[:top]:
+        logger.info(f"{package:<32} {cumulative / 1e6:8.3f}s")
+    logger.info("--- Project modules (cumulative, includes their imports) ---")
+    project = [r for r in rows if r[0] in ("src", "app") or r[0].startswith("src.")]
+    for name, _, self_us, cumulative in sorted(project, key=lambda r: -r[3])[:top]:
+        logger.info(f"{name:<32} {cumulative / 1e6:8.3f}s  (self {self_us / 1e6:.3f}s)")
+    logger.info("--- Initialization (first call) ---")
+    for label, seconds in timings.items():
+        logger.info(f"{label:<32} {seconds:8.3f}s" if isinstance(seconds, float) else f"{label:<32} {seconds}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    top = int(args[args.index("--top") + 1]) if "--top" in args else 15
+    rows = import_times()
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        timings = pool.submit(init_times).result()
+    report(rows, timings, top)
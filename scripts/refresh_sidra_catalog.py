@@ -0,0 +1,20 @@
+import logging
+from src.ibge import discover_catalog, save_catalog, CATALOG_PATH
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    try:
+        logger.info("Reading SIDRA table 8888 metadata and availability snapshot...")
+        catalog = discover_catalog()
+        logger.info(f"Mapped {len(catalog['division_map'])} CNAE divisions to SIDRA categories.")
+        for code, class_id in sorted(catalog['division_map'].items()):
+            published = catalog['availability'].get(class_id, [])
+            logger.info(f"  {code} -> {class_id} ({catalog['categories'].get(class_id, '?')}): {len(published)} localidades")
+        save_catalog(catalog)
+        logger.info(f"Catalog saved to {CATALOG_PATH}")
+    except Exception as e:
+        logger.error(f"SIDRA discovery failed: {e}")
+        exit(1)
@@ -0,0 +1,248 @@
+"""
+Full warehouse reload as one dependency graph.
+
+Replaces running create_bq_tables.py / reload_refs.py / refresh_cnae_dimension.py /
+ingest_data_bq.py and the derived builds by hand. Each table load is its own step,
+so the main tables, the six references and the derived builds run concurrently
+(bounded by --jobs; CPU-bound local parsing runs one table at a time):
+
+    empresas, estabelecimentos    ingest_data_bq, from local files or the bucket (--bucket)
+    naturezas ... qualificacoes   ingest_data_bq, from local files or the bucket (--bucket)
+    cnae_dimension                refresh_cnae_dimension (IBGE API -> Parquet)
+    cnae_artifact                 build_cnae_artifact (curated CSV -> npz)
+    seasonal_flows                build_seasonal_flows, after the main tables
+
+Both modes run the sharded manifest pipeline (run_pipeline) into the same
+partitioned tables, so alternating between them only loads the files that changed.
+Before running, a step fingerprints its inputs (local file stats, GCS md5s, BigQuery
+table modification times, file hashes); if they match the last successful run the
+step is skipped. Failed steps are retried with exponential backoff, dependents of a
+step that still fails are blocked, and a per-step timing report closes the run.
+
+Usage: python -m scripts.reload_all [--jobs N] [--retries N] [--force] [--bucket] [--dry-run]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.config import BQ_DATASET, DATA_DIR, RELOAD_STATE_FILE
+from src.ingestion import discover_sources, table_for_file
+from src.ingestion.sources import split_source
+from src.ingestion.telemetry import emit
+from scripts.ingest_data_bq import DEFAULT_TABLES, get_bq_client, get_storage_client, ingest_tables_bq
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MAIN_TABLES = ["empresas", "estabelecimentos"]
+REF_TABLES = [t for t in DEFAULT_TABLES if t not in MAIN_TABLES]
+FAILED = ("failed", "blocked")
+
+def _digest(parts) -> str:
+    return hashlib.sha1("\n".join(str(p) for p in parts).encode()).hexdigest()
+
+def files_signature(sources) -> str:
+    """Name, size and mtime of the files behind the sources (zip members share their archive)."""
+    paths = sorted({split_source(s)[0] for s in sources})
+    return _digest(f"{os.path.basename(p)}:{os.path.getsize(p)}:{os.stat(p).st_mtime_ns}" for p in paths)
+
+def file_hash(path) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def table_signature(client, tables) -> str:
+    """Last modification and row count of BigQuery tables (changes on every load)."""
+    parts = []
+    for table in tables:
+        t = client.get_table(f"{client.project}.{BQ_DATASET}.{table}")
+        parts.append(f"{table}:{t.modified.isoformat()}:{t.num_rows}")
+    return _digest(parts)
+
+def build_steps(client, storage_client=None, use_bucket=False) -> dict:
+    """
+    Steps of the reload: name -> {script, deps, run, inputs, cpu}. `inputs` returns
+    the fingerprint compared with the last run (None = always run).
+    """
+    sources = {} if use_bucket else discover_sources(DATA_DIR)
+    use_bucket = use_bucket or not any(sources.get(t) for t in MAIN_TABLES)
+    steps = {}
+
+    bucket_uri = None
+    if use_bucket:
+        from scripts.create_bq_tables import resolve_bucket
+        bucket_uri = resolve_bucket(client, storage_client)
+        logger.info(f"Bucket mode: loading from {bucket_uri}")
+
+        @lru_cache(maxsize=1)
+        def bucket_md5s() -> dict:
+            by_table = {}
+            for blob in storage_client.list_blobs(bucket_uri.replace("gs://", "").split("/")[0]):
+                table = table_for_file(blob.name)
+                if table:
+                    by_table.setdefault(table, []).append(f"{blob.name}:{blob.md5_hash}")
+            return {table: _digest(sorted(names)) for table, names in by_table.items()}
+
+        signature = lambda t: bucket_md5s().get(t)
+    else:
+        logger.info(f"Local mode: loading RFB files from {DATA_DIR}")
+        signature = lambda t: files_signature(sources.get(t, []))
+
+    for table in DEFAULT_TABLES:
+        steps[table] = {
+            "script": "ingest_data_bq", "deps": [],
+            "run": lambda t=table: ingest_tables_bq([t], bucket_uri=bucket_uri),
+            "inputs": lambda t=table: signature(t),
+            # Main tables use every core to parse; references are a few KB
+            "cpu": table in MAIN_TABLES,
+        }
+
+    def refresh_cnae_dimension():
+        from scripts.refresh_cnae_dimension import fetch_cnae_data, process_cnae_data, save_data, OUTPUT_PATH
+        save_data(process_cnae_data(fetch_cnae_data()), OUTPUT_PATH)
+
+    def build_cnae_artifact():
+        from scripts.build_cnae_artifact import load_source
+        from src.cnae import ARTIFACT_PATH, build_artifact, save_artifact
+        save_artifact(build_artifact(load_source(from_api=False)), ARTIFACT_PATH)
+
+    def build_seasonal_flows():
+        from scripts.build_seasonal_flows import build_seasonal_flows as build
+        build()
+
+    from src.cnae import CSV_PATH
+    steps["cnae_dimension"] = {"script": "refresh_cnae_dimension", "deps": [], "run": refresh_cnae_dimension, "inputs": None}
+    steps["cnae_artifact"] = {
+        "script": "build_cnae_artifact", "deps": [], "run": build_cnae_artifact,
+        "inputs": lambda: file_hash(CSV_PATH),
+    }
+    steps["seasonal_flows"] = {
+        "script": "build_seasonal_flows", "deps": list(MAIN_TABLES), "run": build_seasonal_flows,
+        "inputs": lambda: table_signature(client, MAIN_TABLES),
+    }
+    return steps
+
+def load_state(path=RELOAD_STATE_FILE) -> dict:
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def save_state(state: dict, path=RELOAD_STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def execute(name: str, step: dict, previous: str, force=False, retries=2, backoff=10.0) -> dict:
+    """Runs one step (unless its inputs are unchanged), retrying with exponential backoff."""
+    t0 = time.time()
+    try:
+        fingerprint = step["inputs"]() if step.get("inputs") else None
+    except Exception as e:
+        logger.warning(f"{name}: could not fingerprint inputs ({e}); running")
+        fingerprint = None
+    if not force and fingerprint is not None and fingerprint == previous:
+        logger.info(f"{name}: inputs unchanged, skipped")
+        return {"status": "skipped", "attempts": 0, "seconds": time.time() - t0, "fingerprint": fingerprint}
+
+    for attempt in range(1, retries + 2):
+        logger.info(f"{name}: running {step['script']} (attempt {attempt})")
+        try:
+            step["run"]()
+            return {"status": "ok", "attempts": attempt, "seconds": time.time() - t0, "fingerprint": fingerprint}
+        except Exception as e:
+            if attempt > retries:
+                logger.error(f"{name}: failed after {attempt} attempts: {e}")
+                return {"status": "failed", "attempts": attempt, "seconds": time.time() - t0, "error": str(e)}
+            delay = backoff * 2 ** (attempt - 1)
+            logger.warning(f"{name}: {e}; retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+def run_dag(steps: dict, jobs=4, retries=2, backoff=10.0, force=False, state_path=RELOAD_STATE_FILE) -> dict:
+    """Runs the steps in dependency order, up to `jobs` at a time; returns the result per step."""
+    unknown = {d for s in steps.values() for d in s["deps"] if d not in steps}
+    if unknown:
+        raise ValueError(f"Unknown dependencies: {sorted(unknown)}")
+    state = load_state(state_path)
+    results, pending, running = {}, dict(steps), {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # Block dependents of failed steps (repeated so blocks propagate down chains)
+            blocked = True
+            while blocked:
+                blocked = [n for n, s in pending.items()
+                           if any(results.get(d, {}).get("status") in FAILED for d in s["deps"])]
+                for name in blocked:
+                    logger.error(f"{name}: blocked by a failed dependency")
+                    results[name] = {"status": "blocked", "attempts": 0, "seconds": 0.0}
+                    del pending[name]
+
+            for name in list(pending):
+                step = pending[name]
+                if len(running) >= jobs:
+                    break
+                if not all(d in results for d in step["deps"]):
+                    continue
+                if step.get("cpu") and any(steps[r].get("cpu") for r in running.values()):
+                    continue
+                del pending[name]
+                running[pool.submit(execute, name, step, state.get(name), force, retries, backoff)] = name
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle among: {sorted(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                emit("step", step=name, script=steps[name]["script"], status=results[name]["status"],
+                     attempts=results[name]["attempts"], seconds=round(results[name]["seconds"], 1))
+                # Fingerprint recorded only on success, so a failed step reruns next time
+                if results[name]["status"] == "ok" and results[name].get("fingerprint"):
+                    state[name] = results[name]["fingerprint"]
+                    save_state(state, state_path)
+    return results
+
+def report(steps: dict, results: dict, wall: float):
+    logger.info("--- Reload report ---")
+    for name, step in steps.items():
+        r = results.get(name, {"status": "not run", "attempts": 0, "seconds": 0.0})
+        logger.info(f"{name:<18} {step['script']:<24} {r['status']:<8} {r['attempts']} attempt(s) {r['seconds']:8.1f}s")
+    serial = sum(r["seconds"] for r in results.values())
+    logger.info(f"Wall time {wall:.1f}s (sum of steps {serial:.1f}s)")
+
+def print_plan(steps: dict):
+    """Steps grouped in waves: every step of a wave only depends on earlier waves."""
+    done, wave = set(), 1
+    while len(done) < len(steps):
+        ready = [n for n, s in steps.items() if n not in done and all(d in done for d in s["deps"])]
+        print(f"Wave {wave}: " + ", ".join(f"{n} ({steps[n]['script']})" for n in ready))
+        done.update(ready)
+        wave += 1
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+
+    def option(flag, default):
+        return type(default)(args[args.index(flag) + 1]) if flag in args else default
+
+    client = get_bq_client()
+    use_bucket = "--bucket" in args
+    steps = build_steps(client, get_storage_client(), use_bucket=use_bucket)
+    if "--dry-run" in args:
+        print_plan(steps)
+        exit(0)
+
+    t0 = time.time()
+    results = run_dag(steps, jobs=option("--jobs", 4), retries=option("--retries", 2), force="--force" in args)
+    report(steps, results, time.time() - t0)
+    if any(r["status"] in FAILED for r in results.values()):
+        exit(1)
@@ -1,14 +1,14 @@
-from google.cloud import bigquery, storage
-from google.oauth2 import service_account
-import os
-from src.config import BQ_DATASET, GCP_CREDENTIALS_JSON
+from src import clients
+from src.config import BQ_DATASET
+from src.ingestion.manifest import get_bucket_uri
+from scripts.ingest_data_bq import DEFAULT_TABLES, ingest_tables_bq
+
+REF_TABLES = [t for t in DEFAULT_TABLES if t not in ("empresas", "estabelecimentos")]
 
 def get_clients():
-    if os.path.exists(GCP_CREDENTIALS_JSON):
-        creds = service_account.Credentials.from_service_account_file(GCP_CREDENTIALS_JSON)
-        bq_client = bigquery.Client(credentials=creds)
-        st_client = storage.Client(credentials=creds)
-        return bq_client, st_client
+    # Service-account key from Streamlit secrets or the JSON file (src/clients.py)
+    if clients.credentials():
+        return clients.bigquery_client(), clients.storage_client()
     return None, None
 
 def find_target_bucket(st_client):
@@ -32,48 +32,19 @@ def reload_references():
         print("Erro de credenciais.")
         return
 
-    bucket_uri = find_target_bucket(st_client)
+    # Bucket recorded by the last load; scanning the project is the fallback
+    bucket_uri = get_bucket_uri(bq_client, BQ_DATASET) or find_target_bucket(st_client)
     if not bucket_uri:
         print("CRÍTICO: Nenhum bucket com arquivos CNPJ encontrado.")
         return
 
-    # --- REFERENCE TABLES ---
-    ref_tables = [
-        (".NATJUCSV", "naturezas"),
-        (".MUNICCSV", "municipios"),
-        (".CNAECSV", "cnaes"),
-        (".MOTICSV", "motivos"),
-        (".PAISCSV", "paises"),
-        (".QUALSCSV", "qualificacoes")
-    ]
-    
-    ref_schema = [
-        bigquery.SchemaField("codigo", "STRING"),
-        bigquery.SchemaField("descricao", "STRING")
-    ]
-    
-    ref_config = bigquery.LoadJobConfig(
-        schema=ref_schema,
-        skip_leading_rows=0, 
-        field_delimiter=";",
-        source_format=bigquery.SourceFormat.CSV,
-        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
-        allow_quoted_newlines=True,
-        encoding="ISO-8859-1"  # FIX ENCODING
-    )
-
+    # Same sharded pipeline and manifest as the main tables; force reloads unchanged files too
     print(f"\n--- Recarregando Tabelas de Referência de {bucket_uri} ---")
-    for suffix, table_name in ref_tables:
-        table_ref_id = f"{bq_client.project}.{BQ_DATASET}.{table_name}"
-        uri_ref = f"{bucket_uri}/*{suffix}"
-        
-        print(f"Recriando: {table_name}...")
-        try:
-            job = bq_client.load_table_from_uri(uri_ref, table_ref_id, job_config=ref_config)
-            job.result()
-            print(f"✅ {table_name} corrigida.")
-        except Exception as e:
-            print(f"❌ Erro em {table_name}: {e}")
+    try:
+        ingest_tables_bq(REF_TABLES, force=True, bucket_uri=bucket_uri)
+        print(f"✅ {', '.join(REF_TABLES)} recarregadas.")
+    except Exception as e:
+        print(f"❌ Erro ao recarregar referências: {e}")
 
 if __name__ == "__main__":
     reload_references()
@@ -0,0 +1,56 @@
+"""
+Process-wide registry of Google Cloud credentials and clients, created on first use.
+
+Streamlit runs the app script again on every interaction of every session, so the
+credentials and clients are built once per process and shared; nothing is created
+until a query actually needs it. Failures are not cached: the next call tries again.
+The google-cloud libraries are imported inside the factories (they are the slowest
+imports of the app).
+"""
+import os
+import threading
+from .config import GCP_PROJECT_ID, GCP_CREDENTIALS_JSON, GCP_CREDENTIALS_DICT
+
+_lock = threading.RLock()  # factories call credentials() while holding it
+_registry = {}
+
+def _get(name: str, factory):
+    with _lock:
+        if name not in _registry:
+            _registry[name] = factory()
+        return _registry[name]
+
+def _credentials():
+    from google.oauth2 import service_account
+    # Streamlit secrets (read by config) first, then the JSON key file
+    if GCP_CREDENTIALS_DICT:
+        return service_account.Credentials.from_service_account_info(GCP_CREDENTIALS_DICT)
+    if GCP_CREDENTIALS_JSON and os.path.exists(GCP_CREDENTIALS_JSON):
+        return service_account.Credentials.from_service_account_file(GCP_CREDENTIALS_JSON)
+    return None  # application default credentials (gcloud auth application-default login)
+
+def credentials():
+    """Service-account credentials, or None to use the application default ones."""
+    return _get("credentials", _credentials)
+
+def project_id() -> str:
+    if GCP_PROJECT_ID and GCP_PROJECT_ID != "seu-projeto-id":
+        return GCP_PROJECT_ID
+    return (GCP_CREDENTIALS_DICT or {}).get("project_id") or GCP_PROJECT_ID
+
+def bigquery_client():
+    def create():
+        from google.cloud import bigquery
+        return bigquery.Client(credentials=credentials(), project=project_id())
+    return _get("bigquery", create)
+
+def storage_client():
+    def create():
+        from google.cloud import storage
+        return storage.Client(credentials=credentials(), project=project_id())
+    return _get("storage", create)
+
+def reset():
+    """Drops every client (e.g. after rotating the service-account key)."""
+    with _lock:
+        _registry.clear()
@@ -0,0 +1,172 @@
+"""
+Precompiled CNAE hierarchy (division > group > class > subclass).
+
+`scripts/build_cnae_artifact.py` compiles the hierarchy (from the CSV produced by
+process_cnae.py, or from the IBGE API) into src/data/cnae_hierarchy.npz:
+
+    {level}_code      clean code ('05', '050', '05003', '0500301')
+    {level}_raw       code as published ('05', '05.0', '05.00-3', '0500-3/01')
+    {level}_label     option label 'code - description', nodes sorted by label
+    {level}_parent    index of the parent node (int32, -1 for divisions)
+    {level}_offsets   CSR offsets into {level}_children (children of node i are
+    {level}_children  children[offsets[i]:offsets[i + 1]], indices of the next level)
+    sub_class / sub_group / sub_division   subclass -> ancestor lookup tables
+
+The artifact is loaded lazily, once per process, with no cleanup at load time; the
+dependent filters read their option lists straight from it, memoized per selection.
+"""
+import os
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+ARTIFACT_PATH = os.path.join(os.path.dirname(__file__), "data", "cnae_hierarchy.npz")
+CSV_PATH = os.path.join(os.path.dirname(__file__), "data", "cnae_hierarchy.csv")
+
+LEVELS = ("div", "grp", "cls", "sub")
+PARENT = {"grp": "div", "cls": "grp", "sub": "cls"}
+CHILD = {parent: child for child, parent in PARENT.items()}
+INDUSTRIAL_DIVISIONS = tuple(f"{d:02d}" for d in range(5, 34))
+
+def _clean(code) -> str:
+    return re.sub(r'[^\w]', '', str(code))
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per subclass with raw code and description per level, from either the
+    process_cnae.py CSV or the IBGE API Parquet (refresh_cnae_dimension.py).
+    """
+    if 'subclasse_code' in df.columns:
+        columns = {
+            'div': ('divisao_code', 'divisao_desc'), 'grp': ('grupo_code', 'grupo_desc'),
+            'cls': ('classe_code', 'classe_desc'), 'sub': ('subclasse_code', 'desc'),
+        }
+    else:
+        columns = {
+            'div': ('id_divisao', 'desc_divisao'), 'grp': ('id_grupo', 'desc_grupo'),
+            'cls': ('id_classe', 'desc_classe'), 'sub': ('id_subclasse', 'desc_subclasse'),
+        }
+    out = pd.DataFrame()
+    for level, (code_col, desc_col) in columns.items():
+        out[f"{level}_raw"] = df[code_col].astype(str).str.replace(r'\.0$', '', regex=True) if level == 'div' \
+            else df[code_col].astype(str)
+        out[f"{level}_desc"] = df[desc_col].fillna('').astype(str)
+    out['div_raw'] = out['div_raw'].str.zfill(2)
+    return out.drop_duplicates('sub_raw').reset_index(drop=True)
+
+def build_artifact(df: pd.DataFrame) -> dict:
+    """Arrays of the artifact from a hierarchy DataFrame (see normalize_frame)."""
+    flat = normalize_frame(df)
+    arrays, index_of = {}, {}
+    for level in LEVELS:
+        nodes = flat.drop_duplicates(f"{level}_raw")
+        raw = nodes[f"{level}_raw"].tolist()
+        codes = [_clean(r) for r in raw]
+        # Subclass options show the clean code (it is what the queries filter on)
+        shown = codes if level == 'sub' else raw
+        labels = [f"{s} - {d}" for s, d in zip(shown, nodes[f"{level}_desc"])]
+        order = np.argsort(np.array(labels, dtype=str), kind='stable')
+        arrays[f"{level}_code"] = np.array(codes, dtype=str)[order]
+        arrays[f"{level}_raw"] = np.array(raw, dtype=str)[order]
+        arrays[f"{level}_label"] = np.array(labels, dtype=str)[order]
+        index_of[level] = {raw_code: i for i, raw_code in enumerate(arrays[f"{level}_raw"])}
+
+    # Parent of each node, from the first subclass row that contains it
+    arrays["div_parent"] = np.full(len(arrays["div_code"]), -1, dtype=np.int32)
+    for level, parent in PARENT.items():
+        first = flat.drop_duplicates(f"{level}_raw").set_index(f"{level}_raw")[f"{parent}_raw"]
+        arrays[f"{level}_parent"] = np.array(
+            [index_of[parent][first[r]] for r in arrays[f"{level}_raw"]], dtype=np.int32
+        )
+
+    # CSR children lists
+    for parent, child in CHILD.items():
+        parents_of_child = arrays[f"{child}_parent"]
+        children = np.argsort(parents_of_child, kind='stable').astype(np.int32)
+        counts = np.bincount(parents_of_child, minlength=len(arrays[f"{parent}_code"]))
+        arrays[f"{parent}_children"] = children
+        arrays[f"{parent}_offsets"] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+
+    # Subclass -> class -> group -> division lookups
+    arrays["sub_class"] = arrays["sub_parent"]
+    arrays["sub_group"] = arrays["cls_parent"][arrays["sub_class"]]
+    arrays["sub_division"] = arrays["grp_parent"][arrays["sub_group"]]
+    return arrays
+
+def save_artifact(arrays: dict, path: str = ARTIFACT_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, **arrays)
+
+@lru_cache(maxsize=1)
+def load_artifact(path: str = ARTIFACT_PATH) -> dict:
+    """The artifact's arrays (empty dict if neither the artifact nor the source CSV exist)."""
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as npz:
+            return {key: npz[key] for key in npz.files}
+    # Not built yet: compile in memory from the CSV (same code path as the build step)
+    if os.path.exists(CSV_PATH):
+        return build_artifact(pd.read_csv(CSV_PATH, dtype=str))
+    return {}
+
+@lru_cache(maxsize=None)
+def _label_index(level: str) -> dict:
+    a = load_artifact()
+    return dict(zip(a[f"{level}_label"].tolist(), a[f"{level}_code"].tolist()))
+
+@lru_cache(maxsize=None)
+def _code_index(level: str) -> dict:
+    return {code: i for i, code in enumerate(load_artifact()[f"{level}_code"].tolist())}
+
+def is_available() -> bool:
+    return bool(load_artifact())
+
+def codes(level: str) -> list:
+    """Clean codes of a level, in label order."""
+    return load_artifact()[f"{level}_code"].tolist()
+
+def labels(level: str, codes=None) -> list:
+    """Sorted option labels of a level, optionally restricted to clean `codes`."""
+    if codes is None:
+        return load_artifact()[f"{level}_label"].tolist()
+    return list(_labels_of(level, frozenset(codes)))
+
+@lru_cache(maxsize=1024)
+def _labels_of(level: str, codes: frozenset) -> tuple:
+    a = load_artifact()
+    mask = np.isin(a[f"{level}_code"], list(codes))
+    return tuple(a[f"{level}_label"][mask].tolist())
+
+def _children(level: str, parent_indices) -> np.ndarray:
+    """Sorted node indices of `level` below the given parent-level node indices."""
+    a = load_artifact()
+    parent = PARENT[level]
+    offsets, children = a[f"{parent}_offsets"], a[f"{parent}_children"]
+    picked = [children[offsets[i]:offsets[i + 1]] for i in parent_indices]
+    # Nodes are stored in label order, so sorted indices give sorted labels
+    return np.sort(np.concatenate(picked)) if picked else np.array([], dtype=np.int32)
+
+def descendant_labels(level: str, ancestor_level: str, codes) -> list:
+    """
+    Sorted labels of `level` nodes below clean `codes` of `ancestor_level` (the
+    parent level for direct children, or any higher level, e.g. subclasses of divisions).
+    """
+    return list(_descendant_labels(level, ancestor_level, tuple(codes)))
+
+@lru_cache(maxsize=1024)
+def _descendant_labels(level: str, ancestor_level: str, codes: tuple) -> tuple:
+    # Memoized per selection: a rerun with the same cascade is a dict lookup
+    index = _code_index(ancestor_level)
+    current_level, nodes = ancestor_level, [index[c] for c in codes if c in index]
+    while current_level != level:
+        current_level = CHILD[current_level]
+        nodes = _children(current_level, nodes)
+    return tuple(load_artifact()[f"{level}_label"][nodes].tolist())
+
+def child_labels(level: str, parent_codes) -> list:
+    """Sorted labels of `level` nodes under the given clean codes of the parent level."""
+    return descendant_labels(level, PARENT[level], parent_codes)
+
+def code_of(level: str, label: str) -> str:
+    """Clean code of an option label."""
+    return _label_index(level).get(label, _clean(label.split(" - ")[0]))
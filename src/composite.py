@@ -0,0 +1,127 @@
+"""
+Composite PIM-PF index for multi-sector selections.
+
+IBGE publishes one series per CNAE division, so a selection of several divisions
+has no official index. The composite is the weighted mean of the divisions' fixed
+base indices (weights from the CNPJ base), and every variation shown by the macro
+view is derived from it using the same definitions as SIDRA table 8888.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+from .ibge import fetch_sectors_data, UF_NAMES, VAR_MAP
+
+INDEX_VARIABLE = 'Índice Base Fixa (2022=100)'
+SA_INDEX_VARIABLE = 'Índice Base Fixa (Sazonal)'
+VARIABLE_IDS = {name: var_id for var_id, name in VAR_MAP.items()}
+
+WEIGHT_OPTIONS = {
+    'count': 'Estabelecimentos',
+    'capital': 'Capital Social'
+}
+
+def build_weight_table(df_weights: pd.DataFrame, weight_by: str = 'count') -> pd.DataFrame:
+    """
+    Turns CNPJ counts per division x UF (sector_code, uf, count, capital) into a
+    location x sector weight matrix keyed by SIDRA locality names ('Brasil' = national sum).
+    """
+    if df_weights is None or df_weights.empty or weight_by not in df_weights.columns:
+        return pd.DataFrame()
+
+    df = df_weights.copy()
+    df['location'] = df['uf'].map(UF_NAMES)
+    df = df.dropna(subset=['location'])
+    df[weight_by] = pd.to_numeric(df[weight_by], errors='coerce').fillna(0.0)
+
+    regional = df.pivot_table(index='location', columns='sector_code', values=weight_by, aggfunc='sum', fill_value=0.0)
+    national = regional.sum().to_frame('Brasil').T
+    return pd.concat([national, regional]).astype(float)
+
+def _derive_variations(levels: pd.DataFrame) -> pd.DataFrame:
+    """SIDRA-style variations from composite levels (index: location, date; columns: index variables)."""
+    by_loc = levels.groupby(level='location', sort=False)
+    out = pd.DataFrame(index=levels.index)
+    out[INDEX_VARIABLE] = levels[INDEX_VARIABLE]
+    if SA_INDEX_VARIABLE in levels.columns:
+        out[SA_INDEX_VARIABLE] = levels[SA_INDEX_VARIABLE]
+        out['Variação Mensal (Sazonal)'] = by_loc[SA_INDEX_VARIABLE].pct_change(fill_method=None) * 100
+
+    idx = levels[INDEX_VARIABLE]
+    out['Variação Mensal (YoY)'] = by_loc[INDEX_VARIABLE].pct_change(12, fill_method=None) * 100
+
+    # Year-to-date: Jan..M of this year vs Jan..M of last year
+    years = levels.index.get_level_values('date').year
+    ytd_sum = idx.groupby([levels.index.get_level_values('location'), years]).cumsum()
+    ytd_prev = ytd_sum.groupby(level='location', sort=False).shift(12)
+    out['Acumulado no Ano (YTD)'] = (ytd_sum / ytd_prev - 1) * 100
+
+    # 12 months: last 12 months vs the 12 before
+    sum_12m = by_loc[INDEX_VARIABLE].rolling(12, min_periods=12).sum().reset_index(level=0, drop=True)
+    prev_12m = sum_12m.groupby(level='location', sort=False).shift(12)
+    out['Acumulado 12 Meses (%)'] = (sum_12m / prev_12m - 1) * 100
+    return out
+
+def compute_composite_index(df_sectors: pd.DataFrame, weights: pd.DataFrame) -> pd.DataFrame:
+    """
+    Weighted composite of per-sector PIM-PF series.
+
+    Args:
+        df_sectors: long table from fetch_sectors_data (date, location, variable, value, sector).
+        weights: location x sector matrix from build_weight_table (empty = equal weights).
+
+    Returns:
+        Long table with the same columns as fetch_industry_data, so the macro view can
+        render it unchanged. A location is kept only when every selected sector is
+        published there for the whole window (a partial mix would not be comparable).
+    """
+    if df_sectors.empty:
+        return pd.DataFrame()
+
+    levels_long = df_sectors[df_sectors['variable'].isin([INDEX_VARIABLE, SA_INDEX_VARIABLE])]
+    panel = levels_long.pivot_table(
+        index=['variable', 'location', 'date'], columns='sector', values='value', aggfunc='first'
+    ).sort_index()
+    if panel.empty:
+        return pd.DataFrame()
+
+    sectors = panel.columns
+    values = panel.to_numpy(dtype=float)
+
+    # Weights aligned row by row; locations without CNPJ weights use the national mix
+    locations = panel.index.get_level_values('location')
+    if weights is None or weights.empty:
+        w = np.ones(values.shape)
+    else:
+        w_table = weights.reindex(columns=sectors).fillna(0.0)
+        national = w_table.loc['Brasil'] if 'Brasil' in w_table.index else pd.Series(1.0, index=sectors)
+        w_table = w_table.reindex(locations.unique())
+        w_table = w_table.apply(lambda row: national if row.isna().all() or row.sum() == 0 else row, axis=1)
+        w = w_table.reindex(locations).to_numpy(dtype=float)
+
+    present = ~np.isnan(values)
+    weighted = np.where(present, values * w, 0.0).sum(axis=1)
+    total_w = np.where(present, w, 0.0).sum(axis=1)
+    composite = np.divide(weighted, total_w, out=np.full(len(values), np.nan), where=total_w > 0)
+
+    # Require full coverage per (variable, location)
+    complete = pd.Series(present.all(axis=1), index=panel.index)
+    complete = complete.groupby(level=['variable', 'location']).transform('all')
+
+    levels = pd.Series(composite, index=panel.index)[complete.to_numpy()]
+    if levels.empty:
+        return pd.DataFrame()
+    levels = levels.unstack('variable')
+    levels.columns.name = None
+    if INDEX_VARIABLE not in levels.columns:
+        return pd.DataFrame()
+
+    derived = _derive_variations(levels)
+    df = derived.stack().rename('value').reset_index()
+    df = df.rename(columns={df.columns[2]: 'variable'})
+    df['variable_id'] = df['variable'].map(VARIABLE_IDS)
+    return df.dropna(subset=['value'])[['date', 'location', 'variable_id', 'value', 'variable']]
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=32)
+def get_composite_industry_data(sector_codes: tuple, weights: pd.DataFrame) -> pd.DataFrame:
+    """Composite series for a sector set, cached by (sorted sectors, weights)."""
+    return compute_composite_index(fetch_sectors_data(tuple(sorted(sector_codes))), weights)
@@ -6,14 +6,16 @@ import json
 DB_TYPE = os.getenv("DB_TYPE", "bigquery") 
 DB_FILE = DATA_DIR / "cnpj_data.db"
 STATUS_FILE = DATA_DIR / "ingestion_status.json"
+METRICS_FILE = DATA_DIR / "ingestion_metrics.jsonl"  # Append-only per-stage throughput log
+INGESTION_WORK_DIR = DATA_DIR / ".ingestion_work"   # Parquet parts + chunk checkpoints (kept across crashes)
+RELOAD_STATE_FILE = INGESTION_WORK_DIR / "reload_state.json"  # Input fingerprints of the last successful reload steps
 _local_key = DATA_DIR / "service_account.json"
-_secrets_key = DATA_DIR / "service_account_secrets.json"
+GCP_CREDENTIALS_DICT = None
 try:
     import streamlit as st
     if "gcp_service_account" in st.secrets:
-        with open(_secrets_key, "w") as f:
-            json.dump(dict(st.secrets["gcp_service_account"]), f)
-        GCP_CREDENTIALS_JSON = str(_secrets_key)
+        # Used in memory by src/clients.py; no key file is written to disk
+        GCP_CREDENTIALS_JSON = None
         GCP_CREDENTIALS_DICT = dict(st.secrets["gcp_service_account"])
         if "project_id" in st.secrets["gcp_service_account"]:
             os.environ["GCP_PROJECT_ID"] = st.secrets["gcp_service_account"]["project_id"]
@@ -36,6 +38,7 @@ except (ImportError, FileNotFoundError, Exception):
         GCP_CREDENTIALS_DICT = None
 GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID", "seu-projeto-id")
 BQ_DATASET = os.getenv("BQ_DATASET", "cnpj_raw")
+GCS_STAGING_URI = os.getenv("GCS_STAGING_URI")  # e.g. gs://bucket/staging (enables one load job per table)
 if GCP_CREDENTIALS_JSON and (GCP_PROJECT_ID == "seu-projeto-id" or not GCP_PROJECT_ID):
     try:
         with open(GCP_CREDENTIALS_JSON, "r") as f:
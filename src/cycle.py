@@ -0,0 +1,138 @@
+"""
+Business-cycle diagnosis for PIM-PF series.
+
+Classifies every (sector, location, month) into one of four phases using the
+short-term pulse (monthly seasonally adjusted variation) and the structural
+trend (12-month accumulated variation), in one vectorized pass.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+from .ibge import fetch_sectors_data, get_division_groups
+
+MOM_VARIABLE = 'Variação Mensal (Sazonal)'
+ACC12_VARIABLE = 'Acumulado 12 Meses (%)'
+
+PHASE_ORDER = ['Expansão', 'Desaceleração', 'Recuperação', 'Contração']
+PHASES = {
+    'Expansão': {
+        'title': "FASE DE EXPANSÃO",
+        'msg': "Resumo: O setor vive um **Ciclo Virtuoso**. O crescimento recente (Ritmo) é positivo e sustenta a alta de longo prazo (Tendência).",
+        'type': "success",
+        'color': '#2ca02c'
+    },
+    'Desaceleração': {
+        'title': "FASE DE DESACELERAÇÃO",
+        'msg': "Resumo: **Alerta Amarelo**. A tendência estrutural ainda é positiva (acumulado 12m cresce), mas o ritmo mensal perdeu força.",
+        'type': "warning",
+        'color': '#f59e0b'
+    },
+    'Recuperação': {
+        'title': "FASE DE RECUPERAÇÃO",
+        'msg': "Resumo: **Sinais de Melhora**. O setor ainda acumula perdas no longo prazo, mas o ritmo recente voltou a acelerar.",
+        'type': "info",
+        'color': '#3b82f6'
+    },
+    'Contração': {
+        'title': "FASE DE CONTRAÇÃO",
+        'msg': "Resumo: **Sinal Vermelho**. Retração generalizada tanto no ritmo atual quanto no histórico de 12 meses.",
+        'type': "error",
+        'color': '#d62728'
+    }
+}
+
+def classify_phase(mom, acc12) -> str:
+    """Scalar phase rule (same thresholds as the vectorized engine)."""
+    if mom > 0 and acc12 > 0:
+        return 'Expansão'
+    elif mom < 0 and acc12 > 0:
+        return 'Desaceleração'
+    elif mom > 0 and acc12 < 0:
+        return 'Recuperação'
+    return 'Contração'
+
+def _classify_phases(mom: np.ndarray, acc12: np.ndarray) -> np.ndarray:
+    conditions = [
+        (mom > 0) & (acc12 > 0),
+        (mom < 0) & (acc12 > 0),
+        (mom > 0) & (acc12 < 0),
+    ]
+    return np.select(conditions, PHASE_ORDER[:3], default='Contração')
+
+def _compounded_momentum(grouped_log_growth, window: int) -> pd.Series:
+    # Compounded variation (%) over the last `window` months, from monthly variations
+    total = grouped_log_growth.rolling(window, min_periods=window).sum()
+    total = total.reset_index(level=[0, 1], drop=True)
+    return np.expm1(total) * 100
+
+def compute_cycle_panel(df_long: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds the cycle panel from a long PIM-PF table (date, location, variable, value[, sector]).
+
+    Returns one row per sector x location x month with the phase, the previous phase,
+    a transition flag, the duration of the current phase (months) and the 3/6-month
+    compounded momentum of the seasonally adjusted monthly variation.
+    """
+    if df_long.empty or 'variable' not in df_long.columns:
+        return pd.DataFrame()
+
+    df = df_long[df_long['variable'].isin([MOM_VARIABLE, ACC12_VARIABLE])]
+    if 'sector' not in df.columns:
+        df = df.assign(sector='Geral')
+
+    wide = df.pivot_table(
+        index=['sector', 'location', 'date'], columns='variable', values='value', aggfunc='first'
+    )
+    if MOM_VARIABLE not in wide.columns or ACC12_VARIABLE not in wide.columns:
+        return pd.DataFrame()
+
+    wide = wide.dropna(subset=[MOM_VARIABLE, ACC12_VARIABLE]).sort_index()
+    wide = wide.rename(columns={MOM_VARIABLE: 'mom', ACC12_VARIABLE: 'acc12'})
+    wide.columns.name = None
+
+    wide['phase'] = _classify_phases(wide['mom'].to_numpy(), wide['acc12'].to_numpy())
+
+    by_series = wide.groupby(level=['sector', 'location'], sort=False)
+    wide['previous_phase'] = by_series['phase'].shift(1)
+    wide['is_transition'] = wide['previous_phase'].notna() & (wide['phase'] != wide['previous_phase'])
+
+    # A run starts at every phase change or at the first month of a series
+    run_id = (wide['phase'] != wide['previous_phase']).cumsum()
+    wide['phase_duration'] = wide.groupby(run_id).cumcount() + 1
+
+    log_growth = np.log1p(wide['mom'] / 100)
+    grouped_log_growth = log_growth.groupby(level=['sector', 'location'], sort=False)
+    wide['momentum_3m'] = _compounded_momentum(grouped_log_growth, 3)
+    wide['momentum_6m'] = _compounded_momentum(grouped_log_growth, 6)
+
+    return wide.reset_index()
+
+def get_phase_transitions(panel: pd.DataFrame) -> pd.DataFrame:
+    """History of phase changes (one row per transition)."""
+    if panel.empty:
+        return panel
+    cols = ['sector', 'location', 'date', 'previous_phase', 'phase', 'mom', 'acc12']
+    return panel.loc[panel['is_transition'], cols].sort_values('date', ascending=False)
+
+def get_latest_phases(panel: pd.DataFrame) -> pd.DataFrame:
+    """Latest available month of each sector x location series."""
+    if panel.empty:
+        return panel
+    latest_idx = panel.groupby(['sector', 'location'], sort=False)['date'].idxmax()
+    return panel.loc[latest_idx].reset_index(drop=True)
+
+def _panel_sector_groups():
+    """One entry per published category: {first division code: panel label} ('05-09' when shared)."""
+    return {codes[0]: codes[0] if len(codes) == 1 else f"{codes[0]}-{codes[-1]}"
+            for codes in get_division_groups().values()}
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=16)
+def get_sector_cycle_panel(sector_codes: tuple = None) -> pd.DataFrame:
+    """Cycle panel for every sector x location, computed once per hour for all users."""
+    if sector_codes is None:
+        groups = _panel_sector_groups()
+        df = fetch_sectors_data(tuple(groups))
+        if not df.empty:
+            df['sector'] = df['sector'].map(groups)
+        return compute_cycle_panel(df)
+    return compute_cycle_panel(fetch_sectors_data(tuple(sector_codes)))
@@ -83,11 +83,17 @@ class SQLiteDatabase:
         finally:
             conn.close()
 
+_database = None
+
 def get_database():
-    if DB_TYPE == "bigquery":
-        from .database_bq import BigQueryDatabase
-        return BigQueryDatabase()
-    else:
-        return SQLiteDatabase()
+    """One database object per process; reruns and sessions share it."""
+    global _database
+    if _database is None:
+        if DB_TYPE == "bigquery":
+            from .database_bq import BigQueryDatabase
+            _database = BigQueryDatabase()
+        else:
+            _database = SQLiteDatabase()
+    return _database
 
 CNPJDatabase = get_database
@@ -1,56 +1,41 @@
-import os
 import pandas as pd
 import streamlit as st  # <--- Importante: Adicionamos isso
 from google.cloud import bigquery
-from google.oauth2 import service_account
-from .config import GCP_PROJECT_ID, BQ_DATASET, GCP_CREDENTIALS_JSON, GCP_CREDENTIALS_DICT, PROJECT_SCOPE_ONLY
+from . import clients, singleflight
+from .config import BQ_DATASET, PROJECT_SCOPE_ONLY
 import unicodedata
 
+# Wide text columns of an establishment, left out of the listings (see get_company_details)
+DETAIL_COLUMNS = (
+    "tipo_logradouro", "logradouro", "numero", "complemento", "bairro", "cep",
+    "ddd_1", "telefone_1", "correio_eletronico",
+)
+
 class BigQueryDatabase:
     def __init__(self):
-        self.project_id = GCP_PROJECT_ID
+        # Credentials and client come from the process-wide registry (src/clients.py)
+        # and are created on the first query, not when the page starts
+        self.project_id = clients.project_id()
         self.dataset_id = BQ_DATASET
-        self.credentials = None
-        self.client = None
-        
-        # --- LÓGICA DE AUTENTICAÇÃO ATUALIZADA ---
-        
-        # 1. Tenta pegar direto das Secrets do Streamlit (Prioridade para Cloud)
-        # O nome "gcp_service_account" deve ser o mesmo que você colocou no cabeçalho [gcp_service_account] nas Secrets
-        if "gcp_service_account" in st.secrets:
-            try:
-                # Converte o objeto de secrets para um dicionário Python normal
-                key_dict = dict(st.secrets["gcp_service_account"])
-                
-                self.credentials = service_account.Credentials.from_service_account_info(key_dict)
-                
-                # Se o project_id não estiver no config, tenta pegar da chave
-                if not self.project_id:
-                    self.project_id = key_dict.get("project_id")
-                    
-            except Exception as e:
-                st.error(f"Erro ao ler Streamlit Secrets: {e}")
 
-        # 2. Se não achou nas Secrets, tenta pelo dicionário do Config (Fallback)
-        elif GCP_CREDENTIALS_DICT:
-            self.credentials = service_account.Credentials.from_service_account_info(GCP_CREDENTIALS_DICT)
-            
-        # 3. Se ainda não tem credencial, tenta arquivo JSON Local (Fallback Local)
-        elif GCP_CREDENTIALS_JSON:
-            if os.path.exists(GCP_CREDENTIALS_JSON):
-                self.credentials = service_account.Credentials.from_service_account_file(GCP_CREDENTIALS_JSON)
-        
-        # --- INICIALIZAÇÃO DO CLIENTE ---
-        
+    @property
+    def client(self):
+        """Shared BigQuery client, or None if it cannot be created (retried on the next call)."""
         try:
-            if self.credentials:
-                self.client = bigquery.Client(credentials=self.credentials, project=self.project_id)
-            else:
-                # Tenta autenticação padrão (gcloud auth application-default login)
-                self.client = bigquery.Client(project=self.project_id)
+            return clients.bigquery_client()
         except Exception as e:
-            # Captura erro na inicialização do client para não quebrar o app inteiro de cara
-            st.error(f"Falha ao iniciar cliente BigQuery: {e}")
+            print(f"BQ Client Error: {e}")
+            return None
+
+    def _query_df(self, sql: str, job_config=None) -> pd.DataFrame:
+        """
+        Runs a query into a DataFrame. Identical queries (same SQL and parameters) already
+        running in this process, e.g. from other sessions, share that job instead of
+        submitting a new one.
+        """
+        params = [p.to_api_repr() for p in (job_config.query_parameters if job_config else [])]
+        key = singleflight.fingerprint("bq", self.project_id, sql, params)
+        return singleflight.do(key, lambda: self.client.query(sql, job_config=job_config).to_dataframe())
 
     def get_total_companies(self) -> int:
         """Returns the total number of companies in the BigQuery table."""
@@ -85,7 +70,7 @@ class BigQueryDatabase:
                 e.natureza_juridica,
                 n.descricao as natureza_desc,
                 e.qualificacao_responsavel,
-                SAFE_CAST(REPLACE(e.capital_social, ',', '.') AS FLOAT64) as capital_social,
+                SAFE_CAST(REPLACE(CAST(e.capital_social AS STRING), ',', '.') AS FLOAT64) as capital_social,
                 e.porte_empresa,
                 e.ente_federativo,
                 st.uf,
@@ -138,7 +123,7 @@ class BigQueryDatabase:
         # NO LIMIT for global search - show ALL matching results
         sql = f"{base_query} WHERE {where_cond} {order_by}"
         
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
 
     def get_stats_natureza_juridica(self, limit: int = 10) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
@@ -156,7 +141,7 @@ class BigQueryDatabase:
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("limit_val", "INT64", limit)]
         )
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
 
     def get_stats_capital_social(self, limit: int = 10) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
@@ -165,9 +150,9 @@ class BigQueryDatabase:
         sql = f"""
             SELECT 
                 razao_social, 
-                SAFE_CAST(REPLACE(capital_social, ',', '.') AS FLOAT64) as capital_social
+                SAFE_CAST(REPLACE(CAST(capital_social AS STRING), ',', '.') AS FLOAT64) as capital_social
             FROM `{self.dataset_id}.empresas` 
-            WHERE SAFE_CAST(REPLACE(capital_social, ',', '.') AS FLOAT64) < 400000000000
+            WHERE SAFE_CAST(REPLACE(CAST(capital_social AS STRING), ',', '.') AS FLOAT64) < 400000000000
               AND porte_empresa NOT IN ('01', '03')
             ORDER BY capital_social DESC 
             LIMIT @limit_val
@@ -175,23 +160,23 @@ class BigQueryDatabase:
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("limit_val", "INT64", limit)]
         )
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
 
     def get_all_naturezas(self) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
         sql = f"SELECT codigo, descricao FROM `{self.dataset_id}.naturezas` ORDER BY descricao"
-        return self.client.query(sql).to_dataframe()
+        return self._query_df(sql)
 
     def get_all_cnaes(self) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
         sql = f"SELECT codigo, descricao FROM `{self.dataset_id}.cnaes` ORDER BY descricao"
-        return self.client.query(sql).to_dataframe()
+        return self._query_df(sql)
 
     def _fetch_ibge_municipios(self) -> pd.DataFrame:
         try:
             import requests
             url = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
-            response = requests.get(url, timeout=5)
+            response = singleflight.do(singleflight.fingerprint("ibge", url), lambda: requests.get(url, timeout=5))
             if response.status_code == 200:
                 data = response.json()
                 rows = []
@@ -215,7 +200,7 @@ class BigQueryDatabase:
         # Revert SQL (Remove 'uf' as it likely caused the crash)
         sql = f"SELECT codigo, descricao FROM `{self.dataset_id}.municipios` ORDER BY descricao"
         try:
-            df_bq = self.client.query(sql).to_dataframe()
+            df_bq = self._query_df(sql)
         except Exception as e:
             print(f"BQ Query Error: {e}")
             return pd.DataFrame()
@@ -303,7 +288,7 @@ class BigQueryDatabase:
                  params.append(bigquery.ScalarQueryParameter("search_name", "STRING", f"%{search_term.upper()}%"))
 
         # Capital Filter
-        capital_expr = "SAFE_CAST(REPLACE(e.capital_social, ',', '.') AS FLOAT64)"
+        capital_expr = "SAFE_CAST(REPLACE(CAST(e.capital_social AS STRING), ',', '.') AS FLOAT64)"
         if min_capital > 0:
             where_clauses.append(f"{capital_expr} >= @min_cap")
             params.append(bigquery.ScalarQueryParameter("min_cap", "FLOAT64", min_capital))
@@ -415,7 +400,7 @@ class BigQueryDatabase:
                 e.cnpj_basico,
                 e.razao_social, 
                 e.porte_empresa,
-                SAFE_CAST(REPLACE(e.capital_social, ',', '.') AS FLOAT64) as capital_social,
+                SAFE_CAST(REPLACE(CAST(e.capital_social AS STRING), ',', '.') AS FLOAT64) as capital_social,
                 e.natureza_juridica,
                 n.descricao as natureza_desc,
                 st.cnae_fiscal_principal,
@@ -427,18 +412,8 @@ class BigQueryDatabase:
                 st.data_inicio_atividade,
                 st.cnpj_ordem,
                 st.cnpj_dv,
-                st.identificador_matriz_filial,
-                -- Address Fields
-                st.tipo_logradouro,
-                st.logradouro,
-                st.numero,
-                st.complemento,
-                st.bairro,
-                st.cep,
-                -- Contact Fields
-                st.ddd_1,
-                st.telefone_1,
-                st.correio_eletronico
+                st.identificador_matriz_filial
+                -- Address and contact fields: get_company_details, for the rows that need them
             FROM `{self.dataset_id}.empresas` e
             JOIN `{self.dataset_id}.estabelecimentos` st 
                 ON e.cnpj_basico = st.cnpj_basico
@@ -450,7 +425,28 @@ class BigQueryDatabase:
             {limit_sql}
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
+
+    def get_company_details(self, keys) -> pd.DataFrame:
+        """
+        Address and contact columns of the given establishments, in one query.
+        keys: (cnpj_basico, cnpj_ordem, cnpj_dv) tuples, as returned by get_filtered_companies.
+        """
+        if not self.client or not keys: return pd.DataFrame()
+        basicos = sorted({k[0] for k in keys})
+        sql = f"""
+            SELECT
+                st.cnpj_basico, st.cnpj_ordem, st.cnpj_dv,
+                {", ".join(f"st.{c}" for c in DETAIL_COLUMNS)}
+            FROM `{self.dataset_id}.estabelecimentos` st
+            WHERE st.cnpj_basico IN UNNEST(@basicos)
+              AND CONCAT(st.cnpj_basico, st.cnpj_ordem, st.cnpj_dv) IN UNNEST(@keys)
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ArrayQueryParameter("basicos", "STRING", basicos),
+            bigquery.ArrayQueryParameter("keys", "STRING", sorted("".join(k) for k in keys)),
+        ])
+        return self._query_df(sql, job_config)
 
     def get_opening_trend(self, **kwargs) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
@@ -472,7 +468,32 @@ class BigQueryDatabase:
             ORDER BY month_year
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
+
+    def get_opening_panel(self, **kwargs) -> pd.DataFrame:
+        """
+        Monthly openings per division and UF in a single scan (month_year, sector_code, uf, count).
+        Feeds the batch analytics that need every sector x UF series at once.
+        """
+        if not self.client: return pd.DataFrame()
+        params = []
+        where_clause = self._build_where_clause(params, **kwargs)
+        where_sql = f"WHERE {where_clause} AND st.uf != 'EX'" if where_clause else "WHERE st.uf != 'EX'"
+
+        sql = f"""
+            SELECT
+                SUBSTR(st.data_inicio_atividade, 1, 6) as month_year,
+                SUBSTR(st.cnae_fiscal_principal, 1, 2) as sector_code,
+                st.uf,
+                count(*) as count
+            FROM `{self.dataset_id}.empresas` e
+            JOIN `{self.dataset_id}.estabelecimentos` st
+                ON e.cnpj_basico = st.cnpj_basico
+            {where_sql}
+            GROUP BY month_year, sector_code, st.uf
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=params)
+        return self._query_df(sql, job_config)
 
     def get_geo_distribution(self, **kwargs) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
@@ -496,7 +517,7 @@ class BigQueryDatabase:
             ORDER BY count DESC
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
 
     def get_benchmark_geo(self) -> pd.DataFrame:
         """
@@ -516,7 +537,7 @@ class BigQueryDatabase:
             AND st.uf != 'EX' -- Exclude Exterior from Benchmark too
             GROUP BY st.uf
         """
-        return self.client.query(sql).to_dataframe()
+        return self._query_df(sql)
 
     def get_city_distribution(self, **kwargs) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
@@ -536,7 +557,7 @@ class BigQueryDatabase:
             LIMIT 10
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
 
     def get_sector_distribution(self, **kwargs) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
@@ -558,7 +579,36 @@ class BigQueryDatabase:
             LIMIT 10
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
+
+    def get_sector_weights(self, **kwargs) -> pd.DataFrame:
+        """
+        Returns establishment counts and headquarters capital per division and UF.
+        Used to weight the composite PIM-PF index of a multi-sector selection.
+        """
+        if not self.client: return pd.DataFrame()
+        params = []
+        where_clause = self._build_where_clause(params, **kwargs)
+        if where_clause:
+            where_sql = f"WHERE {where_clause} AND st.uf != 'EX'"
+        else:
+            where_sql = "WHERE st.uf != 'EX'"
+
+        # Capital is declared per company (cnpj_basico): count it once, on the Matriz
+        sql = f"""
+            SELECT
+                SUBSTR(st.cnae_fiscal_principal, 1, 2) as sector_code,
+                st.uf,
+                count(*) as count,
+                SUM(IF(st.identificador_matriz_filial = '1', SAFE_CAST(REPLACE(CAST(e.capital_social AS STRING), ',', '.') AS FLOAT64), 0)) as capital
+            FROM `{self.dataset_id}.empresas` e
+            JOIN `{self.dataset_id}.estabelecimentos` st
+                ON e.cnpj_basico = st.cnpj_basico
+            {where_sql}
+            GROUP BY sector_code, st.uf
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=params)
+        return self._query_df(sql, job_config)
 
     def get_closing_trend(self, **kwargs) -> pd.DataFrame:
         if not self.client: return pd.DataFrame()
@@ -585,7 +635,42 @@ class BigQueryDatabase:
             ORDER BY month_year
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
+
+    def get_seasonal_flows(self, kind: str = 'abertura', sectors=None, ufs=None, portes=None) -> pd.DataFrame:
+        """
+        Pre-computed decomposition of openings ('abertura', 'abertura_ativa') or closings ('baixa'),
+        summed over the selected divisions/UFs/portes (month_year, count, trend, adjusted).
+        Built by scripts/build_seasonal_flows.py; components are additive, so sums stay valid.
+        """
+        if not self.client: return pd.DataFrame()
+        params = [bigquery.ScalarQueryParameter("kind", "STRING", kind)]
+        where_clauses = ["kind = @kind"]
+        if sectors:
+            clean_sectors = [s for s in sectors if len(s) == 2 and s.isdigit()]
+            if clean_sectors:
+                params.append(bigquery.ArrayQueryParameter("sectors", "STRING", clean_sectors))
+                where_clauses.append("sector_code IN UNNEST(@sectors)")
+        if ufs:
+            params.append(bigquery.ArrayQueryParameter("ufs", "STRING", list(ufs)))
+            where_clauses.append("uf IN UNNEST(@ufs)")
+        if portes:
+            params.append(bigquery.ArrayQueryParameter("portes", "STRING", list(portes)))
+            where_clauses.append("porte IN UNNEST(@portes)")
+
+        sql = f"""
+            SELECT
+                month_year,
+                SUM(count) as count,
+                SUM(trend) as trend,
+                SUM(adjusted) as adjusted
+            FROM `{self.dataset_id}.fluxos_sazonais`
+            WHERE {" AND ".join(where_clauses)}
+            GROUP BY month_year
+            ORDER BY month_year
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=params)
+        return self._query_df(sql, job_config)
 
     def get_aggregation_metrics(self, **kwargs) -> dict:
         if not self.client: return {"count": 0, "avg_cap": 0.0}
@@ -596,7 +681,7 @@ class BigQueryDatabase:
         sql = f"""
             SELECT 
                 count(*) as total_count,
-                avg(SAFE_CAST(REPLACE(e.capital_social, ',', '.') AS FLOAT64)) as avg_capital
+                avg(SAFE_CAST(REPLACE(CAST(e.capital_social AS STRING), ',', '.') AS FLOAT64)) as avg_capital
             FROM `{self.dataset_id}.empresas` e
             JOIN `{self.dataset_id}.estabelecimentos` st 
                 ON e.cnpj_basico = st.cnpj_basico
@@ -604,7 +689,7 @@ class BigQueryDatabase:
             {where_sql}
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        df = self.client.query(sql, job_config=job_config).to_dataframe()
+        df = self._query_df(sql, job_config)
         
         if not df.empty:
             capital = df.iloc[0]['avg_capital']
@@ -644,7 +729,7 @@ class BigQueryDatabase:
             ORDER BY category
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
 
     def get_legal_nature_profile(self, **kwargs) -> pd.DataFrame:
         """Returns the distribution of companies by legal nature bucket."""
@@ -683,4 +768,4 @@ class BigQueryDatabase:
             ORDER BY count DESC
         """
         job_config = bigquery.QueryJobConfig(query_parameters=params)
-        return self.client.query(sql, job_config=job_config).to_dataframe()
+        return self._query_df(sql, job_config)
@@ -1,10 +1,22 @@
+import re
+import json
+import datetime
 import requests
 import pandas as pd
 import streamlit as st
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from . import singleflight
 BASE_URL = "https://servicodados.ibge.gov.br/api/v3/agregados/8888"
 VARIABLES = "12606,12607,11601,11602,11603,11604"
+GENERAL_INDUSTRY_ID = '129314'
+CLASSIFICATION_ID = '544'
+ALL_LOCALITIES = "N1[all]|N3[all]"
+MAX_PARALLEL_REQUESTS = 6
+CATALOG_PATH = Path(__file__).parent / "data" / "sidra_catalog.json"
+EXTRACTIVE_DIVISIONS = ['05', '06', '07', '08', '09']
 CNAE_TO_IBGE_MAP = {
     '10': '129317', '11': '129318', '12': '129319', '13': '129320', '14': '129321',
     '15': '129322', '16': '129323', '17': '129324', '18': '129325', '19': '129326',
@@ -12,62 +24,229 @@ CNAE_TO_IBGE_MAP = {
     '25': '129334', '26': '129335', '27': '129336', '28': '129337', '29': '129338',
     '30': '129339', '31': '129340', '32': '129341', '33': '129342'
 }
-@st.cache_data(ttl=3600)
+UF_NAMES = {
+    'AC': 'Acre', 'AL': 'Alagoas', 'AP': 'Amapá', 'AM': 'Amazonas', 'BA': 'Bahia',
+    'CE': 'Ceará', 'DF': 'Distrito Federal', 'ES': 'Espírito Santo', 'GO': 'Goiás',
+    'MA': 'Maranhão', 'MT': 'Mato Grosso', 'MS': 'Mato Grosso do Sul', 'MG': 'Minas Gerais',
+    'PA': 'Pará', 'PB': 'Paraíba', 'PR': 'Paraná', 'PE': 'Pernambuco', 'PI': 'Piauí',
+    'RJ': 'Rio de Janeiro', 'RN': 'Rio Grande do Norte', 'RS': 'Rio Grande do Sul',
+    'RO': 'Rondônia', 'RR': 'Roraima', 'SC': 'Santa Catarina', 'SP': 'São Paulo',
+    'SE': 'Sergipe', 'TO': 'Tocantins'
+}
+# IBGE locality codes of the UFs (N3 level of SIDRA)
+UF_CODES = {
+    'RO': '11', 'AC': '12', 'AM': '13', 'RR': '14', 'PA': '15', 'AP': '16', 'TO': '17',
+    'MA': '21', 'PI': '22', 'CE': '23', 'RN': '24', 'PB': '25', 'PE': '26', 'AL': '27',
+    'SE': '28', 'BA': '29', 'MG': '31', 'ES': '32', 'RJ': '33', 'SP': '35', 'PR': '41',
+    'SC': '42', 'RS': '43', 'MS': '50', 'MT': '51', 'GO': '52', 'DF': '53'
+}
+VAR_MAP = {
+    '12606': 'Índice Base Fixa (2022=100)',
+    '12607': 'Índice Base Fixa (Sazonal)',
+    '11601': 'Variação Mensal (Sazonal)',
+    '11602': 'Variação Mensal (YoY)',
+    '11603': 'Acumulado no Ano (YTD)',
+    '11604': 'Acumulado 12 Meses (%)'
+}
+
+def _get_session():
+    # Configuration for Robust Request
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# --- SIDRA CATALOG (Classification Discovery) ---
+
+def _parse_division_map(categories):
+    """
+    Builds CNAE division -> category id from the category names of classification 544
+    (e.g. '3.10 Fabricação de produtos alimentícios'). Divisions without their own
+    category (extractive 05-09) fall back to the section category ('2 Indústrias extrativas').
+    """
+    division_map = {}
+    section_extractive = None
+    for cat in sorted(categories, key=lambda c: c.get('nivel', 0)):
+        name = cat['nome'].strip()
+        match = re.match(r'^\d+\.(\d{2})\s', name)
+        if match:
+            division_map.setdefault(match.group(1), str(cat['id']))
+        elif re.match(r'^\d+\s', name) and 'extrativ' in name.lower():
+            section_extractive = str(cat['id'])
+    if section_extractive:
+        for div in EXTRACTIVE_DIVISIONS:
+            division_map.setdefault(div, section_extractive)
+    return division_map
+
+def _parse_availability(data):
+    """(category id -> localities with at least one published value) from a classificacao=544[all] response."""
+    availability = {}
+    for var_item in data:
+        for result in var_item['resultados']:
+            cat_ids = list(result['classificacoes'][0]['categoria'].keys())
+            for series_item in result['series']:
+                values = pd.to_numeric(pd.Series(list(series_item['serie'].values()), dtype=object), errors='coerce')
+                if values.notna().any():
+                    for cat_id in cat_ids:
+                        availability.setdefault(str(cat_id), set()).add(series_item['localidade']['nome'])
+    return {k: sorted(v) for k, v in availability.items()}
+
+def discover_catalog(recent_periods=12):
+    """
+    Reads the SIDRA table metadata and one all-categories x all-localities snapshot
+    (two requests in total) and returns the catalog dict persisted by save_catalog.
+    """
+    session = _get_session()
+    meta = session.get(f"{BASE_URL}/metadados", timeout=60)
+    meta.raise_for_status()
+    classification = next(c for c in meta.json()['classificacoes'] if str(c['id']) == CLASSIFICATION_ID)
+    categories = classification['categorias']
+
+    # Fixed base index (12606) is enough to know whether a series is published
+    url = f"{BASE_URL}/periodos/-{recent_periods}/variaveis/12606?localidades={ALL_LOCALITIES}&classificacao={CLASSIFICATION_ID}[all]"
+    snapshot = session.get(url, timeout=120)
+    snapshot.raise_for_status()
+
+    return {
+        "generated_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "categories": {str(c['id']): c['nome'] for c in categories},
+        "division_map": _parse_division_map(categories),
+        "availability": _parse_availability(snapshot.json())
+    }
+
+def save_catalog(catalog, path=CATALOG_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+
+@st.cache_data(max_entries=1)
+def load_catalog():
+    """Persisted SIDRA catalog, or None when scripts/refresh_sidra_catalog.py was never run."""
+    if not CATALOG_PATH.exists():
+        return None
+    try:
+        with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"SIDRA catalog unreadable: {e}")
+        return None
+
+def get_division_map():
+    catalog = load_catalog()
+    if catalog and catalog.get('division_map'):
+        return catalog['division_map']
+    return CNAE_TO_IBGE_MAP
+
+def get_division_groups():
+    """SIDRA category id -> the CNAE divisions it publishes, sorted ('05'..'09' share one)."""
+    groups = {}
+    for code, class_id in sorted(get_division_map().items()):
+        groups.setdefault(class_id, []).append(code)
+    return groups
+
+def resolve_class_id(sector_code=None):
+    """Maps a CNAE division (or label like '10 - Alimentos') to its SIDRA category id."""
+    if not sector_code:
+        return GENERAL_INDUSTRY_ID
+    clean_code = sector_code.split(' ')[0].split('.')[0]
+    return get_division_map().get(clean_code, GENERAL_INDUSTRY_ID)
+
+def has_sector_series(sector_code):
+    return resolve_class_id(sector_code) != GENERAL_INDUSTRY_ID
+
+def get_available_locations(class_id):
+    """Published localities for a category; None when unknown (no catalog)."""
+    catalog = load_catalog()
+    if not catalog:
+        return None
+    return catalog.get('availability', {}).get(str(class_id), [])
+
+def resolve_location(class_id, location="Brasil"):
+    """Best published locality for a category: the intended one, else Brasil."""
+    available = get_available_locations(class_id)
+    if available is None or location in available:
+        return location
+    return "Brasil"
+
+def _localities_for(class_id):
+    # Only the UFs the catalog lists for the category (none when it is national-only)
+    available = get_available_locations(class_id)
+    if available is None:
+        return ALL_LOCALITIES
+    codes = [UF_CODES[uf] for uf, name in UF_NAMES.items() if name in available]
+    if len(codes) == len(UF_CODES):
+        return ALL_LOCALITIES
+    return f"N1[all]|N3[{','.join(sorted(codes))}]" if codes else "N1[all]"
+
+def _download_series(class_id, localities=ALL_LOCALITIES):
+    """Downloads one PIM-PF category (all variables, last 120 months). Raises on HTTP errors."""
+    url = f"{BASE_URL}/periodos/-120/variaveis/{VARIABLES}?localidades={localities}&classificacao=544[{class_id}]"
+    # Concurrent downloads of the same series (other sessions, other cached callers) share one request
+    return singleflight.do(singleflight.fingerprint("ibge", url), lambda: _parse_series(_get_session().get(url, timeout=60)))
+
+def _parse_series(response):
+    response.raise_for_status()
+    data = response.json()
+    rows = []
+    for var_item in data:
+        var_id = var_item['id']
+        for series_item in var_item['resultados'][0]['series']:
+            location = series_item['localidade']['nome']
+            for date_str, value_str in series_item['serie'].items():
+                rows.append((date_str, location, var_id, value_str))
+    df = pd.DataFrame(rows, columns=['date', 'location', 'variable_id', 'value'])
+    if df.empty:
+        return df
+    # Parse once per column instead of once per cell
+    df['date'] = pd.to_datetime(df['date'], format='%Y%m')
+    df['value'] = pd.to_numeric(df['value'], errors='coerce')
+    df['variable'] = df['variable_id'].map(VAR_MAP)
+    return df.dropna(subset=['value'])
+
+@st.cache_data(ttl=3600, max_entries=64)
 def fetch_industry_data(sector_code=None):
-    class_id = '129314'
-    if sector_code:
-        clean_code = sector_code.split(' ')[0].split('.')[0]
-        class_id = CNAE_TO_IBGE_MAP.get(clean_code, '129314')
-    url = f"{BASE_URL}/periodos/-120/variaveis/{VARIABLES}?localidades=N1[all]|N3[all]&classificacao=544[{class_id}]"
+    class_id = resolve_class_id(sector_code)
     try:
-        # Configuration for Robust Request
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-
-        response = session.get(url, timeout=60)
-        response.raise_for_status()
-        data = response.json()
-        rows = []
-        for var_item in data:
-            var_id = var_item['id'] 
-            for series_item in var_item['resultados'][0]['series']:
-                location = series_item['localidade']['nome']
-                series_data = series_item['serie']
-                for date_str, value_str in series_data.items():
-                    date = pd.to_datetime(date_str, format='%Y%m')
-                    try:
-                        value = float(value_str)
-                    except (ValueError, TypeError):
-                        value = None
-                    rows.append({
-                        'date': date,
-                        'location': location,
-                        'variable_id': var_id,
-                        'value': value
-                    })
-        df = pd.DataFrame(rows)
-        if df.empty:
-            return df
-        var_map = {
-            '12606': 'Índice Base Fixa (2022=100)',
-            '12607': 'Índice Base Fixa (Sazonal)',
-            '11601': 'Variação Mensal (Sazonal)',
-            '11602': 'Variação Mensal (YoY)',
-            '11603': 'Acumulado no Ano (YTD)',
-            '11604': 'Acumulado 12 Meses (%)'
-        }
-        df['variable'] = df['variable_id'].map(var_map)
-        return df.dropna(subset=['value'])
+        return _download_series(class_id, _localities_for(class_id))
     except Exception as e:
         st.error(f"Erro ao buscar dados do IBGE: {e}")
         return pd.DataFrame()
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=32)
+def fetch_sectors_data(sector_codes: tuple) -> pd.DataFrame:
+    """
+    Downloads several PIM-PF sector series concurrently and stacks them in one long table.
+    Returns the same columns as fetch_industry_data plus 'sector' (CNAE division code).
+    Sectors that fail or are not published are skipped.
+    """
+    codes = [c for c in dict.fromkeys(sector_codes) if has_sector_series(c)]
+    if not codes:
+        return pd.DataFrame()
+    # Divisions sharing a category (extractive 05-09) are downloaded once
+    class_ids = list(dict.fromkeys(resolve_class_id(c) for c in codes))
+
+    def _fetch(class_id):
+        try:
+            return _download_series(class_id, _localities_for(class_id))
+        except Exception as e:
+            print(f"IBGE API Error ({class_id}): {e}")
+            return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as pool:
+        by_class = dict(zip(class_ids, pool.map(_fetch, class_ids)))
+
+    frames = [by_class[resolve_class_id(c)].assign(sector=c) for c in codes if not by_class[resolve_class_id(c)].empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
 def get_latest_metrics(df, location="Brasil"):
     if df.empty: return {}, None
     loc_df = df[df['location'] == location]
@@ -0,0 +1,10 @@
+"""
+RFB CNPJ ingestion (layouts, Arrow reader, parallel BigQuery pipeline and CDC).
+
+The package exports only what runs without google-cloud (layouts, sources, reader);
+the BigQuery pipeline is imported from src.ingestion.pipeline.
+"""
+
+from .schemas import LAYOUTS, bq_schema, column_names, key_columns, table_for_file
+from .sources import discover_sources, expand_sources, open_source
+from .reader import read_file, iter_tables, sanitize, decode_decimal, decode_date
@@ -0,0 +1,161 @@
+"""
+Change data capture between monthly RFB snapshots.
+
+Each release is loaded into a snapshot table (same layout as the serving table) and
+diffed against the hashes of the previous one:
+
+    {table}_hashes   key columns + FARM_FINGERPRINT of the content + rfb_shard
+    {table}_delta    insert / delete / change / move events, partitioned by
+                     snapshot_date, with the new row values (NULL for deletes)
+
+Only the delta is merged into the serving table and the hash table, inside one
+transaction, so a refresh scales with churn and the delta table keeps the history
+of status, address, CNAE and capital changes.
+"""
+import logging
+from google.cloud import bigquery
+from .schemas import LAYOUTS, SHARD_COLUMN, key_columns
+
+logger = logging.getLogger(__name__)
+
+HASHES_SUFFIX = "_hashes"
+DELTA_SUFFIX = "_delta"
+SNAPSHOT_PREFIX = "_snapshot_"
+EVENTS = ("insert", "delete", "change", "move")  # move: same content, different shard
+
+def snapshot_table(table: str) -> str:
+    return f"{SNAPSHOT_PREFIX}{table}"
+
+def content_columns(table: str) -> list:
+    keys = set(key_columns(table))
+    return [name for name, _ in LAYOUTS[table]["columns"] if name not in keys]
+
+def _hash_expr(table: str, alias: str) -> str:
+    fields = ", ".join(f"{alias}.{c}" for c in content_columns(table))
+    return f"FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({fields})))"
+
+def _dedup(table: str) -> str:
+    # RFB occasionally repeats a key; keep one row so MERGE sees a single source row per key
+    return f"WHERE TRUE QUALIFY ROW_NUMBER() OVER (PARTITION BY {', '.join(key_columns(table))} ORDER BY {SHARD_COLUMN[0]} DESC) = 1"
+
+def _on(keys: list, left: str, right: str) -> str:
+    return " AND ".join(f"{left}.{k} = {right}.{k}" for k in keys)
+
+def delta_schema(table: str) -> list:
+    keys = set(key_columns(table))
+    columns = LAYOUTS[table]["columns"]
+    return (
+        [bigquery.SchemaField("snapshot_date", "DATE"), bigquery.SchemaField("event", "STRING")]
+        + [bigquery.SchemaField(name, bq_type) for name, bq_type in columns if name in keys]
+        + [bigquery.SchemaField("row_hash", "INT64"), bigquery.SchemaField("prev_hash", "INT64")]
+        + [bigquery.SchemaField(name, bq_type) for name, bq_type in columns if name not in keys]
+        + [bigquery.SchemaField(*SHARD_COLUMN)]
+    )
+
+def ensure_cdc_tables(client, dataset: str, table: str):
+    """
+    Creates the delta table and, on the first run, seeds the hash table from the
+    current serving table (so the first diff is against what is being served).
+    """
+    if not key_columns(table):
+        raise ValueError(f"{table} has no key columns for change data capture")
+    keys = key_columns(table)
+    delta = bigquery.Table(f"{client.project}.{dataset}.{table}{DELTA_SUFFIX}", schema=delta_schema(table))
+    delta.time_partitioning = bigquery.TimePartitioning(field="snapshot_date")
+    delta.clustering_fields = ["event", keys[0]]
+    client.create_table(delta, exists_ok=True)
+
+    hashes_id = f"{client.project}.{dataset}.{table}{HASHES_SUFFIX}"
+    try:
+        client.get_table(hashes_id)
+        return
+    except Exception as e:
+        if "Not found" not in str(e) and "404" not in str(e):
+            raise
+    logger.info(f"{table}: seeding {table}{HASHES_SUFFIX} from the serving table")
+    sql = f"""
+        CREATE TABLE `{dataset}.{table}{HASHES_SUFFIX}`
+        CLUSTER BY {', '.join(keys)} AS
+        SELECT {', '.join('t.' + k for k in keys)}, {_hash_expr(table, 't')} AS row_hash, t.{SHARD_COLUMN[0]}
+        FROM `{dataset}.{table}` t
+        {_dedup(table)}
+    """
+    client.query(sql).result()
+
+def _date_param(snapshot_date):
+    return bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter("snapshot_date", "DATE", snapshot_date)])
+
+def build_delta(client, dataset: str, table: str, snapshot_date) -> dict:
+    """
+    Hash-joins the snapshot against the previous hashes and writes the events of
+    `snapshot_date` (replacing them on a re-run). Returns {event: rows}.
+    """
+    keys = key_columns(table)
+    content = content_columns(table)
+    shard = SHARD_COLUMN[0]
+    delta_columns = [f.name for f in delta_schema(table)]
+    sql = f"""
+        DELETE FROM `{dataset}.{table}{DELTA_SUFFIX}` WHERE snapshot_date = @snapshot_date;
+
+        INSERT INTO `{dataset}.{table}{DELTA_SUFFIX}` ({', '.join(delta_columns)})
+        WITH cur AS (
+            SELECT s.*, {_hash_expr(table, 's')} AS row_hash
+            FROM `{dataset}.{snapshot_table(table)}` s
+            {_dedup(table)}
+        )
+        SELECT
+            @snapshot_date,
+            CASE
+                WHEN p.row_hash IS NULL THEN 'insert'
+                WHEN c.row_hash IS NULL THEN 'delete'
+                WHEN c.row_hash != p.row_hash THEN 'change'
+                ELSE 'move'
+            END,
+            {', '.join(f'COALESCE(c.{k}, p.{k})' for k in keys)},
+            c.row_hash, p.row_hash,
+            {', '.join(f'c.{col}' for col in content)},
+            c.{shard}
+        FROM cur c
+        FULL OUTER JOIN `{dataset}.{table}{HASHES_SUFFIX}` p ON {_on(keys, 'c', 'p')}
+        WHERE p.row_hash IS NULL OR c.row_hash IS NULL
+           OR c.row_hash != p.row_hash OR c.{shard} != p.{shard};
+    """
+    client.query(sql, job_config=_date_param(snapshot_date)).result()
+
+    counts_sql = f"""
+        SELECT event, COUNT(*) as n
+        FROM `{dataset}.{table}{DELTA_SUFFIX}`
+        WHERE snapshot_date = @snapshot_date
+        GROUP BY event
+    """
+    rows = client.query(counts_sql, job_config=_date_param(snapshot_date)).result()
+    return {row.event: row.n for row in rows}
+
+def apply_delta(client, dataset: str, table: str, snapshot_date):
+    """Merges the events of `snapshot_date` into the serving and hash tables in one transaction."""
+    keys = key_columns(table)
+    shard = SHARD_COLUMN[0]
+    values = content_columns(table) + [shard]
+    columns = keys + values
+    sql = f"""
+        BEGIN TRANSACTION;
+
+        MERGE `{dataset}.{table}` t
+        USING (SELECT * FROM `{dataset}.{table}{DELTA_SUFFIX}` WHERE snapshot_date = @snapshot_date) d
+        ON {_on(keys, 't', 'd')}
+        WHEN MATCHED AND d.event = 'delete' THEN DELETE
+        WHEN MATCHED THEN UPDATE SET {', '.join(f'{c} = d.{c}' for c in values)}
+        WHEN NOT MATCHED AND d.event != 'delete' THEN
+            INSERT ({', '.join(columns)}) VALUES ({', '.join(f'd.{c}' for c in columns)});
+
+        MERGE `{dataset}.{table}{HASHES_SUFFIX}` h
+        USING (SELECT * FROM `{dataset}.{table}{DELTA_SUFFIX}` WHERE snapshot_date = @snapshot_date) d
+        ON {_on(keys, 'h', 'd')}
+        WHEN MATCHED AND d.event = 'delete' THEN DELETE
+        WHEN MATCHED THEN UPDATE SET row_hash = d.row_hash, {shard} = d.{shard}
+        WHEN NOT MATCHED AND d.event != 'delete' THEN
+            INSERT ({', '.join(keys)}, row_hash, {shard}) VALUES ({', '.join(f'd.{k}' for k in keys)}, d.row_hash, d.{shard});
+
+        COMMIT TRANSACTION;
+    """
+    client.query(sql, job_config=_date_param(snapshot_date)).result()
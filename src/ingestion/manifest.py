@@ -0,0 +1,167 @@
+"""
+Ingestion manifest: one row per RFB file (shard) loaded into BigQuery.
+
+Keyed by release (the '.D51213.' stamp of the file name), file name, size and
+checksum. The incremental loader compares the current sources against it and only
+processes new or changed shards; it also records where the raw files live, so the
+maintenance scripts no longer need to scan every bucket of the project.
+"""
+import os
+import re
+import base64
+import hashlib
+import zipfile
+import datetime
+import pandas as pd
+from google.cloud import bigquery
+from .sources import split_source, source_name, gcs_blob
+
+MANIFEST_TABLE = "ingestion_manifest"
+MANIFEST_SCHEMA = [
+    bigquery.SchemaField("release", "STRING"),
+    bigquery.SchemaField("release_date", "DATE"),
+    bigquery.SchemaField("table_name", "STRING"),
+    bigquery.SchemaField("file_name", "STRING"),
+    bigquery.SchemaField("shard", "INT64"),
+    bigquery.SchemaField("size_bytes", "INT64"),
+    bigquery.SchemaField("checksum", "STRING"),
+    bigquery.SchemaField("source", "STRING"),
+    bigquery.SchemaField("bucket_uri", "STRING"),
+    bigquery.SchemaField("rows", "INT64"),
+    bigquery.SchemaField("loaded_at", "TIMESTAMP"),
+]
+HASH_BLOCK = 8 * 1024 * 1024
+DELETED = "deleted"
+
+def parse_release(file_name: str):
+    """'K3241.K03200Y0.D51213.EMPRECSV' -> ('D51213', date(2025, 12, 13)); (None, None) if absent."""
+    match = re.search(r'\.D(\d)(\d{2})(\d{2})\.', file_name.upper())
+    if not match:
+        return None, None
+    year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    try:
+        return f"D{match.group(1)}{match.group(2)}{match.group(3)}", datetime.date(2020 + year, month, day)
+    except ValueError:
+        return f"D{match.group(1)}{match.group(2)}{match.group(3)}", None
+
+def shard_of(file_name: str) -> int:
+    """Shard number of a split file ('...K03200Y7...' -> 7); single-file tables are shard 0."""
+    match = re.search(r'Y(\d+)\.', file_name.upper())
+    return int(match.group(1)) if match else 0
+
+def _file_md5(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _blob_checksum(blob) -> str:
+    # GCS stores the MD5 of uploaded objects (base64): same 'md5:<hex>' as a local file.
+    # Composite objects only carry a CRC32C
+    if blob.md5_hash:
+        return f"md5:{base64.b64decode(blob.md5_hash).hex()}"
+    return f"crc32c:{base64.b64decode(blob.crc32c).hex()}"
+
+def describe_source(source: str, table: str, bucket_uri: str = None) -> dict:
+    """
+    Manifest entry of a source. Zip members use the CRC32 and size stored in the
+    archive directory (no decompression); plain files are hashed with MD5, or use the
+    MD5 GCS already stores for bucket objects.
+    """
+    archive, member = split_source(source)
+    name = source_name(source)
+    if member is not None:
+        blob = gcs_blob(archive) if archive.startswith("gs://") else None
+        with (blob.open("rb") if blob else open(archive, "rb")) as raw, zipfile.ZipFile(raw) as zf:
+            info = zf.getinfo(member)
+        size, checksum = info.file_size, f"crc32:{info.CRC:08x}"
+    elif archive.startswith("gs://"):
+        blob = gcs_blob(archive)
+        blob.reload()
+        size, checksum = blob.size, _blob_checksum(blob)
+    else:
+        size, checksum = os.path.getsize(archive), f"md5:{_file_md5(archive)}"
+    release, release_date = parse_release(name)
+    return {
+        "release": release, "release_date": release_date, "table_name": table,
+        "file_name": name, "shard": shard_of(name), "size_bytes": size,
+        "checksum": checksum, "source": source, "bucket_uri": bucket_uri,
+    }
+
+def ensure_manifest(client, dataset: str):
+    table_id = f"{client.project}.{dataset}.{MANIFEST_TABLE}"
+    client.create_table(bigquery.Table(table_id, schema=MANIFEST_SCHEMA), exists_ok=True)
+    return table_id
+
+def read_manifest(client, dataset: str) -> pd.DataFrame:
+    """Latest entry per (table, shard)."""
+    sql = f"""
+        SELECT * EXCEPT(rn) FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY table_name, shard ORDER BY loaded_at DESC) as rn
+            FROM `{dataset}.{MANIFEST_TABLE}`
+        )
+        WHERE rn = 1
+    """
+    return client.query(sql).to_dataframe()
+
+def _checksum_kind(checksum) -> str:
+    return str(checksum).split(":", 1)[0]
+
+def _unchanged(known: tuple, entry: dict) -> bool:
+    if known is None:
+        return False
+    file_name, size, checksum = known
+    if (file_name, size) != (entry["file_name"], int(entry["size_bytes"])):
+        return False
+    # The same file seen as a zip member (crc32) and extracted (md5): name and size decide
+    return checksum == entry["checksum"] or _checksum_kind(checksum) != _checksum_kind(entry["checksum"])
+
+def changed_entries(entries: list, manifest: pd.DataFrame) -> list:
+    """
+    Entries whose (table, shard) is new or whose file name, size or checksum differ
+    (checksums of different kinds are not compared).
+    """
+    if manifest is None or manifest.empty:
+        return list(entries)
+    known = {
+        (row.table_name, int(row.shard)): (row.file_name, int(row.size_bytes), row.checksum)
+        for row in manifest.itertuples()
+    }
+    return [e for e in entries if not _unchanged(known.get((e["table_name"], e["shard"])), e)]
+
+def stale_shards(entries: list, manifest: pd.DataFrame, table: str) -> list:
+    """Shards loaded before that are absent from the current release."""
+    if manifest is None or manifest.empty:
+        return []
+    current = {e["shard"] for e in entries if e["table_name"] == table}
+    live = manifest[(manifest["table_name"] == table) & (manifest["checksum"] != DELETED)]
+    return sorted(set(live["shard"].astype(int)) - current)
+
+def tombstone(table: str, shard: int) -> dict:
+    """Manifest entry marking a shard whose partition was dropped."""
+    return {"table_name": table, "shard": shard, "file_name": None, "size_bytes": 0, "checksum": DELETED, "rows": 0}
+
+def record_entries(client, dataset: str, entries: list):
+    """Appends entries (with 'rows' filled in) once their shard has been swapped in."""
+    if not entries:
+        return
+    df = pd.DataFrame(entries)
+    df["loaded_at"] = pd.Timestamp.now(tz="UTC")
+    df = df.reindex(columns=[f.name for f in MANIFEST_SCHEMA])
+    job_config = bigquery.LoadJobConfig(schema=MANIFEST_SCHEMA, write_disposition="WRITE_APPEND")
+    client.load_table_from_dataframe(df, f"{client.project}.{dataset}.{MANIFEST_TABLE}", job_config=job_config).result()
+
+def get_bucket_uri(client, dataset: str):
+    """Bucket of the most recent load, or None (no manifest yet)."""
+    sql = f"""
+        SELECT bucket_uri FROM `{dataset}.{MANIFEST_TABLE}`
+        WHERE bucket_uri IS NOT NULL
+        ORDER BY loaded_at DESC
+        LIMIT 1
+    """
+    try:
+        rows = list(client.query(sql).result())
+    except Exception:
+        return None
+    return rows[0].bucket_uri if rows else None
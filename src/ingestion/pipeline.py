@@ -0,0 +1,353 @@
+"""
+Parallel, columnar ingestion of RFB files into BigQuery.
+
+Stages:
+    read    record-aligned byte blocks of each source (reported in MB/s too)
+    parse   sources (files or zip members, inflated as a stream) are read in a process
+            pool, one per worker, by the Arrow reader
+    clean   typed decoding on Arrow kernels (decimal commas -> float, date validation)
+    write   each byte block becomes a compressed Parquet part file
+    load    the parts of every pending shard go to one staging table in a single load
+            job (a wildcard URI from the GCS staging bucket, or one concatenated file
+            without it); each shard's row count is validated and its staged partition
+            copied over its partition of the serving table in a single atomic copy job
+
+Serving tables are integer-range partitioned by rfb_shard (the file number), and the
+ingestion manifest records every swapped shard: a re-run only touches new or changed
+files, and a crash leaves each partition either old or new, never half loaded.
+Every stage reports rows per second, and the parse workers checkpoint each written
+chunk (byte offset + rows) so a crashed run resumes inside a file; per-chunk and
+per-shard throughput go to the append-only metrics log (telemetry.py).
+"""
+import os
+import json
+import time
+import logging
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from google.cloud import bigquery
+from .schemas import LAYOUTS, SHARD_COLUMN, MAX_SHARDS, column_names, bq_schema
+from .reader import BLOCK_BYTES, iter_record_blocks, parse_block, convert_table
+from .sources import open_source, source_name
+from .manifest import describe_source, changed_entries, stale_shards, tombstone, record_entries, shard_of
+from .telemetry import emit, rate
+
+logger = logging.getLogger(__name__)
+
+PARQUET_COMPRESSION = 'zstd'
+LOAD_CONCURRENCY = 4
+UPLOAD_CONCURRENCY = 8
+STAGING_PREFIX = "_staging"
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+MB = 1024 * 1024
+
+def _arrow_schema(table: str) -> pa.Schema:
+    types = {"STRING": pa.string(), "FLOAT": pa.float64(), "INT64": pa.int64()}
+    return pa.schema([(name, types[bq_type]) for name, bq_type in LAYOUTS[table]["columns"] + [SHARD_COLUMN]])
+
+def checkpoint_path(out_dir: str, source: str) -> str:
+    return os.path.join(out_dir, f"{source_name(source).replace('.', '_')}{CHECKPOINT_SUFFIX}")
+
+def load_checkpoint(path: str, fingerprint: str) -> dict:
+    """
+    Committed chunks of an earlier run over the same file (same checksum, parts still
+    on disk); a fresh checkpoint otherwise. Without a fingerprint nothing is resumed.
+    """
+    fresh = {"fingerprint": fingerprint, "chunks": [], "complete": False}
+    if fingerprint is None:
+        return fresh
+    try:
+        with open(path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return fresh
+    if checkpoint.get("fingerprint") != fingerprint or not all(os.path.exists(c["part"]) for c in checkpoint["chunks"]):
+        return fresh
+    return checkpoint
+
+def _save_checkpoint(path: str, checkpoint: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+def _parse_file(args):
+    """
+    Worker: one RFB source (file or zip member) -> Parquet parts.
+
+    Each written part is a committed chunk: its end offset in the source is saved to
+    the checkpoint, so a crashed run seeks past the committed chunks and continues.
+    Returns (parts, rows, timings, invalid_rows, bytes_read).
+    """
+    source, table, out_dir, block_bytes, fingerprint = args
+    schema = _arrow_schema(table)
+    shard = shard_of(source_name(source))
+    names = column_names(table)
+    stem = source_name(source).replace('.', '_')
+    timings = {'read': 0.0, 'parse': 0.0, 'clean': 0.0, 'write': 0.0}
+    cp_path = checkpoint_path(out_dir, source)
+    checkpoint = load_checkpoint(cp_path, fingerprint)
+    chunks = checkpoint["chunks"]
+
+    def _totals():
+        return ([c["part"] for c in chunks], sum(c["rows"] for c in chunks),
+                sum(c["invalid"] for c in chunks), sum(c["bytes"] for c in chunks))
+
+    if checkpoint["complete"]:
+        parts, rows, invalid, _ = _totals()
+        emit("resume", table=table, file=source_name(source), chunks=len(chunks), rows=rows, complete=True)
+        return parts, rows, timings, invalid, 0
+
+    start = chunks[-1]["offset"] if chunks else 0
+    bytes_read = 0
+    with open_source(source) as stream:
+        if start:
+            # Zip members seek by inflating and discarding, still far cheaper than parsing
+            stream.seek(start)
+            emit("resume", table=table, file=source_name(source), chunks=len(chunks), offset=start)
+        blocks = iter_record_blocks(stream, block_bytes, with_offsets=True)
+        while True:
+            t0 = time.perf_counter()
+            item = next(blocks, None)
+            if item is None:
+                break
+            end, block = item
+            t1 = time.perf_counter()
+            block_stats = {}
+            raw = parse_block(block, names, block_stats)
+            t2 = time.perf_counter()
+            converted = convert_table(raw, table)
+            converted = converted.append_column(SHARD_COLUMN[0], pa.array([shard] * converted.num_rows, pa.int64()))
+            converted = converted.cast(schema)
+            t3 = time.perf_counter()
+            part = os.path.join(out_dir, f"{table}-{stem}-{len(chunks):05d}.parquet")
+            pq.write_table(converted, part, compression=PARQUET_COMPRESSION)
+            t4 = time.perf_counter()
+
+            n = converted.num_rows
+            chunks.append({"index": len(chunks), "offset": start + end, "bytes": len(block), "rows": n,
+                           "invalid": block_stats.get('invalid_rows', 0), "part": part})
+            _save_checkpoint(cp_path, checkpoint)
+            for stage, seconds in zip(('read', 'parse', 'clean', 'write'), (t1 - t0, t2 - t1, t3 - t2, t4 - t3)):
+                timings[stage] += seconds
+            bytes_read += len(block)
+            emit("chunk", table=table, file=source_name(source), index=len(chunks) - 1, offset=start + end, rows=n,
+                 read_mb_s=rate(len(block) / MB, t1 - t0), parse_rows_s=rate(n, t2 - t1),
+                 clean_rows_s=rate(n, t3 - t2), write_rows_s=rate(n, t4 - t3))
+
+    checkpoint["complete"] = True
+    _save_checkpoint(cp_path, checkpoint)
+    parts, rows, invalid, _ = _totals()
+    return parts, rows, timings, invalid, bytes_read
+
+def _report(stats: dict, stage: str, rows: int, seconds: float):
+    per_s = rows / seconds if seconds > 0 else 0.0
+    stats[stage] = {'rows': rows, 'seconds': round(seconds, 2), 'rows_per_s': round(per_s)}
+    logger.info(f"[{stage}] {rows:,} rows in {seconds:.1f}s ({per_s:,.0f} rows/s)")
+    emit("stage", stage=stage, **stats[stage])
+
+def parse_files(table: str, sources: list, out_dir: str, workers: int = None, block_bytes: int = BLOCK_BYTES,
+                stats: dict = None, fingerprints: dict = None):
+    """
+    Read + parse + clean + write stages; returns ({source: {'parts', 'rows'}}, total rows).
+    `fingerprints` ({source: checksum}) enables resuming from chunk checkpoints.
+    """
+    stats = {} if stats is None else stats
+    fingerprints = fingerprints or {}
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or min(len(sources), os.cpu_count() or 1)
+    tasks = [(src, table, out_dir, block_bytes, fingerprints.get(src)) for src in sources]
+
+    t0 = time.perf_counter()
+    done = {}
+    with ProcessPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {pool.submit(_parse_file, task): task[0] for task in tasks}
+        for future in as_completed(futures):
+            done[futures[future]] = future.result()
+            emit("queue", table=table, stage="parse", pending=len(futures) - len(done))
+    wall = time.perf_counter() - t0
+    results = [done[src] for src in sources]
+
+    by_source = {src: {'parts': r[0], 'rows': r[1]} for src, r in zip(sources, results)}
+    rows = sum(r[1] for r in results)
+    invalid = sum(r[3] for r in results)
+    if invalid:
+        logger.warning(f"{table}: {invalid} malformed rows skipped")
+    # Per-stage CPU time is summed over workers and divided by the worker count
+    # to express each stage as wall-clock throughput
+    for stage in ('read', 'parse', 'clean', 'write'):
+        busy = sum(r[2][stage] for r in results) / max(workers, 1)
+        _report(stats, stage, rows, busy)
+    read_mb = sum(r[4] for r in results) / MB
+    stats['read']['mb_per_s'] = rate(read_mb, stats['read']['seconds'])
+    _report(stats, 'files_total', rows, wall)
+    stats['parse']['invalid_rows'] = invalid
+    return by_source, rows
+
+def upload_parts(parts: list, staging_uri: str, storage_client, concurrency: int = UPLOAD_CONCURRENCY):
+    """Uploads part files to gs://bucket/prefix/ with bounded concurrency; returns the prefix URI."""
+    bucket_name, _, prefix = staging_uri.replace("gs://", "").partition("/")
+    prefix = prefix.strip('/') + '/' if prefix else ''
+    bucket = storage_client.bucket(bucket_name)
+    # Parts of a previous run would be picked up by the wildcard load
+    for blob in storage_client.list_blobs(bucket_name, prefix=prefix):
+        blob.delete()
+
+    def _upload(path):
+        bucket.blob(f"{prefix}{Path(path).name}").upload_from_filename(path)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_upload, parts))
+    return f"gs://{bucket_name}/{prefix}".rstrip('/')
+
+def _shard_partitioning():
+    return bigquery.RangePartitioning(
+        field=SHARD_COLUMN[0], range_=bigquery.PartitionRange(start=0, end=MAX_SHARDS, interval=1)
+    )
+
+def _load_config(table: str, write_disposition: str):
+    config = bigquery.LoadJobConfig(
+        schema=bq_schema(table, sharded=True),
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=write_disposition,
+    )
+    config.range_partitioning = _shard_partitioning()
+    return config
+
+def ensure_sharded_table(client, table: str, table_id: str):
+    """
+    Creates the serving table partitioned by rfb_shard; a legacy unpartitioned table is rebuilt.
+    Returns True when the table was (re)created, i.e. every shard must be loaded.
+    """
+    try:
+        existing = client.get_table(table_id)
+        if existing.range_partitioning and existing.range_partitioning.field == SHARD_COLUMN[0]:
+            return False
+        logger.warning(f"{table_id} is not partitioned by {SHARD_COLUMN[0]}; recreating it (full load).")
+        client.delete_table(table_id)
+    except Exception as e:
+        if "Not found" not in str(e) and "404" not in str(e):
+            raise
+    new_table = bigquery.Table(table_id, schema=bq_schema(table, sharded=True))
+    new_table.range_partitioning = _shard_partitioning()
+    client.create_table(new_table)
+    return True
+
+def merge_parts(parts: list, path: str) -> str:
+    """Part files concatenated into one Parquet file, part by part (memory bounded by one part)."""
+    with pq.ParquetWriter(path, pq.read_schema(parts[0]), compression=PARQUET_COMPRESSION) as writer:
+        for part in parts:
+            writer.write_table(pq.read_table(part))
+    return path
+
+def load_staging(client, table: str, staging_id: str, parts: list, work_dir: str,
+                 staging_uri: str = None, storage_client=None) -> dict:
+    """
+    Every part of the pending shards in one load job, into a staging table partitioned
+    like the serving table (WRITE_TRUNCATE). Returns the staged rows per shard.
+    """
+    name = staging_id.rsplit('.', 1)[1]
+    config = _load_config(table, "WRITE_TRUNCATE")
+    if staging_uri and storage_client is not None:
+        prefix_uri = upload_parts(parts, f"{staging_uri.rstrip('/')}/{name}", storage_client)
+        client.load_table_from_uri(f"{prefix_uri}/*.parquet", staging_id, job_config=config).result()
+    else:
+        # A file load takes a single file: the parts are concatenated first
+        merged = merge_parts(parts, os.path.join(work_dir, f"{name}.parquet"))
+        try:
+            with open(merged, "rb") as f:
+                client.load_table_from_file(f, staging_id, job_config=config).result()
+        finally:
+            os.remove(merged)
+    sql = f"SELECT {SHARD_COLUMN[0]} AS shard, COUNT(*) AS n FROM `{staging_id}` GROUP BY shard"
+    return {int(row.shard): row.n for row in client.query(sql).result()}
+
+def swap_shard(client, table_id: str, staging_id: str, entry: dict, expected_rows: int, staged: dict) -> int:
+    """Row count check -> atomic copy of the shard's staged partition over its serving partition."""
+    shard = entry["shard"]
+    if not expected_rows:
+        # Empty or fully invalid file: the shard's partition is emptied
+        client.delete_table(f"{table_id}${shard}", not_found_ok=True)
+        return 0
+    loaded = staged.get(shard, 0)
+    if loaded != expected_rows:
+        raise RuntimeError(f"{entry['file_name']}: staging has {loaded} rows, parsed {expected_rows}")
+
+    copy_config = bigquery.CopyJobConfig(write_disposition="WRITE_TRUNCATE")
+    client.copy_table(f"{staging_id}${shard}", f"{table_id}${shard}", job_config=copy_config).result()
+    return loaded
+
+def run_pipeline(client, dataset: str, table: str, sources: list, work_dir: str, manifest=None,
+                 staging_uri: str = None, storage_client=None, bucket_uri: str = None,
+                 workers: int = None, block_bytes: int = BLOCK_BYTES, force: bool = False, target: str = None) -> dict:
+    """
+    Ingests `sources` (paths or 'archive.zip::member') into `table`, shard by shard.
+
+    Only sources that are new or changed against `manifest` (read_manifest) are parsed,
+    unless `force`. Shards absent from the current sources are dropped. Each swapped shard
+    is recorded in the manifest immediately, so an interrupted run resumes where it stopped.
+    `target` loads into another table with the same layout (e.g. a CDC snapshot).
+
+    Returns per-stage stats ({stage: {'rows', 'seconds', 'rows_per_s'}}).
+    """
+    stats = {}
+    if not sources:
+        logger.warning(f"No files for {table}.")
+        return stats
+
+    target = target or table
+    table_id = f"{client.project}.{dataset}.{target}"
+    if ensure_sharded_table(client, table, table_id):
+        force = True
+
+    entries = [describe_source(src, target, bucket_uri) for src in sources]
+    for shard in stale_shards(entries, manifest, target):
+        client.delete_table(f"{table_id}${shard}", not_found_ok=True)
+        record_entries(client, dataset, [tombstone(target, shard)])
+        logger.info(f"{target}: dropped partition of removed shard {shard}")
+
+    pending = entries if force else changed_entries(entries, manifest)
+    if not pending:
+        logger.info(f"{target}: {len(entries)} shards unchanged, nothing to load.")
+        return stats
+    logger.info(f"{target}: {len(pending)} of {len(entries)} shards new or changed")
+
+    out_dir = os.path.join(work_dir, target)
+    by_source, rows = parse_files(table, [e["source"] for e in pending], out_dir,
+                                  workers=workers, block_bytes=block_bytes, stats=stats,
+                                  fingerprints={e["source"]: e["checksum"] for e in pending})
+
+    # One load job for the whole table, then one copy job per shard
+    t0 = time.perf_counter()
+    staging_id = f"{client.project}.{dataset}.{STAGING_PREFIX}_{target}"
+    parts = [part for e in pending for part in by_source[e["source"]]['parts']]
+    staged = load_staging(client, table, staging_id, parts, out_dir, staging_uri, storage_client) if rows else {}
+    emit("staging", table=target, shards=len(staged), rows=sum(staged.values()),
+         load_rows_s=rate(sum(staged.values()), time.perf_counter() - t0))
+
+    remaining = [len(pending)]
+    lock = threading.Lock()
+
+    def _swap(entry):
+        parsed = by_source[entry["source"]]
+        t1 = time.perf_counter()
+        loaded = swap_shard(client, table_id, staging_id, entry, parsed['rows'], staged)
+        record_entries(client, dataset, [dict(entry, rows=loaded)])
+        # Shard committed: its parts and checkpoint are no longer needed for a resume
+        for part in parsed['parts']:
+            os.remove(part)
+        os.remove(checkpoint_path(out_dir, entry["source"]))
+        with lock:
+            remaining[0] -= 1
+            emit("load", table=target, shard=entry["shard"], rows=loaded,
+                 swap_s=round(time.perf_counter() - t1, 2), pending=remaining[0])
+        return loaded
+
+    with ThreadPoolExecutor(max_workers=LOAD_CONCURRENCY) as pool:
+        loaded = sum(pool.map(_swap, pending))
+    client.delete_table(staging_id, not_found_ok=True)
+    _report(stats, 'load', loaded, time.perf_counter() - t0)
+    return stats
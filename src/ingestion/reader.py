@@ -0,0 +1,132 @@
+"""
+Arrow-based reader for RFB CSV files (latin-1, ';'-delimited, quoted, no header).
+
+The file is consumed in large byte blocks cut at a record boundary (a newline outside
+quotes). Each block is sanitized at byte level (NUL and control bytes that make the
+BigQuery CSV loader reject rows), transcoded to UTF-8 and parsed by Arrow's
+multi-threaded CSV engine with an explicit all-string schema. Typed decoding
+(decimal commas, YYYYMMDD dates) runs on Arrow compute kernels.
+"""
+import io
+import logging
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from .schemas import column_names, numeric_columns, date_columns
+from .sources import open_source
+
+logger = logging.getLogger(__name__)
+
+ENCODING = 'latin-1'
+BLOCK_BYTES = 64 * 1024 * 1024
+QUOTE = b'"'
+NEWLINE = b'\n'
+
+# Control bytes except TAB/LF/CR; DEL too. Removed, not replaced, so field widths stay intact.
+_BAD_BYTES = bytes(list(range(0x00, 0x09)) + [0x0b, 0x0c] + list(range(0x0e, 0x20)) + [0x7f])
+
+def sanitize(block: bytes) -> bytes:
+    """Drops NUL/control bytes in one C-level pass."""
+    return block.translate(None, _BAD_BYTES)
+
+def _record_boundary(block: bytes) -> int:
+    """Index just after the last newline that is outside a quoted field (-1 if none)."""
+    quotes_total = block.count(QUOTE)
+    pos = block.rfind(NEWLINE)
+    while pos >= 0:
+        quotes_after = block.count(QUOTE, pos)
+        if (quotes_total - quotes_after) % 2 == 0:
+            return pos + 1
+        pos = block.rfind(NEWLINE, 0, pos)
+    return -1
+
+def iter_record_blocks(stream, block_bytes: int = BLOCK_BYTES, with_offsets: bool = False):
+    """
+    Yields sanitized byte blocks that always end on a record boundary. With
+    `with_offsets`, yields (end_offset, block): the stream position (relative to where
+    reading started) just after the block's last record, i.e. a safe resume point.
+    """
+    carry = b''
+    consumed = 0
+    while True:
+        data = stream.read(block_bytes)
+        if not data:
+            break
+        consumed += len(data)
+        block = carry + data
+        cut = _record_boundary(block)
+        if cut <= 0:
+            # A single record larger than the block: keep accumulating
+            carry = block
+            continue
+        carry = block[cut:]
+        out = sanitize(block[:cut])
+        yield (consumed - len(carry), out) if with_offsets else out
+    if carry.strip():
+        out = sanitize(carry if carry.endswith(NEWLINE) else carry + NEWLINE)
+        yield (consumed, out) if with_offsets else out
+
+def parse_block(block: bytes, names: list, stats: dict) -> pa.Table:
+    """Raw all-string Arrow table of one record-aligned block."""
+    def _on_invalid(row):
+        stats['invalid_rows'] = stats.get('invalid_rows', 0) + 1
+        logger.warning(f"Skipping malformed row ({row.actual_columns} columns): {row.text[:120]!r}")
+        return 'skip'
+
+    text = block.decode(ENCODING).encode('utf-8')
+    return pacsv.read_csv(
+        io.BytesIO(text),
+        read_options=pacsv.ReadOptions(column_names=names, use_threads=True, block_size=16 * 1024 * 1024),
+        parse_options=pacsv.ParseOptions(delimiter=';', quote_char='"', double_quote=True,
+                                         newlines_in_values=True, invalid_row_handler=_on_invalid),
+        convert_options=pacsv.ConvertOptions(column_types={n: pa.string() for n in names},
+                                             strings_can_be_null=False)
+    )
+
+def decode_decimal(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """'1.000,50' / '1000,50' / '1000.50' -> 1000.5 as float64 (invalid or empty -> 0.0)."""
+    text = pc.utf8_trim_whitespace(column)
+    european = pc.replace_substring(pc.replace_substring(text, '.', ''), ',', '.')
+    text = pc.if_else(pc.match_substring(text, ','), european, text)
+    valid = pc.match_substring_regex(text, r'^-?\d+(\.\d+)?$')
+    text = pc.if_else(valid, text, pa.scalar('0'))
+    return pc.cast(text, pa.float64())
+
+def decode_date(column: pa.ChunkedArray, as_date: bool = False) -> pa.ChunkedArray:
+    """
+    Validates YYYYMMDD strings. Invalid values ('0', '00000000', garbage) become empty
+    strings, or nulls when `as_date` returns a date32 column.
+    """
+    text = pc.utf8_trim_whitespace(column)
+    looks_valid = pc.match_substring_regex(text, r'^(19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])$')
+    parsed = pc.strptime(pc.if_else(looks_valid, text, pa.scalar(None, pa.string())), format='%Y%m%d', unit='s', error_is_null=True)
+    if as_date:
+        return pc.cast(parsed, pa.date32())
+    return pc.if_else(pc.is_null(parsed), pa.scalar(''), text)
+
+def convert_table(table: pa.Table, layout_name: str, typed_dates: bool = False) -> pa.Table:
+    """Applies the layout's typed decoding to a raw all-string table."""
+    for col in numeric_columns(layout_name):
+        table = table.set_column(table.schema.get_field_index(col), col, decode_decimal(table[col]))
+    for col in date_columns(layout_name):
+        table = table.set_column(table.schema.get_field_index(col), col, decode_date(table[col], typed_dates))
+    return table
+
+def iter_tables(stream, layout_name: str, block_bytes: int = BLOCK_BYTES, typed_dates: bool = False, stats: dict = None):
+    """
+    Reads an open binary stream of one RFB file and yields converted Arrow tables
+    (one per byte block). `stats` receives 'invalid_rows' when malformed rows are skipped.
+    """
+    stats = {} if stats is None else stats
+    names = column_names(layout_name)
+    for block in iter_record_blocks(stream, block_bytes):
+        yield convert_table(parse_block(block, names, stats), layout_name, typed_dates)
+
+def read_file(source: str, layout_name: str, typed_dates: bool = False) -> pa.Table:
+    """Whole file (or 'archive.zip::member') as one Arrow table (reference files, benchmarks)."""
+    with open_source(source) as f:
+        tables = list(iter_tables(f, layout_name, typed_dates=typed_dates))
+    if not tables:
+        return pa.table({name: pa.array([], pa.string()) for name in column_names(layout_name)})
+    return pa.concat_tables(tables)
+
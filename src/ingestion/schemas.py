@@ -0,0 +1,102 @@
+"""
+Column layouts of the RFB CNPJ open data files (Receita Federal layout, no header).
+
+Each layout maps a BigQuery table to the file suffix it is read from and the ordered
+list of (column, BigQuery type). Dates stay as YYYYMMDD strings because the dashboard
+queries slice them with SUBSTR; capital_social is the only numeric column.
+"""
+
+EMPRESAS_COLUMNS = [
+    ("cnpj_basico", "STRING"),
+    ("razao_social", "STRING"),
+    ("natureza_juridica", "STRING"),
+    ("qualificacao_responsavel", "STRING"),
+    ("capital_social", "FLOAT"),
+    ("porte_empresa", "STRING"),
+    ("ente_federativo", "STRING"),
+]
+
+ESTABELECIMENTOS_COLUMNS = [
+    ("cnpj_basico", "STRING"),
+    ("cnpj_ordem", "STRING"),
+    ("cnpj_dv", "STRING"),
+    ("identificador_matriz_filial", "STRING"),
+    ("nome_fantasia", "STRING"),
+    ("situacao_cadastral", "STRING"),  # 01=Nula, 02=Ativa, 03=Suspensa, 04=Inapta, 08=Baixada
+    ("data_situacao_cadastral", "STRING"),
+    ("motivo_situacao_cadastral", "STRING"),
+    ("nome_cidade_exterior", "STRING"),
+    ("pais", "STRING"),
+    ("data_inicio_atividade", "STRING"),
+    ("cnae_fiscal_principal", "STRING"),
+    ("cnae_fiscal_secundaria", "STRING"),
+    ("tipo_logradouro", "STRING"),
+    ("logradouro", "STRING"),
+    ("numero", "STRING"),
+    ("complemento", "STRING"),
+    ("bairro", "STRING"),
+    ("cep", "STRING"),
+    ("uf", "STRING"),
+    ("municipio", "STRING"),
+    ("ddd_1", "STRING"),
+    ("telefone_1", "STRING"),
+    ("ddd_2", "STRING"),
+    ("telefone_2", "STRING"),
+    ("ddd_fax", "STRING"),
+    ("fax", "STRING"),
+    ("correio_eletronico", "STRING"),
+    ("situacao_especial", "STRING"),
+    ("data_situacao_especial", "STRING"),
+]
+
+REFERENCE_COLUMNS = [
+    ("codigo", "STRING"),
+    ("descricao", "STRING"),
+]
+
+# Integer-range partition column of the serving tables (one partition per RFB file)
+SHARD_COLUMN = ("rfb_shard", "INT64")
+MAX_SHARDS = 100
+
+LAYOUTS = {
+    "empresas": {"suffix": "EMPRECSV", "columns": EMPRESAS_COLUMNS, "keys": ["cnpj_basico"]},
+    "estabelecimentos": {
+        "suffix": "ESTABELE", "columns": ESTABELECIMENTOS_COLUMNS,
+        "keys": ["cnpj_basico", "cnpj_ordem", "cnpj_dv"],
+        "dates": ["data_situacao_cadastral", "data_inicio_atividade", "data_situacao_especial"]
+    },
+    "naturezas": {"suffix": "NATJUCSV", "columns": REFERENCE_COLUMNS},
+    "municipios": {"suffix": "MUNICCSV", "columns": REFERENCE_COLUMNS},
+    "cnaes": {"suffix": "CNAECSV", "columns": REFERENCE_COLUMNS},
+    "motivos": {"suffix": "MOTICSV", "columns": REFERENCE_COLUMNS},
+    "paises": {"suffix": "PAISCSV", "columns": REFERENCE_COLUMNS},
+    "qualificacoes": {"suffix": "QUALSCSV", "columns": REFERENCE_COLUMNS},
+}
+
+def column_names(table: str) -> list:
+    return [name for name, _ in LAYOUTS[table]["columns"]]
+
+def numeric_columns(table: str) -> list:
+    return [name for name, bq_type in LAYOUTS[table]["columns"] if bq_type == "FLOAT"]
+
+def date_columns(table: str) -> list:
+    """YYYYMMDD columns (kept as STRING in BigQuery, validated on read)."""
+    return LAYOUTS[table].get("dates", [])
+
+def key_columns(table: str) -> list:
+    """Row identity used by change data capture (empty for reference tables)."""
+    return LAYOUTS[table].get("keys", [])
+
+def bq_schema(table: str, sharded: bool = False) -> list:
+    # Imported here: the layouts are also used offline (SQLite builder, benchmarks)
+    from google.cloud import bigquery
+    columns = LAYOUTS[table]["columns"] + ([SHARD_COLUMN] if sharded else [])
+    return [bigquery.SchemaField(name, bq_type) for name, bq_type in columns]
+
+def table_for_file(filename: str):
+    """Table name of an RFB file (e.g. 'K3241.K03200Y0.D51213.EMPRECSV' -> 'empresas'), or None."""
+    upper = filename.upper()
+    for table, layout in LAYOUTS.items():
+        if upper.endswith(layout["suffix"]):
+            return table
+    return None
@@ -0,0 +1,105 @@
+"""
+Input sources for the RFB reader: extracted files or members of the official zip archives.
+
+A source is either a plain path or 'archive.zip::member'. Zip members are
+decompressed as a stream (zipfile inflates on read), so an archive never has to be
+extracted to disk and memory stays bounded by the reader's block size. Paths may also
+be bucket objects ('gs://bucket/name', 'gs://bucket/archive.zip::member'), read as a
+stream through the storage client of src/clients.py, so a bucket load goes through
+the same parser and table layout as a local one.
+"""
+import os
+import glob
+import zipfile
+from contextlib import contextmanager
+from .schemas import table_for_file
+
+MEMBER_SEPARATOR = "::"
+GCS_SCHEME = "gs://"
+
+def split_source(source: str):
+    """('archive.zip', 'member') for zip members, (path, None) for plain files."""
+    if MEMBER_SEPARATOR in source:
+        archive, member = source.split(MEMBER_SEPARATOR, 1)
+        return archive, member
+    return source, None
+
+def source_name(source: str) -> str:
+    """RFB file name of a source (the member name for zip members)."""
+    archive, member = split_source(source)
+    return os.path.basename(member or archive)
+
+def is_gcs(source: str) -> bool:
+    return split_source(source)[0].startswith(GCS_SCHEME)
+
+def gcs_blob(uri: str, storage_client=None):
+    """Blob of 'gs://bucket/name' (metadata not fetched)."""
+    if storage_client is None:
+        # Imported here: local sources never need google-cloud
+        from .. import clients
+        storage_client = clients.storage_client()
+    bucket_name, _, name = uri[len(GCS_SCHEME):].partition("/")
+    return storage_client.bucket(bucket_name).blob(name)
+
+@contextmanager
+def _open_path(path: str):
+    if path.startswith(GCS_SCHEME):
+        with gcs_blob(path).open("rb") as f:
+            yield f
+    else:
+        with open(path, 'rb') as f:
+            yield f
+
+@contextmanager
+def open_source(source: str):
+    """Binary stream of a source; zip members are inflated on the fly."""
+    archive, member = split_source(source)
+    if member is None:
+        with _open_path(archive) as f:
+            yield f
+    else:
+        with _open_path(archive) as raw, zipfile.ZipFile(raw) as zf, zf.open(member) as f:
+            yield f
+
+def expand_sources(paths) -> dict:
+    """
+    Groups sources by table. Zip archives are listed (central directory only) and
+    each recognized member becomes a source; plain files are matched by suffix.
+    """
+    by_table = {}
+    for path in paths:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as zf:
+                members = [info.filename for info in zf.infolist() if not info.is_dir()]
+            candidates = [(f"{path}{MEMBER_SEPARATOR}{m}", os.path.basename(m)) for m in members]
+        else:
+            candidates = [(path, os.path.basename(path))]
+        for source, name in candidates:
+            table = table_for_file(name)
+            if table:
+                by_table.setdefault(table, []).append(source)
+    return {table: sorted(sources) for table, sources in by_table.items()}
+
+def discover_sources(directory) -> dict:
+    """Every RFB source in a directory: *.zip archives plus already extracted files."""
+    paths = sorted(p for p in glob.glob(os.path.join(str(directory), "*")) if os.path.isfile(p))
+    return expand_sources(paths)
+
+def discover_bucket_sources(bucket_uri: str, storage_client) -> dict:
+    """Every RFB source in a bucket (or gs://bucket/prefix), grouped by table like discover_sources."""
+    bucket_name, _, prefix = bucket_uri[len(GCS_SCHEME):].partition("/")
+    by_table = {}
+    for blob in storage_client.list_blobs(bucket_name, prefix=prefix or None):
+        uri = f"{GCS_SCHEME}{bucket_name}/{blob.name}"
+        if blob.name.lower().endswith(".zip"):
+            # Central directory only: the reader seeks to the end of the object
+            with blob.open("rb") as raw, zipfile.ZipFile(raw) as zf:
+                members = [info.filename for info in zf.infolist() if not info.is_dir()]
+            candidates = [(f"{uri}{MEMBER_SEPARATOR}{m}", os.path.basename(m)) for m in members]
+        else:
+            candidates = [(uri, os.path.basename(blob.name))]
+        for source, name in candidates:
+            table = table_for_file(name)
+            if table:
+                by_table.setdefault(table, []).append(source)
+    return {table: sorted(sources) for table, sources in by_table.items()}
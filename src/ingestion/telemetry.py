@@ -0,0 +1,37 @@
+"""
+Append-only ingestion metrics (JSON lines in METRICS_FILE).
+
+Every event is one line {"ts", "event", ...}: per-chunk stage timings from the parse
+workers (read MB/s, parse/clean/write rows/s, resume offsets), load rows/s per shard
+and queue depths. Lines are short single writes on an O_APPEND file, so the worker
+processes can emit concurrently; `scripts/ingestion_monitor.py` tails the log.
+"""
+import os
+import json
+import time
+from ..config import METRICS_FILE
+
+def emit(event: str, path=None, **fields):
+    record = {"ts": round(time.time(), 3), "event": event, **fields}
+    with open(path or METRICS_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+
+def rate(amount: float, seconds: float) -> float:
+    return round(amount / seconds, 1) if seconds > 0 else 0.0
+
+def read_events(path=None, offset: int = 0):
+    """Events appended after byte `offset`; returns (events, new offset). Partial last lines wait."""
+    path = path or METRICS_FILE
+    if not os.path.exists(path):
+        return [], offset
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    events = []
+    for line in data[:end].splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue
+    return events, offset + end
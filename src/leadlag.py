@@ -0,0 +1,153 @@
+"""
+Lead-lag analysis between CNPJ openings and PIM-PF production.
+
+For every division x UF the monthly openings and the production index are aligned
+on a common calendar and cross-correlated over lags -12..+12. A positive lag k means
+openings at month t are compared with production at t+k (openings lead production).
+
+Both series are seasonally differenced (x[t] - x[t-12]) before correlating: the raw
+levels share trends and January peaks that would make every pair look correlated.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+from .ibge import UF_NAMES, fetch_sectors_data, get_division_groups
+
+MAX_LAG = 12
+MIN_OBSERVATIONS = 24
+PRODUCTION_VARIABLE = 'Índice Base Fixa (2022=100)'
+NATIONAL = 'BR'
+_NAME_TO_UF = {v: k for k, v in UF_NAMES.items()}
+_NAME_TO_UF['Brasil'] = NATIONAL
+
+def _openings_matrix(df_openings: pd.DataFrame) -> pd.DataFrame:
+    """(sector, uf) x month matrix of openings, with a national row per sector. Missing months = 0."""
+    df = df_openings.copy()
+    df['date'] = pd.to_datetime(df['month_year'], format='%Y%m', errors='coerce')
+    df = df.dropna(subset=['date'])
+    national = df.groupby(['sector_code', 'date'], as_index=False)['count'].sum().assign(uf=NATIONAL)
+    df = pd.concat([df[['sector_code', 'uf', 'date', 'count']], national], ignore_index=True)
+    matrix = df.pivot_table(index=['sector_code', 'uf'], columns='date', values='count', aggfunc='sum', fill_value=0)
+    full_range = pd.date_range(matrix.columns.min(), matrix.columns.max(), freq='MS')
+    return matrix.reindex(columns=full_range, fill_value=0).astype(float)
+
+def _production_matrix(df_production: pd.DataFrame) -> pd.DataFrame:
+    """(sector, uf) x month matrix of the fixed base index. Unpublished months stay NaN."""
+    df = df_production[df_production['variable'] == PRODUCTION_VARIABLE].copy()
+    df['uf'] = df['location'].map(_NAME_TO_UF)
+    df = df.dropna(subset=['uf']).rename(columns={'sector': 'sector_code'})
+    return df.pivot_table(index=['sector_code', 'uf'], columns='date', values='value', aggfunc='first')
+
+def _seasonal_difference(values: np.ndarray) -> np.ndarray:
+    out = np.full(values.shape, np.nan)
+    out[:, 12:] = values[:, 12:] - values[:, :-12]
+    return out
+
+def _masked_corr(a: np.ndarray, b: np.ndarray, min_obs: int):
+    """Row-wise Pearson correlation ignoring NaNs (pairwise complete observations)."""
+    mask = ~(np.isnan(a) | np.isnan(b))
+    n = mask.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    mean_a = np.where(mask, a, 0.0).sum(axis=1) / safe_n
+    mean_b = np.where(mask, b, 0.0).sum(axis=1) / safe_n
+    da = np.where(mask, a - mean_a[:, None], 0.0)
+    db = np.where(mask, b - mean_b[:, None], 0.0)
+    cov = (da * db).sum(axis=1)
+    var = (da ** 2).sum(axis=1) * (db ** 2).sum(axis=1)
+    valid = (n >= min_obs) & (var > 0)
+    corr = np.full(len(a), np.nan)
+    corr[valid] = cov[valid] / np.sqrt(var[valid])
+    return corr, n
+
+def cross_correlations(x: np.ndarray, y: np.ndarray, max_lag: int = MAX_LAG, min_obs: int = MIN_OBSERVATIONS):
+    """
+    Cross-correlation of every row of x with the same row of y for lags -max_lag..max_lag.
+    Returns (lags, corr[pairs, lags], n_obs[pairs, lags]); one vectorized pass per lag.
+    """
+    lags = np.arange(-max_lag, max_lag + 1)
+    length = x.shape[1]
+    corr = np.full((x.shape[0], len(lags)), np.nan)
+    n_obs = np.zeros((x.shape[0], len(lags)), dtype=int)
+    for j, k in enumerate(lags):
+        if abs(k) >= length:
+            continue
+        if k >= 0:
+            a, b = x[:, :length - k], y[:, k:]
+        else:
+            a, b = x[:, -k:], y[:, :length + k]
+        corr[:, j], n_obs[:, j] = _masked_corr(a, b, min_obs)
+    return lags, corr, n_obs
+
+def compute_lead_lag(df_openings: pd.DataFrame, df_production: pd.DataFrame,
+                     max_lag: int = MAX_LAG, min_obs: int = MIN_OBSERVATIONS) -> pd.DataFrame:
+    """
+    Lead-lag matrix for every division x UF present in both sources.
+
+    Args:
+        df_openings: month_year, sector_code, uf, count (get_opening_panel).
+        df_production: long PIM-PF table with a 'sector' column (fetch_sectors_data).
+
+    Returns:
+        Long table (sector_code, uf, lag, corr, n_obs); uf 'BR' is the national series.
+    """
+    if df_openings.empty or df_production.empty:
+        return pd.DataFrame()
+
+    openings = _openings_matrix(df_openings)
+    production = _production_matrix(df_production)
+    keys = openings.index.intersection(production.index)
+    dates = openings.columns.intersection(production.columns).sort_values()
+    if keys.empty or len(dates) <= 12:
+        return pd.DataFrame()
+
+    x = _seasonal_difference(openings.loc[keys, dates].to_numpy(dtype=float))
+    y = _seasonal_difference(production.loc[keys, dates].to_numpy(dtype=float))
+    lags, corr, n_obs = cross_correlations(x, y, max_lag, min_obs)
+
+    result = pd.DataFrame({
+        'sector_code': np.repeat(keys.get_level_values('sector_code'), len(lags)),
+        'uf': np.repeat(keys.get_level_values('uf'), len(lags)),
+        'lag': np.tile(lags, len(keys)),
+        'corr': corr.ravel(),
+        'n_obs': n_obs.ravel()
+    })
+    return result.dropna(subset=['corr']).reset_index(drop=True)
+
+def rank_leading_relationships(df_lead_lag: pd.DataFrame, top: int = None) -> pd.DataFrame:
+    """
+    Strongest leading relationship per division x UF: the lag >= 1 with the largest |corr|,
+    next to the contemporaneous (lag 0) correlation for reference.
+    """
+    if df_lead_lag.empty:
+        return df_lead_lag
+    leading = df_lead_lag[df_lead_lag['lag'] >= 1]
+    if leading.empty:
+        return leading
+    best = leading.loc[leading['corr'].abs().groupby([leading['sector_code'], leading['uf']]).idxmax()]
+    lag0 = df_lead_lag[df_lead_lag['lag'] == 0].set_index(['sector_code', 'uf'])['corr'].rename('corr_lag0')
+    best = best.join(lag0, on=['sector_code', 'uf'])
+    best = best.assign(strength=best['corr'].abs()).sort_values('strength', ascending=False).drop(columns='strength')
+    best = best.reset_index(drop=True)
+    return best.head(top) if top else best
+
+def get_division_labels():
+    """CNAE division -> series label; divisions sharing a SIDRA category get one label ('05-09')."""
+    return {code: codes[0] if len(codes) == 1 else f"{codes[0]}-{codes[-1]}"
+            for codes in get_division_groups().values() for code in codes}
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=16)
+def get_sector_lead_lag(df_openings: pd.DataFrame) -> pd.DataFrame:
+    """Lead-lag matrix for every published division x UF, cached by the openings panel."""
+    if df_openings.empty:
+        return pd.DataFrame()
+    labels = get_division_labels()
+    first_codes = sorted({label.split('-')[0] for label in labels.values()})
+    df_production = fetch_sectors_data(tuple(first_codes))
+    if df_production.empty:
+        return pd.DataFrame()
+    df_production = df_production.assign(sector=df_production['sector'].map(labels))
+
+    # Openings of divisions sharing a category are summed into the same series
+    df_openings = df_openings.assign(sector_code=df_openings['sector_code'].map(labels)).dropna(subset=['sector_code'])
+    df_openings = df_openings.groupby(['month_year', 'sector_code', 'uf'], as_index=False)['count'].sum()
+    return compute_lead_lag(df_openings, df_production)
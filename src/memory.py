@@ -0,0 +1,162 @@
+"""
+Memory accounting and a byte-bounded shared cache for the dashboard process.
+
+Every session runs in the same process. st.cache_data hands each caller its own
+unpickled copy of a result, so a session keeping the market datasets held full
+private copies of them. Three pieces keep the process size predictable:
+
+    cached()       results kept once per process and shared by every session (read-only
+                   by convention), evicted least-recently-used beyond CACHE_MAX_BYTES
+    compact()      low-cardinality code columns (UF, porte, situação, natureza, CNAE) as
+                   categoricals, other text columns as Arrow-backed strings
+    accounting     bytes per cache entry and per session (session-state values that are
+                   not shared with the cache), reported by memory_report()
+"""
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "512")) * 1024 ** 2
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_MB", "64")) * 1024 ** 2
+CACHE_TTL = 3600
+SESSION_IDLE = 3600  # sessions not seen for this long leave the report
+
+# Code columns of the listings: few distinct values, repeated on every row
+LOW_CARDINALITY = (
+    "uf", "porte_empresa", "situacao_cadastral", "natureza_juridica", "natureza_desc",
+    "cnae_fiscal_principal", "cnae_desc", "identificador_matriz_filial", "municipio_codigo", "municipio_nome",
+)
+MIN_ROWS = 64  # smaller frames are not worth converting
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (value, bytes, created)
+_cache_bytes = 0
+_sessions = {}  # session id -> (private bytes, last seen)
+
+def nbytes(value) -> int:
+    """Approximate deep size of a result (DataFrames via memory_usage(deep=True))."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+def compact(df):
+    """Same frame with categorical code columns and Arrow-backed text columns."""
+    if not isinstance(df, pd.DataFrame) or len(df) < MIN_ROWS:
+        return df
+    dtypes = {}
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(s.dtype):
+            continue
+        # Object columns may hold lists (ARRAY_AGG) or mixed values: left as they are
+        if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) != "string":
+            continue
+        if col in LOW_CARDINALITY and s.nunique() <= len(s) // 2:
+            dtypes[col] = "category"
+        elif s.dtype == object:
+            dtypes[col] = pd.StringDtype("pyarrow")
+    return df.astype(dtypes) if dtypes else df
+
+def _evict(now: float):
+    global _cache_bytes
+    for key in [k for k, (_, _, created) in _entries.items() if now - created >= CACHE_TTL]:
+        _cache_bytes -= _entries.pop(key)[1]
+    # The newest entry always stays, even when it alone exceeds the budget
+    while _cache_bytes > CACHE_MAX_BYTES and len(_entries) > 1:
+        _cache_bytes -= _entries.popitem(last=False)[1][1]
+
+def cached(key, compute):
+    """compute() once per key (and CACHE_TTL), shared by every session of the process."""
+    global _cache_bytes
+    now = time.time()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and now - entry[2] < CACHE_TTL:
+            _entries.move_to_end(key)
+            return entry[0]
+    value = compute()
+    size = nbytes(value)
+    with _lock:
+        if key in _entries:
+            _cache_bytes -= _entries.pop(key)[1]
+        _entries[key] = (value, size, now)
+        _cache_bytes += size
+        _evict(now)
+    return value
+
+def private_bytes(value, shared=None) -> int:
+    """Bytes of `value` not shared with the cache (objects held by the cache count as 0)."""
+    if shared is None:
+        with _lock:
+            shared = {id(entry[0]) for entry in _entries.values()}
+    if id(value) in shared:
+        return 0
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(private_bytes(v, shared) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(private_bytes(v, shared) for v in value)
+    return nbytes(value)
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+def record_session(state) -> int:
+    """Private bytes of this session's state, kept for memory_report()."""
+    session_id = _session_id()
+    size = 0
+    for key in list(state.keys()):
+        try:
+            size += private_bytes(state[key])
+        except Exception:
+            continue
+    if session_id:
+        now = time.time()
+        with _lock:
+            _sessions[session_id] = (size, now)
+            for stale in [s for s, (_, seen) in _sessions.items() if now - seen > SESSION_IDLE]:
+                del _sessions[stale]
+    return size
+
+def _rss_bytes() -> int:
+    # Current resident set (Linux); peak RSS elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def memory_report(top: int = 10) -> dict:
+    """Process RSS, shared-cache entries (largest first) and private bytes per session."""
+    mb = 1024 ** 2
+    now = time.time()
+    with _lock:
+        entries = sorted(_entries.items(), key=lambda e: -e[1][1])
+        sessions = sorted(_sessions.items(), key=lambda s: -s[1][0])
+        cache_bytes = _cache_bytes
+    return {
+        "rss_mb": round(_rss_bytes() / mb, 1),
+        "cache": {
+            "entries": len(entries),
+            "mb": round(cache_bytes / mb, 1),
+            "max_mb": round(CACHE_MAX_BYTES / mb),
+            "largest": [{"key": str(key)[:120], "mb": round(size / mb, 2), "age_s": round(now - created)}
+                        for key, (_, size, created) in entries[:top]],
+        },
+        "sessions": [{"session": sid[:8], "mb": round(size / mb, 2), "idle_s": round(now - seen)}
+                     for sid, (size, seen) in sessions[:top]],
+    }
@@ -0,0 +1,100 @@
+"""
+Seasonal decomposition of monthly CNPJ flows (openings and closings).
+
+Classical additive decomposition (x = trend + seasonal + remainder) applied to a
+whole matrix of series at once (one row per sector x UF):
+    trend     centered 2x12 moving average
+    seasonal  mean detrended value of each calendar month, centered to sum zero
+    adjusted  x - seasonal
+Every step is linear, so adjusted series of several sectors/UFs can be summed and
+remain the adjusted series of the aggregate.
+"""
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+PERIOD = 12
+CHUNK_ROWS = 500
+_TREND_WEIGHTS = np.r_[0.5, np.ones(PERIOD - 1), 0.5] / PERIOD
+
+def decompose_matrix(values: np.ndarray, months: np.ndarray):
+    """
+    Decomposes every row of `values` (series x months).
+
+    Args:
+        values: float matrix, NaN where a series has no data.
+        months: calendar month (1-12) of each column.
+
+    Returns:
+        (trend, seasonal, adjusted) with the same shape as `values`. The trend is NaN
+        on the first/last 6 months; seasonal/adjusted cover the whole window.
+    """
+    values = np.asarray(values, dtype=float)
+    n_rows, n_cols = values.shape
+    trend = np.full(values.shape, np.nan)
+    if n_cols >= PERIOD + 1:
+        # Sliding window over the time axis: (rows, n_cols - 12, 13) . weights
+        windows = np.lib.stride_tricks.sliding_window_view(values, PERIOD + 1, axis=1)
+        trend[:, PERIOD // 2:n_cols - PERIOD // 2] = windows @ _TREND_WEIGHTS
+
+    detrended = values - trend
+    factors = np.zeros((n_rows, PERIOD))
+    for m in range(1, PERIOD + 1):
+        cols = months == m
+        if cols.any():
+            column_block = detrended[:, cols]
+            has_data = (~np.isnan(column_block)).any(axis=1)
+            factors[has_data, m - 1] = np.nanmean(column_block[has_data], axis=1)
+    factors -= factors.mean(axis=1, keepdims=True)
+
+    seasonal = factors[:, months - 1]
+    adjusted = values - seasonal
+    return trend, seasonal, adjusted
+
+def _decompose_chunk(args):
+    values, months = args
+    return decompose_matrix(values, months)
+
+def decompose_flows(df: pd.DataFrame, key_cols=('sector_code', 'uf', 'kind'), workers: int = None) -> pd.DataFrame:
+    """
+    Decomposes every series of a long flow table (month_year, *key_cols, count).
+
+    Missing months inside a series' calendar are zero flows. Large panels are split
+    in row chunks decomposed on separate processes.
+
+    Returns:
+        Long table: month_year, *key_cols, count, trend, seasonal, adjusted.
+    """
+    key_cols = list(key_cols)
+    if df.empty:
+        return pd.DataFrame(columns=['month_year', *key_cols, 'count', 'trend', 'seasonal', 'adjusted'])
+
+    data = df.assign(date=pd.to_datetime(df['month_year'], format='%Y%m', errors='coerce')).dropna(subset=['date'])
+    matrix = data.pivot_table(index=key_cols, columns='date', values='count', aggfunc='sum', fill_value=0)
+    dates = pd.date_range(matrix.columns.min(), matrix.columns.max(), freq='MS')
+    matrix = matrix.reindex(columns=dates, fill_value=0)
+
+    values = matrix.to_numpy(dtype=float)
+    months = dates.month.to_numpy()
+    chunks = [(values[i:i + CHUNK_ROWS], months) for i in range(0, len(values), CHUNK_ROWS)]
+
+    if len(chunks) > 1:
+        workers = workers or min(len(chunks), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_decompose_chunk, chunks))
+    else:
+        parts = [_decompose_chunk(chunks[0])]
+    trend, seasonal, adjusted = (np.vstack(arrays) for arrays in zip(*parts))
+
+    n_dates = len(dates)
+    out = pd.DataFrame({
+        'month_year': np.tile(dates.strftime('%Y%m'), len(matrix)),
+        'count': values.ravel(),
+        'trend': trend.ravel(),
+        'seasonal': seasonal.ravel(),
+        'adjusted': adjusted.ravel()
+    })
+    for level in key_cols:
+        out[level] = np.repeat(matrix.index.get_level_values(level), n_dates)
+    return out[['month_year', *key_cols, 'count', 'trend', 'seasonal', 'adjusted']]
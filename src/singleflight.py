@@ -0,0 +1,77 @@
+"""
+Process-wide coalescing of identical in-flight requests.
+
+Streamlit serves every session from the same process, so when many users open the
+dashboard with the same filters they submit the same BigQuery jobs and IBGE requests
+at the same moment. `do(key, fn)` runs fn once per key among concurrent callers: the
+first caller executes it, the others wait and receive the same result (or the same
+exception). Nothing is kept after the call completes; caching stays with
+st.cache_data, this only removes the duplicates the caches cannot see (different
+cached wrappers, or calls racing before the first result is cached).
+"""
+import json
+import hashlib
+import threading
+
+_lock = threading.Lock()
+_in_flight = {}  # key -> _Call
+_stats = {"executed": 0, "coalesced": 0}
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+def fingerprint(*parts) -> str:
+    """Canonical key of a request (order of dict keys does not matter)."""
+    canonical = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+def _private_copy(value):
+    # Callers post-process results in place (new columns), so each gets its own copy
+    copy = getattr(value, "copy", None)
+    return copy() if callable(copy) else value
+
+def do(key: str, fn):
+    """Returns fn(), sharing one execution among concurrent callers with the same key."""
+    with _lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _in_flight[key] = _Call()
+            _stats["executed"] += 1
+        else:
+            call.waiters += 1
+            _stats["coalesced"] += 1
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return _private_copy(call.value)
+
+    value, completed = None, False
+    try:
+        value = fn()
+        completed = True
+        return value
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _in_flight[key]
+            waiters = call.waiters  # no caller can join once the key is removed
+        if completed:
+            # Snapshot taken before the leader's caller can modify its result
+            call.value = _private_copy(value) if waiters else value
+        elif call.error is None:
+            call.error = RuntimeError("request interrupted")
+        call.done.set()
+
+def stats() -> dict:
+    """Executed and coalesced calls since the process started."""
+    with _lock:
+        return dict(_stats, in_flight=len(_in_flight))
@@ -0,0 +1,75 @@
+"""
+Chart data layer: the frames the Altair charts receive.
+
+Streamlit sends every chart dataset to the browser on each rerun, so each frame is cut
+to what its chart draws: only the encoded columns, and long line series reduced with
+Largest-Triangle-Three-Buckets (LTTB), which keeps the peaks and troughs a line shows
+and drops points that would land on the same pixels. Prepared frames are cached by
+content (st.cache_data hashes the input frame), so reruns and the layers of a
+dual-axis chart reuse them instead of recomputing.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MAX_POINTS = 500  # ~2 px per point on a full-width chart
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Positions of the `threshold` points LTTB keeps (x ascending; first and last always kept)."""
+    n = len(y)
+    if threshold < 3 or n <= threshold:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    # threshold - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Third vertex: average of the next bucket (the last point for the final bucket)
+        if i + 2 < len(edges):
+            avg_x, avg_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def _positions(values: pd.Series) -> np.ndarray:
+    # Dates and numbers are spaced by value; ordinal axes (e.g. 'YYYYMM' strings) by position
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+    return np.arange(len(values), dtype=float)
+
+def downsample(df: pd.DataFrame, x: str, y, max_points: int = MAX_POINTS, by=None) -> pd.DataFrame:
+    """
+    Rows kept by LTTB, per series of `by` (e.g. location). With several y columns (a
+    dual-axis chart) the union of the points kept for each one is returned, so every
+    layer keeps its extremes.
+    """
+    ys = [y] if isinstance(y, str) else list(y)
+
+    def reduce(series: pd.DataFrame) -> pd.DataFrame:
+        if len(series) <= max_points:
+            return series
+        series = series.sort_values(x)
+        xs = _positions(series[x])
+        kept = np.unique(np.concatenate([lttb_indices(xs, series[c].to_numpy(dtype=float), max_points) for c in ys]))
+        return series.iloc[kept]
+
+    if by is None:
+        return reduce(df)
+    return pd.concat([reduce(series) for _, series in df.groupby(by, sort=False)])
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def chart_data(df: pd.DataFrame, columns: tuple, x: str = None, y=None, by=None, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """The frame a chart needs: `columns` only, downsampled when x and y are given."""
+    out = df[list(columns)]
+    if x is not None and y is not None and not out.empty:
+        out = downsample(out, x, y, max_points, by)
+    return out.reset_index(drop=True)
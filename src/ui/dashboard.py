@@ -1,311 +1,14 @@
 ﻿import streamlit as st
 import pandas as pd
 import altair as alt
-import os
 from ..database import CNPJDatabase
-from ..utils import format_cnpj, format_currency, format_date, get_status_description, format_cnae
-from ..utils.formatters import (
-    format_br_number,
-    format_count,
-    format_currency as format_currency_br,
-    format_percentage,
-    format_index
-)
-from ..ibge import fetch_industry_data, get_latest_metrics
-from ..classification import get_industrial_typology, get_divisions_for_typology, get_divisions_for_value_chain
+from ..utils import format_cnpj, format_currency, format_date
+from ..ibge import fetch_industry_data, get_latest_metrics, UF_NAMES, has_sector_series, resolve_class_id, resolve_location
+from ..composite import WEIGHT_OPTIONS, build_weight_table, get_composite_industry_data
+from ..cycle import PHASES, PHASE_ORDER, classify_phase, get_sector_cycle_panel, get_latest_phases, get_phase_transitions
+from .. import cnae
 from .tooltips import TOOLTIPS
-
-@st.cache_data
-def get_options_cached(_db, method_name):
-    try:
-        return getattr(_db, method_name)()
-    except:
-        return pd.DataFrame()
-
-@st.cache_data
-def get_cnae_hierarchy_cached():
-    # Try new CSV path first
-    csv_path = "src/data/cnae_hierarchy.csv"
-    parquet_path = "data/processed/dim_cnae.parquet"
-    
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path, dtype=str)
-        
-        # Map CSV columns to expected dashboard columns
-        if 'divisao_code' in df.columns:
-            df['id_divisao'] = df['divisao_code']
-            df['id_grupo'] = df['grupo_code']
-            df['id_classe'] = df['classe_code']
-            df['id_subclasse'] = df['subclasse_code']
-            df['desc_subclasse'] = df['desc'] if 'desc' in df.columns else df['subclasse_code']
-        
-        # Clean IDs: remove .0 suffix and punctuation
-        for col in ['id_divisao', 'id_grupo', 'id_classe', 'id_subclasse']:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.replace(r'\.0$', '', regex=True)
-                df[col] = df[col].str.replace(r'[^\w]', '', regex=True)
-        
-        # Ensure labels exist
-        if 'div_label' not in df.columns:
-            df['div_label'] = df['id_divisao'] + " - " + df['divisao_desc'].fillna('')
-        if 'grp_label' not in df.columns:
-            df['grp_label'] = df['id_grupo'] + " - " + df['grupo_desc'].fillna('')
-        if 'cls_label' not in df.columns:
-            df['cls_label'] = df['id_classe'] + " - " + df['classe_desc'].fillna('')
-            
-        return df
-    elif os.path.exists(parquet_path):
-        df = pd.read_parquet(parquet_path)
-        df['divisao_code'] = df['id_divisao']
-        df['div_label'] = df['id_divisao'] + " - " + df['desc_divisao']
-        df['grupo_code'] = df['id_grupo']
-        df['grp_label'] = df['id_grupo'] + " - " + df['desc_grupo']
-        df['classe_code'] = df['id_classe']
-        df['cls_label'] = df['id_classe'] + " - " + df['desc_classe']
-        df['id_subclasse'] = df['id_subclasse'].astype(str)
-        return df
-    
-    return pd.DataFrame()
-
-def generate_structural_summary(key_suffix: str) -> str:
-    """Generates a text summary of the active filters."""
-    # 1. Geography
-    ufs = st.session_state.get(f"ufs_{key_suffix}", [])
-    cities = st.session_state.get(f"city_{key_suffix}", [])
-    
-    geo_text = "Nacional"
-    if cities:
-        geo_text = f"Local ({len(cities)} municípios)"
-    elif ufs:
-        geo_text = f"Regional ({', '.join(ufs)})"
-
-    # 2. Industry Scope
-    macro = st.session_state.get(f"macro_{key_suffix}", "Todos")
-    typ = st.session_state.get(f"typ_{key_suffix}", "Todas")
-    chain = st.session_state.get(f"chain_{key_suffix}", "Todas")
-    sectors = st.session_state.get(f"sec_{key_suffix}", [])
-    groups = st.session_state.get(f"grp_{key_suffix}", [])
-    classes = st.session_state.get(f"cls_{key_suffix}", [])
-    
-    scope_parts = []
-    
-    # Priority to specific hierarchy
-    if classes:
-        scope_parts.append(f"{len(classes)} Classes Selecionadas")
-    elif groups:
-        scope_parts.append(f"{len(groups)} Grupos Selecionados")
-    elif sectors:
-        scope_parts.append(f"{len(sectors)} Setores Selecionados")
-    else:
-        # Otherwise describe the Strategy filters
-        if macro != "Todos":
-            scope_parts.append(macro)
-            
-        if typ != "Todas":
-            scope_parts.append(typ)
-            
-        if chain != "Todas":
-            scope_parts.append(f"Posição {chain}")
-            
-    if not scope_parts:
-        scope_text = "Complexo Industrial Completo (05-33)"
-    else:
-        scope_text = " • ".join(scope_parts)
-
-    return f"**Escopo da Análise:** {scope_text} — **Abrangência:** {geo_text}"
-
-# --- LOCAL PAGE FILTERS (Top of Page) ---
-
-def _render_common_geo_activity(db: CNPJDatabase, key_suffix: str):
-    """Helper to render Geo/Activity filters common to all pages."""
-    # 1. Geography
-    c1, c2 = st.columns(2)
-    with c1:
-        states = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA", "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
-        sel_ufs = st.multiselect("Estados", states, key=f"ufs_{key_suffix}")
-    
-    with c2:
-        df_muni = get_options_cached(db, 'get_all_municipios')
-        sel_city_codes = []
-        if not df_muni.empty:
-            muni_opts = df_muni[df_muni['uf'].isin(sel_ufs)]['descricao'].tolist() if sel_ufs else df_muni['descricao'].tolist()
-            sel_city_names = st.multiselect("Municípios", muni_opts, placeholder="Todas", key=f"city_{key_suffix}")
-            if sel_city_names:
-                sel_city_codes = df_muni[df_muni['descricao'].isin(sel_city_names)]['codigo'].tolist()
-        else:
-            st.warning("Lista de Municípios indisponível (Erro de Carregamento)")
-    
-    # Dividers removed for clean layout
-
-    # 2. Structural Segmentation REMOVED (User Request)
-    sel_macro = "Todos"
-    sel_typology = "Todas"
-    sel_chain = "Todas"
-
-    # 3. CNAE Hierarchy Filters (Dependent)
-    df_hier = get_cnae_hierarchy_cached()
-    
-    sel_divs = []
-    sel_groups = []
-    sel_classes = []
-    
-    if not df_hier.empty:
-        # A. Apply Intersection Logic (Macro/Typology/Chain -> Allowed Divisions)
-        current_divs = df_hier['divisao_code'].unique().tolist()
-        allowed_divs = set(current_divs)
-        
-        # Macro
-        if "Transformação" in sel_macro:
-            allowed_divs &= set([str(x).zfill(2) for x in range(10, 34)])
-        elif "Extrativa" in sel_macro:
-            allowed_divs &= set([str(x).zfill(2) for x in range(5, 10)])
-            
-        # Typology
-        if sel_typology != "Todas":
-            allowed_divs &= set(get_divisions_for_typology(sel_typology))
-            
-        # Chain
-        if sel_chain != "Todas":
-            allowed_divs &= set(get_divisions_for_value_chain(sel_chain))
-            
-        # Filter Hierarchy DF
-        df_filtered = df_hier[df_hier['divisao_code'].isin(allowed_divs)]
-
-        # --- SCOPE ENFORCEMENT FIX: Hard-limit to Industrial Range (05-33) ---
-        # This ensures Agriculture (01-03) and Services (34+) don't appear in top filters
-        try:
-             df_filtered = df_filtered[
-                pd.to_numeric(df_filtered['divisao_code'], errors='coerce').fillna(0).astype(int).between(5, 33)
-             ]
-        except: pass
-        
-        st.markdown("##### Estudo Setorial (Hierarquia CNAE)")
-        c_h1, c_h2, c_h3 = st.columns(3)
-        
-        # B. Level 1: Division
-        with c_h1:
-            div_opts = sorted(df_filtered['div_label'].unique().tolist())
-            sel_div_labels = st.multiselect("1. Divisão (Setor)", div_opts, placeholder="Todos os Setores", key=f"div_{key_suffix}")
-            if sel_div_labels:
-                sel_divs = [s.split(" - ")[0] for s in sel_div_labels]
-                df_filtered = df_filtered[df_filtered['divisao_code'].isin(sel_divs)]
-        
-        # C. Level 2: Group
-        with c_h2:
-            grp_opts = sorted(df_filtered['grp_label'].unique().tolist())
-            sel_grp_labels = st.multiselect("2. Grupo", grp_opts, placeholder="Todos os Grupos", key=f"grp_{key_suffix}", disabled=len(sel_divs)==0)
-            if sel_grp_labels:
-                sel_groups_dirty = [s.split(" - ")[0] for s in sel_grp_labels]
-                sel_groups = [g.replace(".", "") for g in sel_groups_dirty]
-                df_filtered = df_filtered[df_filtered['grupo_code'].astype(str).isin(sel_groups_dirty)]
-            
-        # D. Level 3: Class
-        with c_h3:
-            cls_opts = sorted(df_filtered['cls_label'].unique().tolist())
-            sel_cls_labels = st.multiselect("3. Classe", cls_opts, placeholder="Todas as Classes", key=f"cls_{key_suffix}", disabled=len(sel_groups)==0)
-            if sel_cls_labels:
-                 sel_classes_dirty = [s.split(" - ")[0] for s in sel_cls_labels]
-                 sel_classes = [c.replace(".", "").replace("-", "") for c in sel_classes_dirty]
-        
-        # Scope Enforcement (User Plan): If no filter selected, Division is ALL allowed.
-        if not sel_divs:
-            sel_divs = list(allowed_divs)
-             
-    # Clean up empty lists to None/Empty
-    
-    return sel_ufs, sel_city_codes, sel_divs, sel_groups, sel_classes
-
-def render_structure_filters(db: CNPJDatabase) -> dict:
-    """Filters for 'Estrutura de Mercado' (Full Company Details)."""
-    with st.expander("Filtros & Segmentação", expanded=False):
-
-        # 0. Search
-        c_search, c_empty = st.columns([3, 1])
-        with c_search:
-            search_query = st.text_input("Busca Rápida (Nome ou CNPJ)", placeholder="Ex: PETROBRAS ou 33.000.167...", key='search_struct')
-        
-
-        # 1. Global & Hierarchy
-        sel_ufs, sel_city_codes, sel_sectors, sel_groups, sel_classes = _render_common_geo_activity(db, "struct")
-        
-      
-        
-        # 1.1 CNAE Specific (Subclass - Final Level)
-        sel_cnaes = []
-        df_hier = get_cnae_hierarchy_cached()
-        
-        if not df_hier.empty:
-            # SCOPE ENFORCEMENT: 05-33
-            try:
-                # Filter by numeric range of Division
-                df_cnae_all = df_hier[
-                    pd.to_numeric(df_hier['id_divisao'], errors='coerce').fillna(0).astype(int).between(5, 33)
-                ].copy()
-            except:
-                df_cnae_all = df_hier.copy()
-
-            # Dependent Filtering (Based on Hierarchy)
-            if sel_classes:
-                 mask = df_cnae_all['id_classe'].isin(sel_classes)
-                 df_cnae_all = df_cnae_all[mask]
-            elif sel_groups:
-                 mask = df_cnae_all['id_grupo'].isin(sel_groups)
-                 df_cnae_all = df_cnae_all[mask]
-            elif sel_sectors: 
-                 mask = df_cnae_all['id_divisao'].isin(sel_sectors)
-                 df_cnae_all = df_cnae_all[mask]
-
-            # Formatting
-            # Use raw ID from parquet for display
-            cnae_opts = sorted((df_cnae_all['id_subclasse'] + " - " + df_cnae_all['desc_subclasse']).unique().tolist())
-            
-            sel_cnaes_ui = st.multiselect(
-                "4. Subclasse (Atividade Específica)", 
-                cnae_opts, 
-                placeholder="Selecione (Limitado por Divisão/Grupo/Classe acima)", 
-                key='f_cnae_specific',
-                disabled=False,
-                help=TOOLTIPS["cnae_subclasse"]
-            )
-            
-            if sel_cnaes_ui:
-                sel_cnaes = [c.split(" - ")[0] for c in sel_cnaes_ui]
-                # Metadata logic moved to render_dashboard for Header Card placement
-                            
-        else:
-            st.warning("Lista de CNAEs indisponível.")
-        
-        # 2. Detailed Filters (Always Visible)
-        st.markdown("##### Filtros Avançados")
-        c1, c2, c3 = st.columns(3)
-        with c1:
-            sel_portes_ui = st.multiselect("Porte", ["01 (ME)", "03 (EPP)", "05 (Demais)"], default=["05 (Demais)"], key='f_porte_struct', help=TOOLTIPS["porte"])
-            sel_portes = [p.split()[0] for p in sel_portes_ui] if sel_portes_ui else []
-            
-        with c2:
-            sel_branch_mode = st.radio("Escopo", ["Todos", "Somente Matrizes", "Somente Filiais"], index=0, horizontal=True, key='f_scope_struct', help=TOOLTIPS["escopo_geo"])
-            
-        with c3:
-            d_range = st.date_input("Data Abertura", [], key='f_date_struct')
-            d_start = d_range[0].strftime("%Y%m%d") if len(d_range) == 2 else None
-            d_end = d_range[1].strftime("%Y%m%d") if len(d_range) == 2 else None
-
-        # 3. Capital
-        c_cap1, c_cap2 = st.columns(2)
-        min_cap = c_cap1.number_input("Capital Mín.", 0.0, step=100000.0, format="%.0f", key='f_min_cap_struct')
-        max_cap = c_cap2.number_input("Capital Máx.", 0.0, step=100000.0, format="%.0f", key='f_max_cap_struct')
-
-    return {
-        "ufs": sel_ufs, "municipio_codes": sel_city_codes, 
-        "sectors": sel_sectors, "groups": sel_groups, "classes": sel_classes,
-        "cnaes": sel_cnaes,
-        "portes": sel_portes, "branch_mode": sel_branch_mode,
-        "min_capital": min_cap, "max_capital": max_cap if max_cap > 0 else None,
-        "date_start": d_start, "date_end": d_end, "limit": 1000, "only_active": True,
-        "search_term": search_query.strip() if search_query else None
-    }
-
-
+from .charts import chart_data
 
 def render_macro_filters(db: CNPJDatabase) -> dict:
     """Filters for 'Atividade Macro' (Focus on Geo/Sector - PIM-PF Scope)."""
@@ -315,24 +18,29 @@ def render_macro_filters(db: CNPJDatabase) -> dict:
         sel_ufs = st.multiselect("Estados (Regionais)", states, key="ufs_macro")
         
         # 2. Sectoral (Divisions Only, PIM-PF doesn't have Classes)
-        # Fetch Hierarchy just for Division Labels
-        df_hier = get_cnae_hierarchy_cached()
         sel_sectors = []
         
-        if not df_hier.empty:
-            # Filter for Industrial Range (05-33)
-            try:
-                 df_filtered = df_hier[
-                    pd.to_numeric(df_hier['divisao_code'], errors='coerce').fillna(0).astype(int).between(5, 33)
-                 ]
-                 div_opts = sorted(df_filtered['div_label'].unique().tolist())
-                 
-                 st.markdown("##### Seleção de Setor (PIM-PF)")
-                 sel_div_labels = st.multiselect("Setor Industrial (CNAE Divisão)", div_opts, placeholder="Indústria Geral (Todos)", key="div_macro")
-                 
-                 if sel_div_labels:
-                     sel_sectors = [s.split(" - ")[0] for s in sel_div_labels]
-            except: pass
+        if cnae.is_available():
+            # Industrial Range (05-33) labels, prebuilt in the CNAE artifact
+            div_opts = cnae.labels('div', cnae.INDUSTRIAL_DIVISIONS)
+            
+            st.markdown("##### Seleção de Setor (PIM-PF)")
+            sel_div_labels = st.multiselect("Setor Industrial (CNAE Divisão)", div_opts, placeholder="Indústria Geral (Todos)", key="div_macro")
+            
+            if sel_div_labels:
+                sel_sectors = [cnae.code_of('div', s) for s in sel_div_labels]
+        
+        # Availability check (SIDRA catalog): tell the user up front when a series is national-only
+        if len(sel_sectors) == 1 and len(sel_ufs) == 1 and UF_NAMES.get(sel_ufs[0]):
+            uf_name = UF_NAMES[sel_ufs[0]]
+            if resolve_location(resolve_class_id(sel_sectors[0]), uf_name) != uf_name:
+                st.caption(f"⚠️ O IBGE não divulga o setor {sel_sectors[0]} para {uf_name}. A análise usará a série nacional (Brasil).")
+        
+        # Composite index weighting (only meaningful for multi-sector selections)
+        sel_weight_by = 'count'
+        if len(sel_sectors) > 1:
+            weight_label = st.radio("Ponderação do Índice Composto", list(WEIGHT_OPTIONS.values()), horizontal=True, key="weight_macro", help=TOOLTIPS["composite_weight"])
+            sel_weight_by = next(k for k, v in WEIGHT_OPTIONS.items() if v == weight_label)
             
         st.caption("ℹ️ **Nota:** O IBGE (PIM-PF Real) fornece dados apenas nível de UFs e Divisões CNAE (2 dígitos).")
 
@@ -341,184 +49,10 @@ def render_macro_filters(db: CNPJDatabase) -> dict:
         "ufs": sel_ufs, "municipio_codes": [], "sectors": sel_sectors,
         "groups": [], "classes": [],
         "portes": ["05"], "branch_mode": "Todos", "limit": 1000, "only_active": True,
-        "min_capital": 0.0, "max_capital": None, "date_start": None, "date_end": None
-    }
-
-def render_strategy_filters(db: CNPJDatabase) -> dict:
-    """Filters for 'Dinâmica Estratégica' (Micro correlation)."""
-    with st.expander("Filtros de Correlação (Micro)", expanded=False):
-        sel_ufs, sel_city_codes, sel_sectors, sel_groups, sel_classes = _render_common_geo_activity(db, "strat")
-        st.caption("Filtre o segmento Micro para correlacionar com a Produção Industrial Nacional.")
-        
-    return {
-        "ufs": sel_ufs, "municipio_codes": sel_city_codes, 
-        "sectors": sel_sectors, "groups": sel_groups, "classes": sel_classes,
-        "portes": ["05"], "branch_mode": "Todos", "limit": 1000, "only_active": True,
-        "min_capital": 0.0, "max_capital": None, "date_start": None, "date_end": None
+        "min_capital": 0.0, "max_capital": None, "date_start": None, "date_end": None,
+        "weight_by": sel_weight_by
     }
 
-def render_strategic_view(db: CNPJDatabase, filters):
-    st.subheader("Dinâmica Industrial (Micro + Macro)")
-    st.markdown("""
-    **Como Evolui?**
-    Aqui cruzamos a **Estrutura** (Novas Empresas) com a **Atividade** (Produção IBGE) para entender o ciclo econômico.
-    *Objetivo: Identificar correlações entre investimento empresarial e produção real.*
-    """)
-    
-    try:
-        # 1. Fetch Company Trend (Micro)
-        # Remove 'limit' as aggregation queries don't need it
-        trend_filters = filters.copy()
-        trend_filters.pop('limit', None)
-        
-        df_trend = db.get_opening_trend(**trend_filters)
-        
-        # 2. Fetch IBGE Data (Macro)
-        df_ibge = fetch_industry_data()
-        
-        # Logic: Try Correlation -> If fails, Show Trend Only
-        has_correlation = False
-        
-        if not df_trend.empty and not df_ibge.empty:
-            # Prepare Micro Data
-            df_micro = df_trend.copy()
-            df_micro['date'] = pd.to_datetime(df_micro['month_year'], format='%Y%m')
-            df_micro = df_micro.groupby('date')['count'].sum()
-            
-            # Prepare Macro Data
-            df_macro_raw = df_ibge[df_ibge['variable'].str.contains('Índice', na=False)].copy()
-            df_macro = df_macro_raw.groupby('date')['value'].mean()
-            
-            # Align
-            common_idx = df_micro.index.intersection(df_macro.index).sort_values()
-            
-            if len(common_idx) > 6:
-                has_correlation = True
-                # Create ALIGNED DataFrame
-                df_chart = pd.DataFrame({
-                    'date': common_idx,
-                    'Novas Empresas': df_micro.loc[common_idx].values,
-                    'Indústria (IBGE)': df_macro.loc[common_idx].values
-                })
-                
-                # Calculate Correlation with Safeguard
-                try:
-                    if df_chart['Novas Empresas'].nunique() <= 1 or df_chart['Indústria (IBGE)'].nunique() <= 1:
-                        corr = 0.0
-                    else:
-                        corr = df_chart['Novas Empresas'].corr(df_chart['Indústria (IBGE)'])
-                        if pd.isna(corr): corr = 0.0
-                except:
-                    corr = 0.0
-                
-                # Insight Text
-                if corr > 0.7: insight = "Forte Correlação Positiva"
-                elif corr < -0.7: insight = "Forte Correlação Negativa"
-                elif abs(corr) < 0.3: insight = "Sem Correlação Clara"
-                else: insight = "Correlação Moderada"
-                
-                # --- KPI CARD FOR CORRELATION ---
-                st.markdown("##### Sincronia de Mercado")
-                
-                c_kpi, c_desc = st.columns([1, 2])
-                c_kpi.metric("Correlação de Pearson", f"{corr:.2f}", insight)
-                
-                with c_desc:
-                    st.markdown("""
-                    <div style="background-color: var(--secondary-background-color); padding: 15px; border-radius: 8px; border: 1px solid rgba(128, 128, 128, 0.2);">
-                        <span style="font-weight: 600; font-size: 0.9em; opacity: 0.8;">O que isso significa?</span><br>
-                        <span style="font-size: 0.85em; opacity: 0.7;">
-                            O coeficiente mede se a <b>abertura de empresas</b> segue o ritmo da <b>produção industrial</b>.
-                            Valores próximos de <b>1.0</b> indicam que fábricas abrem exatamente quando a produção sobe.
-                        </span>
-                    </div>
-                    """, unsafe_allow_html=True)
-
-                st.divider()
-
-                # --- DUAL AXIS CHART ---
-                st.markdown("### Cruzamento de Tendências")
-                st.caption("Comparativo entre a abertura de empresas (no seu filtro) e a Produção Industrial Nacional.", help=TOOLTIPS["chart_evolution"])
-                
-                base = alt.Chart(df_chart).encode(x=alt.X('date:T', axis=alt.Axis(format='%Y'), title=None))
-                
-                line_micro = base.mark_line(color='#ff7f0e', strokeWidth=3).encode(
-                    y=alt.Y('Novas Empresas', axis=alt.Axis(title='Novas Empresas', titleColor='#ff7f0e'))
-                )
-                
-                line_macro = base.mark_line(color='#1f77b4', strokeDash=[5,5], strokeWidth=3).encode(
-                    y=alt.Y('Indústria (IBGE)', axis=alt.Axis(title='Benchmark Nacional (IBGE)', titleColor='#1f77b4'))
-                )
-                
-                combined = (line_micro + line_macro).resolve_scale(y='independent').encode(
-                    tooltip=[
-                        alt.Tooltip('date:T', title='Data', format='%b/%Y'),
-                        alt.Tooltip('Novas Empresas', title='Novas Empresas', format=',d'),
-                        alt.Tooltip('Indústria (IBGE)', title='Indústria (idx)', format='.2f')
-                    ]
-                ).properties(height=400)
-                
-                st.altair_chart(combined, width="stretch")
-                
-                st.info("💡 **Dica de Leitura:** A linha **Laranja (Sua Seleção)** mostra o ímpeto empreendedor. A linha **Azul (Tracejada)** é o ritmo do Brasil. Se a laranja sobe antes, é antecipação de ciclo.")
-                
-                with st.expander("Insight Avançado: O efeito 'Time Lag'", expanded=False):
-                     st.write("""
-                     **Atenção:** Frequentemente existe uma defasagem (atraso) entre a abertura da empresa (linha laranja) e o início da produção (linha azul).
-                     *   Fábricas demoram para ser construídas.
-                     *   Se a linha laranja sobe hoje e a azul não, pode indicar **aumento de capacidade futura** (investimento em andamento).
-                     """)
-
-        if not has_correlation:
-            # FALLBACK VIEW
-            if not df_trend.empty:
-                st.markdown("##### Tendência de Abertura Identificada")
-                st.caption("Evolução histórica de novos CNPJs.", help=TOOLTIPS["chart_evolution"])
-                
-                # Prepare Data
-                df_fb = df_trend.copy()
-                df_fb['date'] = pd.to_datetime(df_fb['month_year'], format='%Y%m')
-                
-                # Process Tooltip
-                if 'companies' in df_fb.columns:
-                    df_fb['Empresas'] = df_fb['companies'].apply(lambda x: ", ".join(list(x)) if x is not None else "")
-                else:
-                    df_fb['Empresas'] = "-"
-
-                chart_fb = alt.Chart(df_fb).mark_line(point=True, color='#ff7f0e').encode(
-                    x=alt.X('date:T', title='Data'),
-                    y=alt.Y('count:Q', title='Novas Empresas'),
-                    tooltip=[
-                        alt.Tooltip('date:T', title='Data', format='%b/%Y'), 
-                        alt.Tooltip('count', title='Qtd', format=',d'),
-                        alt.Tooltip('Empresas', title='Empresas')
-                    ]
-                ).properties(height=350)
-                st.altair_chart(chart_fb, width="stretch")
-                
-                reason = "dados esparsos" if not df_trend.empty else "falta de dados"
-                if df_ibge.empty: reason = "dados do IBGE indisponíveis no momento"
-                
-                st.info(f"""
-                **Por que não vejo a Correlação?** 
-                Para calcular o índice estatístico (Pearson), é necessário cruzar históricos contínuos. 
-                Neste caso ({reason}), exibimos apenas a **tendência de abertura**.
-                """)
-            else:
-                 st.warning("Sem dados suficientes para gerar visualização com os filtros atuais.")
-            
-    except Exception as e:
-        st.error(f"Erro ao gerar visão estratégica: {e}")
-
-UF_NAMES = {
-    'AC': 'Acre', 'AL': 'Alagoas', 'AP': 'Amapá', 'AM': 'Amazonas', 'BA': 'Bahia',
-    'CE': 'Ceará', 'DF': 'Distrito Federal', 'ES': 'Espírito Santo', 'GO': 'Goiás',
-    'MA': 'Maranhão', 'MT': 'Mato Grosso', 'MS': 'Mato Grosso do Sul', 'MG': 'Minas Gerais',
-    'PA': 'Pará', 'PB': 'Paraíba', 'PR': 'Paraná', 'PE': 'Pernambuco', 'PI': 'Piauí',
-    'RJ': 'Rio de Janeiro', 'RN': 'Rio Grande do Norte', 'RS': 'Rio Grande do Sul',
-    'RO': 'Rondônia', 'RR': 'Roraima', 'SC': 'Santa Catarina', 'SP': 'São Paulo',
-    'SE': 'Sergipe', 'TO': 'Tocantins'
-}
 NAME_TO_UF = {v: k for k, v in UF_NAMES.items()}
 NAME_TO_UF['Brasil'] = None # Special case
 
@@ -543,7 +77,77 @@ def render_educational_guide():
         *   `...` : Dado não disponível ainda.
         """)
 
-def render_macro_view(filters=None):
+def render_cycle_heatmap():
+    """Sector x UF map of the current cycle phase, computed for every PIM-PF series at once."""
+    st.subheader("Mapa Setorial de Ciclo (Setor × UF)")
+    st.caption("Fase atual do ciclo econômico para cada combinação de setor e estado publicada pelo IBGE.")
+    
+    load_map = st.checkbox("Carregar mapa de todos os setores", value=False, key="cycle_map_macro",
+                           help="Baixa as séries PIM-PF de todos os setores (resultado compartilhado e atualizado a cada hora).")
+    if not load_map:
+        return
+    
+    with st.spinner("Calculando o ciclo de todos os setores..."):
+        panel = get_sector_cycle_panel()
+    
+    if panel.empty:
+        st.warning("Dados do IBGE indisponíveis no momento.")
+        return
+    
+    df_latest = get_latest_phases(panel)
+    df_latest['uf'] = df_latest['location'].map(NAME_TO_UF).fillna('BR')
+    
+    # Sector labels from the CNAE hierarchy (fallback: raw code)
+    if cnae.is_available():
+        div_labels = pd.Series(cnae.labels('div'), index=cnae.codes('div'))
+        div_labels['05-09'] = "05-09 - INDÚSTRIAS EXTRATIVAS"
+        df_latest['sector_label'] = df_latest['sector'].map(div_labels).fillna(df_latest['sector']).str.slice(0, 45)
+    else:
+        df_latest['sector_label'] = df_latest['sector']
+    
+    uf_order = ['BR'] + sorted(u for u in df_latest['uf'].unique() if u != 'BR')
+    heat = alt.Chart(df_latest).mark_rect(stroke='white').encode(
+        x=alt.X('uf:N', title=None, sort=uf_order, axis=alt.Axis(labelAngle=0, orient='top')),
+        y=alt.Y('sector_label:N', title=None, axis=alt.Axis(labelLimit=320)),
+        color=alt.Color('phase:N', title='Fase', scale=alt.Scale(
+            domain=PHASE_ORDER,
+            range=[PHASES[p]['color'] for p in PHASE_ORDER]
+        ), legend=alt.Legend(orient='bottom')),
+        tooltip=[
+            alt.Tooltip('sector_label', title='Setor'),
+            alt.Tooltip('location', title='Local'),
+            alt.Tooltip('date:T', title='Referência', format='%b/%Y'),
+            alt.Tooltip('phase', title='Fase'),
+            alt.Tooltip('phase_duration', title='Meses na Fase'),
+            alt.Tooltip('momentum_3m', title='Momentum 3m (%)', format='.2f'),
+            alt.Tooltip('momentum_6m', title='Momentum 6m (%)', format='.2f')
+        ]
+    ).properties(height=max(300, 22 * df_latest['sector_label'].nunique()))
+    st.altair_chart(heat, width="stretch")
+    st.caption("ℹ️ Células vazias: combinação não divulgada pelo IBGE (sigilo ou ausência de série regional). BR = Brasil.")
+    
+    with st.expander("Histórico de Transições de Fase (últimos 12 meses)", expanded=False):
+        df_trans = get_phase_transitions(panel)
+        cutoff = panel['date'].max() - pd.DateOffset(months=12)
+        df_trans = df_trans[df_trans['date'] >= cutoff].copy()
+        df_trans['date'] = df_trans['date'].dt.strftime('%m/%Y')
+        st.dataframe(
+            df_trans.rename(columns={
+                'sector': 'Setor', 'location': 'Local', 'date': 'Mês',
+                'previous_phase': 'De', 'phase': 'Para',
+                'mom': 'Var. Mensal (%)', 'acc12': 'Acum. 12m (%)'
+            }),
+            hide_index=True, width="stretch"
+        )
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=32)
+def get_sector_weights_cached(_db, sector_codes: tuple, portes: tuple):
+    try:
+        return _db.get_sector_weights(sectors=list(sector_codes), portes=list(portes), only_active=True)
+    except Exception:
+        return pd.DataFrame()
+
+def render_macro_view(filters=None, db=None):
     # st.subheader("Atividade Industrial (Macro)") removed as it's now in app.py
     
     # 1. Determine Intended Location
@@ -564,18 +168,36 @@ def render_macro_view(filters=None):
         intended_sector = filters['sectors'][0]
         sector_code = intended_sector
     
-    # 2. Fetch Data & Validate Availability
+    # 1.6 Multi-sector: weighted composite of the per-sector series
+    composite_sectors = []
+    if filters and db is not None and filters.get('sectors') and len(filters['sectors']) > 1:
+        composite_sectors = sorted(s for s in filters['sectors'] if has_sector_series(s))
+    
+    # 2. Resolve the published locality before fetching (SIDRA catalog): a UF the
+    # series lacks is never requested, and the national fallback is announced up front
+    class_ids = [resolve_class_id(s) for s in composite_sectors] or [resolve_class_id(sector_code)]
+    actual_loc = intended_loc
+    for class_id in class_ids:
+        actual_loc = resolve_location(class_id, actual_loc)
+    if is_regional_intent and actual_loc != intended_loc:
+        scope = intended_sector or ', '.join(composite_sectors) or "Indústria Geral"
+        st.warning(f"⚠️ **Atenção:** IBGE não divulga dados de **{scope}** para **{intended_loc}**. Exibindo média nacional (Brasil).")
+
+    # 3. Fetch Data
     try:
-        df_ibge = fetch_industry_data(sector_code)
-        actual_loc = "Brasil"
-        
-        if not df_ibge.empty:
-            if intended_loc in df_ibge['location'].unique():
-                actual_loc = intended_loc
-            elif is_regional_intent:
-                actual_loc = "Brasil" # Fallback
+        df_ibge = pd.DataFrame()
+        if len(composite_sectors) > 1:
+            weight_by = filters.get('weight_by', 'count')
+            df_weights = get_sector_weights_cached(db, tuple(composite_sectors), tuple(filters.get('portes') or []))
+            df_ibge = get_composite_industry_data(tuple(composite_sectors), build_weight_table(df_weights, weight_by))
+            if not df_ibge.empty:
+                intended_sector = f"Composto ({', '.join(composite_sectors)})"
+        if df_ibge.empty:
+            df_ibge = fetch_industry_data(sector_code)
+        if not df_ibge.empty and actual_loc not in df_ibge['location'].unique():
+            actual_loc = "Brasil"  # No SIDRA catalog (scripts/refresh_sidra_catalog.py) to resolve it before
         
-        # 3. Render Header with ACTUAL location & Sector
+        # 4. Render Header with ACTUAL location & Sector
         sector_display = f"do setor **{intended_sector}**" if intended_sector else "da **Indústria Geral**"
         
         info_text = f"""
@@ -584,9 +206,15 @@ def render_macro_view(filters=None):
         """
         st.info(info_text, icon="📉")
         
+        if intended_sector and intended_sector.startswith("Composto"):
+            skipped = [s for s in filters['sectors'] if s not in composite_sectors]
+            weight_label = WEIGHT_OPTIONS.get(filters.get('weight_by', 'count'))
+            st.caption(f"Índice composto: média ponderada dos índices setoriais do IBGE (peso: **{weight_label}** na base CNPJ). Variações recalculadas a partir do índice composto."
+                       + (f" Setores sem série PIM-PF própria ignorados: {', '.join(skipped)}." if skipped else ""))
+        
         # render_educational_guide() MOVED TO BOTTOM
         
-        # 4. Context/Status Messages
+        # 5. Context/Status Messages
         if filters:
              active_msg = []
              
@@ -596,10 +224,7 @@ def render_macro_view(filters=None):
              if is_sector_synced and is_region_synced:
                  pass # Standard behavior, header already explains it.
              elif is_sector_synced:
-                 if is_regional_intent:
-                     st.warning(f"⚠️ **Atenção:** IBGE não divulga dados de **{intended_sector}** para **{intended_loc}**. Exibindo média nacional (Brasil).")
-                 else:
-                     pass # Standard sector view
+                 pass # Standard sector view (a missing UF series was announced before fetching)
              elif is_region_synced:
                  # Region match, but Sector mismatch (likely multiple or none)
                  if filters.get('sectors') and len(filters['sectors']) > 1:
@@ -612,7 +237,7 @@ def render_macro_view(filters=None):
                  if filter_list and not (is_sector_synced or is_region_synced):
                       st.info(f"ℹ️ **Modo Benchmark:** Sua seleção ({' + '.join(filter_list)}) não possui série histórica direta. O gráfico exibe **Indústria Geral / Brasil**.")
 
-        # 5. Render Charts
+        # 6. Render Charts
         if not df_ibge.empty:
             # Define Keys
             k_idx_clean = 'Índice Base Fixa (2022=100)'
@@ -695,22 +320,10 @@ def render_macro_view(filters=None):
             mom = metrics.get(mom_key, 0)
             acc12 = metrics.get(acc12_key, 0)
             
-            if mom > 0 and acc12 > 0:
-                diag_title = "FASE DE EXPANSÃO"
-                diag_msg = "Resumo: O setor vive um **Ciclo Virtuoso**. O crescimento recente (Ritmo) é positivo e sustenta a alta de longo prazo (Tendência)."
-                diag_type = "success"
-            elif mom < 0 and acc12 > 0:
-                diag_title = "FASE DE DESACELERAÇÃO"
-                diag_msg = "Resumo: **Alerta Amarelo**. A tendência estrutural ainda é positiva (acumulado 12m cresce), mas o ritmo mensal perdeu força."
-                diag_type = "warning"
-            elif mom > 0 and acc12 < 0:
-                diag_title = "FASE DE RECUPERAÇÃO"
-                diag_msg = "Resumo: **Sinais de Melhora**. O setor ainda acumula perdas no longo prazo, mas o ritmo recente voltou a acelerar."
-                diag_type = "info"
-            else:
-                diag_title = "FASE DE CONTRAÇÃO"
-                diag_msg = "Resumo: **Sinal Vermelho**. Retração generalizada tanto no ritmo atual quanto no histórico de 12 meses."
-                diag_type = "error"
+            phase = PHASES[classify_phase(mom, acc12)]
+            diag_title = phase['title']
+            diag_msg = phase['msg']
+            diag_type = phase['type']
             
             if diag_type == "success": st.success(f"**{diag_title}**\n\n{diag_msg}")
             elif diag_type == "warning": st.warning(f"**{diag_title}**\n\n{diag_msg}")
@@ -755,7 +368,7 @@ def render_macro_view(filters=None):
                 st.caption("Variação Mensal (Sazonal) - O termômetro da volatilidade.")
                 
                 df_pulse = df_ibge[ (df_ibge['variable'] == mom_key) & (df_ibge['location'] == actual_loc) ]
-                df_pulse = filter_by_timeframe(df_pulse)
+                df_pulse = chart_data(filter_by_timeframe(df_pulse), ('date', 'value'))
                 
                 bar_pulse = alt.Chart(df_pulse).mark_bar().encode(
                     x=alt.X('date:T', axis=alt.Axis(format='%b/%y', labelAngle=-45), title=None),
@@ -771,7 +384,7 @@ def render_macro_view(filters=None):
                 st.caption("Acumulado 12 Meses - Direção estrutural do ciclo.")
                 
                 df_trend = df_ibge[ (df_ibge['variable'] == acc12_key) & (df_ibge['location'] == actual_loc) ]
-                df_trend = filter_by_timeframe(df_trend)
+                df_trend = chart_data(filter_by_timeframe(df_trend), ('date', 'value'), x='date', y='value')
                 
                 area_trend = alt.Chart(df_trend).mark_area(line={'color':'#1f77b4'}, color=alt.Gradient(
                     gradient='linear', stops=[alt.GradientStop(color='white', offset=0), alt.GradientStop(color='#1f77b4', offset=1)],
@@ -796,7 +409,7 @@ def render_macro_view(filters=None):
                 if show_benchmark: valid_locs.append("Brasil")
             
             df_chart = df_ibge[ (df_ibge['variable'] == idx_key) & (df_ibge['location'].isin(valid_locs)) ].copy()
-            df_chart = filter_by_timeframe(df_chart)
+            df_chart = chart_data(filter_by_timeframe(df_chart), ('date', 'value', 'location'), x='date', y='value', by='location')
             
             base_chart = alt.Chart(df_chart).mark_line(point=True)
             if len(valid_locs) > 1:
@@ -933,6 +546,9 @@ def render_macro_view(filters=None):
     except Exception as e:
         st.error(f"Erro ao carregar dados macro: {e}")
 
+    st.divider()
+    render_cycle_heatmap()
+
     # GUIDE MOVED HERE
     st.divider()
     render_educational_guide()
@@ -1011,556 +627,3 @@ def render_methodology_view():
     *   **Natureza:** CNPJ é um dado cadastral. Não informa faturamento real nem número de funcionários atualizado em tempo real.
     *   **Proxy:** Usamos "Filiais" como proxy de fábrica, mas uma filial pode ser apenas um escritório de vendas ou galpão logístico. A análise assume que, na agregação (Lei dos Grandes Números), o movimento de filiais industriais segue a lógica produtiva.
     """)
-
-def render_market_intelligence_view(db: CNPJDatabase, filters):
-    """
-    Landing Page: Market Structure Analysis (Detailed).
-    """
-    # [OPTION A] HEADER CARD FOR METADATA
-    sel_cnaes = filters.get('cnaes', [])
-    # Dynamic Description
-    summary_text = generate_structural_summary("struct")
-    st.info(summary_text)
-
-    # Unpack Filters
-    sel_ufs = filters.get("ufs", [])
-    sel_city_codes = filters.get("municipio_codes", [])
-    sel_sectors = filters.get("sectors", [])
-    
-    # CSS: Card Style for Metrics
-    st.markdown("""
-    <style>
-    div[data-testid="stMetric"] {
-        background-color: var(--background-color);
-        border: 1px solid rgba(128, 128, 128, 0.2);
-        padding: 15px;
-        border-radius: 8px;
-        box-shadow: 0 1px 2px rgba(0,0,0,0.05);
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
-    with st.spinner("Processando Big Data..."):
-        try:
-            # 1. Prepare Data
-            mi_filters = filters.copy()
-            limit = mi_filters.pop('limit', 1000)
-            
-            # --- FETCH DATA ---
-            metrics_view = db.get_aggregation_metrics(**mi_filters)
-            true_total = metrics_view.get('count', 0)
-            
-            filters_fin = mi_filters.copy()
-            filters_fin['branch_mode'] = 'Somente Matrizes'
-            metrics_fin = db.get_aggregation_metrics(**filters_fin)
-            true_avg_cap = metrics_fin.get('avg_cap', 0.0)
-            
-            df_sectors = db.get_sector_distribution(**mi_filters)
-            df_companies = db.get_filtered_companies(limit=limit, **mi_filters)
-
-            # --- ENRICHMENT REMOVED (Handled by SQL) ---
-            # Data is now enriched directly in BigQuery for performance.
-            
-            if df_companies.empty:
-                st.warning("Nenhum estabelecimento encontrado com os filtros atuais.")
-                return
-
-            # Format CNPJ
-            if 'cnpj_ordem' in df_companies.columns and 'cnpj_dv' in df_companies.columns:
-                 df_companies['cnpj_basico'] = df_companies['cnpj_basico'].astype(str).str.zfill(8)
-                 df_companies['cnpj_ordem'] = df_companies['cnpj_ordem'].astype(str).str.zfill(4)
-                 df_companies['cnpj_dv'] = df_companies['cnpj_dv'].astype(str).str.zfill(2)
-                 df_companies['cnpj_real'] = df_companies['cnpj_basico'].str[:2] + "." + df_companies['cnpj_basico'].str[2:5] + "." + df_companies['cnpj_basico'].str[5:] + "/" + df_companies['cnpj_ordem'] + "-" + df_companies['cnpj_dv']
-            else:
-                 df_companies['cnpj_real'] = df_companies['cnpj_basico']
-
-            # --- SECTION 1: KPIS (Top Row) ---
-            # Helper: Concentration
-            total_mkt = true_total if true_total > 0 else 1
-            concentration = 0
-            leader_name = "-"
-            if not df_sectors.empty:
-                top_sec = df_sectors.iloc[0]
-                concentration = (top_sec['count'] / total_mkt) * 100
-                leader_name = top_sec['sector_code']
-
-            # Helper: Formats (Brazilian Standard - ABNT NBR 5891)
-            fmt_total = format_count(true_total, abbreviate=False)
-            fmt_cap = format_currency_br(true_avg_cap, context="kpi")
-            fmt_cap_tooltip = format_currency_br(true_avg_cap, context="tooltip")
-
-            st.markdown("##### Indicadores Chave")
-            k1, k2, k3, k4 = st.columns(4)
-            k1.metric(
-                "Estabelecimentos Ativos", 
-                fmt_total, 
-                "Total em Operação", 
-                help=TOOLTIPS["kpi_active_companies"]
-            )
-            k2.metric(
-                "Capital Médio", 
-                fmt_cap, 
-                "Solidez Financeira", 
-                help=f"{TOOLTIPS['kpi_avg_capital']}\n\nValor exato: {fmt_cap_tooltip}"
-            )
-            k3.metric(
-                "Setor Líder", 
-                leader_name, 
-                "Maior Volume", 
-                help=TOOLTIPS["kpi_setor_lider"]
-            )
-            k4.metric(
-                "Concentração", 
-                format_percentage(concentration, precision=1), 
-                "Share do Top 1", 
-                help=TOOLTIPS["kpi_concentration"]
-            )
-            
-            st.markdown("---")
-            
-            # --- SECTION 1.5: DISTRIBUTION & INTERACTIVITY (Bidirectional) ---
-            st.markdown("##### Distribuição da Base (Clique para Filtrar)")
-            
-            # st.columns(2) removed to fix "compressed" look
-            # c_g, c_s = st.columns(2) 
-            
-            # Selectors
-            sel_uf_click = alt.selection_point(fields=['uf'], name='sel_uf')
-            sel_sec_click = alt.selection_point(fields=['sector_code'], name='sel_sec')
-            
-            # 1. Geo Distribution (Stacked)
-            col_geo_title, col_geo_toggle = st.columns([2, 1])
-            with col_geo_title:
-                st.markdown("##### Distribuição Geográfica")
-            with col_geo_toggle:
-                geo_mode = st.radio("Visão:", ["Volume Absoluto", "Especialização (QL)"], horizontal=True, label_visibility="collapsed")
-
-            df_geo = db.get_geo_distribution(**mi_filters)
-            
-            if not df_geo.empty:
-                # Helper: Fetch Benchmark for QL
-                @st.cache_data
-                def get_benchmark_cached():
-                    return db.get_benchmark_geo()
-                
-                df_bench = get_benchmark_cached()
-                
-                # --- LOGIC: SPECIALIZATION (QL) ---
-                if geo_mode == "Especialização (QL)" and not df_bench.empty:
-                    # 1. Merge Sector Data with Benchmark
-                    df_merged = df_geo.merge(df_bench, on='uf', how='inner', suffixes=('', '_bench'))
-                    
-                    # 2. Calculate Shares
-                    total_sector = df_merged['count'].sum()
-                    total_industry = df_bench['total_count'].sum()
-                    
-                    df_merged['share_sector'] = df_merged['count'] / total_sector
-                    df_merged['share_industry'] = df_merged['total_count'] / total_industry
-                    
-                    # 3. Calculate QL = Share Sector / Share Industry
-                    df_merged['ql'] = df_merged['share_sector'] / df_merged['share_industry']
-                    
-                    # 4. Pre-calculate Color in Python to avoid Altair/Vega complex nesting error
-                    def get_color(val):
-                        if val > 1.2: return '#2ca02c' # Green
-                        if val < 0.8: return '#d62728' # Red
-                        return 'lightgray'
-                    
-                    df_merged['color_hex'] = df_merged['ql'].apply(get_color)
-
-                    # LIMIT TO TOP 10 SPECIALIZED to avoid UI clutter
-                    df_viz = df_merged.sort_values('ql', ascending=False).head(10)
-
-                    # 5. Render Chart
-                    chart_geo = alt.Chart(df_viz).mark_bar().add_params(sel_uf_click).encode(
-                        x=alt.X('ql:Q', title='Índice de Especialização (QL)', axis=alt.Axis(grid=True)),
-                        y=alt.Y('uf:N', sort='-x', title=None),
-                        # Use pre-calculated color, scale=None means "use the raw values as visuals"
-                        color=alt.Color('color_hex:N', scale=None, legend=None),
-                        # Use Opacity to indicate selection state (High opacity if selected or nothing selected)
-                        opacity=alt.condition(sel_uf_click, alt.value(1), alt.value(0.3)),
-                        tooltip=[
-                            alt.Tooltip('uf', title='Estado'), 
-                            alt.Tooltip('ql', title='Índice QL', format='.2f'),
-                            alt.Tooltip('count', title='Qtd. Empresas')
-                        ]
-                    ).properties(height=350, title="Top 10: Grau de Especialização Regional (1.0 = Média BR)")
-                    
-                    geo_event = st.altair_chart(chart_geo, width="stretch", on_select="rerun", key="struct_geo_ql")
-                    
-                    st.caption("ℹ️ **Como ler:** QL > 1 indica que o Estado é **especializado** neste setor (Hub). Reduz o viés populacional de SP/RJ.")
-                    
-                else:
-                    # --- LOGIC: ABSOLUTE VOLUME (Legacy) ---
-                    # Reverted to Top 10 per user request
-                    chart_geo = alt.Chart(df_geo.head(10)).mark_bar().add_params(sel_uf_click).encode(
-                        x=alt.X('count:Q', title='Qtd', axis=alt.Axis(grid=False)),
-                        y=alt.Y('uf:N', sort='-x', title=None, axis=alt.Axis(labelOverlap=False)), # Force all labels
-                        color=alt.condition(sel_uf_click, alt.value('#2ecc71'), alt.value('lightgray')),
-                        tooltip=['uf', 'count']
-                    ).properties(height=300, title="Top Estados (Contagem Absoluta)")
-                    
-                    st.caption("ℹ️ Entenda a Distribuição Geográfica", help=TOOLTIPS["chart_geo"])
-                    geo_event = st.altair_chart(chart_geo, width="stretch", on_select="rerun", key="struct_geo")
-            else:
-                st.info("Sem dados geográficos.")
-                geo_event = None
-
-            st.divider() # Visual separation between charts
-
-            # 2. Sector Distribution (Stacked)
-            # Already fetched in df_sectors
-            if not df_sectors.empty:
-                # Enrich with Description
-                df_divs = get_options_cached(db, 'get_industrial_divisions')
-                if not df_divs.empty and 'sector_code' in df_sectors.columns:
-                    # Create mapping
-                    # Less truncation needed now that we have full width
-                    df_divs['short_desc'] = df_divs['label'].apply(lambda x: x.split(" - ")[1][:50] + "..." if len(x.split(" - ")[1]) > 50 else x.split(" - ")[1])
-                    df_divs['hybrid_label'] = df_divs['division_code'] + " - " + df_divs['short_desc']
-                    
-                    df_sectors = df_sectors.merge(df_divs[['division_code', 'hybrid_label', 'label']], left_on='sector_code', right_on='division_code', how='left')
-                    df_sectors['display_label'] = df_sectors['hybrid_label'].fillna(df_sectors['sector_code'])
-                    df_sectors['full_label'] = df_sectors['label'].fillna(df_sectors['sector_code'])
-                else:
-                    df_sectors['display_label'] = df_sectors['sector_code']
-                    df_sectors['full_label'] = df_sectors['sector_code']
-
-                chart_sec = alt.Chart(df_sectors.head(10)).mark_bar().add_params(sel_sec_click).encode(
-                    x=alt.X('count:Q', title='Qtd', axis=alt.Axis(grid=False)),
-                    y=alt.Y('display_label:N', sort='-x', title=None, axis=alt.Axis(labelLimit=400)), # Increased Label Limit
-                    color=alt.condition(sel_sec_click, alt.value('#9b59b6'), alt.value('lightgray')),
-                    tooltip=[alt.Tooltip('full_label', title='Setor'), alt.Tooltip('count', title='Qtd', format=',d')]
-                ).properties(height=350, title="Top Setores (Distribuição Industrial)") # Increased Height
-                
-                st.caption("ℹ️ Entenda a Distribuição Setorial", help=TOOLTIPS["chart_sector"])
-                sec_event = st.altair_chart(chart_sec, width="stretch", on_select="rerun", key="struct_sec")
-            else:
-                st.info("Sem dados setoriais.")
-                sec_event = None
-
-            # --- HANDLE INTERACTIONS ---
-            # 1. Geo Click
-            if geo_event and geo_event.selection.get('sel_uf'):
-                clicked_uf = geo_event.selection['sel_uf'][0]['uf']
-                st.session_state['ufs_struct'] = [clicked_uf]
-                st.rerun()
-
-            # 2. Sector Click
-            if sec_event and sec_event.selection.get('sel_sec'):
-                clicked_code = sec_event.selection['sel_sec'][0]['sector_code']
-                # Resolve Label for Widget (e.g. "10 - Alimentos")
-                 # Fetch Ref
-                df_ref = get_options_cached(db, 'get_industrial_divisions')
-                if not df_ref.empty:
-                    match = df_ref[df_ref['division_code'] == clicked_code]
-                    if not match.empty:
-                        clean_label = match.iloc[0]['label']
-                        st.session_state['sec_struct'] = [clean_label]
-                        st.rerun()
-
-            st.markdown("---")
-
-            # 4.5 Qualitative Profile (Maturity & Sophistication) -> MOVED UP
-            st.markdown("### Perfil Qualitativo")
-            st.caption("Análise da maturidade e sofisticação jurídica do mercado.")
-            
-            c_age, c_nature = st.columns(2)
-            
-            with c_age:
-                st.markdown("#### Ciclo de Maturidade", help=TOOLTIPS["chart_maturidade"])
-                st.caption("Distribuição por idade das empresas.")
-                
-                df_maturity = db.get_maturity_profile(**mi_filters)
-                if not df_maturity.empty:
-                    chart_maturity = alt.Chart(df_maturity).mark_bar().encode(
-                        x=alt.X('count:Q', title='Quantidade', axis=alt.Axis(format='d')),
-                        y=alt.Y('category:N', sort=None, title=None),
-                        color=alt.Color('category:N', legend=None, scale=alt.Scale(
-                            domain=['1. Novas Entrantes (< 3 anos)', '2. Jovens (3 a 9 anos)', '3. Consolidadas (10 a 20 anos)', '4. Veteranas (> 20 anos)'],
-                            range=['#fee5d9', '#fcae91', '#fb6a4a', '#cb181d']
-                        )),
-                        tooltip=[
-                            alt.Tooltip('category', title='Faixa Etária'),
-                            alt.Tooltip('count', title='Empresas', format=',d')
-                        ]
-                    ).properties(height=300, title='Resiliência de Mercado')
-                    st.altair_chart(chart_maturity, width="stretch")
-                    
-                    # Insight
-                    if not df_maturity.empty:
-                        total = df_maturity['count'].sum()
-                        new_pct = (df_maturity[df_maturity['category'].str.contains('Novas')]['count'].sum() / total * 100) if total > 0 else 0
-                        
-                        if new_pct > 40:
-                            st.info(f"**Mercado Vibrante:** {new_pct:.1f}% são novas entrantes (< 3 anos). Alta rotatividade e baixa barreira de entrada.")
-                        elif new_pct < 15:
-                            st.warning(f"**Mercado Consolidado:** Apenas {new_pct:.1f}% são novas. Dominado por veteranas. Alta barreira de entrada.")
-                        else:
-                            st.success(f"**Mercado Equilibrado:** {new_pct:.1f}% de novas empresas. Mix saudável entre inovação e experiência.")
-                else:
-                    st.info("Sem dados de idade disponíveis.")
-            
-            with c_nature:
-                st.markdown("#### Grau de Formalização")
-                st.caption("Distribuição por natureza jurídica.")
-                
-                df_nature = db.get_legal_nature_profile(**mi_filters)
-                if not df_nature.empty:
-                    chart_nature = alt.Chart(df_nature).mark_arc(innerRadius=60).encode(
-                        theta=alt.Theta('count:Q'),
-                        color=alt.Color('category:N', legend=alt.Legend(title='Tipo Jurídico', orient='bottom'), scale=alt.Scale(
-                            domain=['Sociedade Limitada (LTDA)', 'S.A. (Corporação)', 'Empresário Individual / SLU', 'Cooperativa', 'Pública / Estatal', 'Outros'],
-                            range=['#1f77b4', '#ff7f0e', '#2ca02c', '#9467bd', '#7f7f7f', '#c7c7c7']
-                        )),
-                        tooltip=[
-                            alt.Tooltip('category', title='Natureza'),
-                            alt.Tooltip('count', title='Empresas', format=',d')
-                        ]
-                    ).properties(height=300, title='Estrutura Corporativa')
-                    st.altair_chart(chart_nature, width="stretch")
-                    
-                    # Insight
-                    if not df_nature.empty:
-                        total = df_nature['count'].sum()
-                        sa_pct = (df_nature[df_nature['category'].str.contains('S.A.')]['count'].sum() / total * 100) if total > 0 else 0
-                        
-                        if sa_pct > 20:
-                            st.success(f"**Alta Sofisticação:** {sa_pct:.1f}% são S.A. (governança corporativa). Mercado profissionalizado.")
-                        elif sa_pct < 5:
-                            st.info(f"**Mercado Familiar:** Apenas {sa_pct:.1f}% de S.A. Dominado por LTDA (empresas familiares).")
-                        else:
-                            st.info(f"**Mix Corporativo:** {sa_pct:.1f}% de S.A. Equilíbrio entre estruturas familiares e profissionais.")
-                else:
-                    st.info("Sem dados de natureza jurídica disponíveis.")
-
-            st.divider()
-
-            # --- SECTION 2: LEADERSHIP (Podium + Chart) ---
-            st.markdown("##### Maiores Capacidades Instaladas (Capital Social)")
-            
-            # Fetch Top 100 for Ranking
-            filters_rank = mi_filters.copy()
-            filters_rank['branch_mode'] = 'Somente Matrizes'
-            df_top100 = db.get_filtered_companies(limit=100, **filters_rank)
-            
-            if not df_top100.empty:
-                 df_top100 = df_top100.sort_values('capital_social', ascending=False).reset_index(drop=True)
-                 
-                 c_podium, c_chart = st.columns([1, 2])
-                 
-                 with c_podium:
-                     st.caption("**Top 3 (Matrizes)**")
-                     for i in range(min(3, len(df_top100))):
-                         row = df_top100.iloc[i]
-                         val = row['capital_social']
-                         val_fmt = f"R$ {val/1e9:,.1f} B" if val > 1e9 else f"R$ {val/1e6:,.1f} M"
-                         st.markdown(f"""
-                         <div style="background-color: var(--secondary-background-color); border-radius: 8px; padding: 10px; margin-bottom: 8px; border: 1px solid rgba(128, 128, 128, 0.2); border-left: 4px solid #f1c40f; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
-                            <div style="font-size: 0.8rem; font-weight: 600; opacity: 0.7;">#{i+1} LÍDER</div>
-                            <div style="font-size: 0.95rem; font-weight: 700; word-wrap: break-word; white-space: normal;">{row['razao_social']}</div>
-                            <div style="font-size: 0.8rem; opacity: 0.8;">{val_fmt}</div>
-                         </div>
-                         """, unsafe_allow_html=True)
-
-                 with c_chart:
-                     st.caption("**Ranking Top 10 (Capital Social)**", help=TOOLTIPS["chart_ranking_capital"])
-                     chart_rank = alt.Chart(df_top100.head(10)).mark_bar().encode(
-                         x=alt.X('capital_social:Q', title='Capital (R$)', axis=alt.Axis(format=',.2s', grid=False)),
-                         y=alt.Y('razao_social:N', sort='-x', title=None, axis=alt.Axis(labelLimit=200)),
-                         color=alt.value('#3b82f6'),
-                         tooltip=['razao_social', alt.Tooltip('capital_social', title='Capital Social (R$)', format=',.2f')]
-                     ).properties(height=280)
-                     st.altair_chart(chart_rank, width="stretch")
-            else:
-                st.info("Ranking indisponível para esta seleção.")
-                
-            st.caption("⚠️ **Nota de Leitura:** O ranking baseia-se no **Capital Social** (Investimento/Capacidade), e não no Faturamento/Receita.")
-            st.markdown("---")
-
-            st.divider()
-
-            # 5. Detailed Asset List (Unified View - No Rank)
-            st.markdown("### Detalhamento da Base (Em Estoque)")
-            
-            df_disp = df_companies.copy()
-            # Enrich Porte
-            porte_map = {'00': 'N/D', '01': 'Micro', '03': 'Pequeno', '05': 'Médio/Gd'}
-            if 'porte_empresa' in df_disp.columns:
-                df_disp['Porte'] = df_disp['porte_empresa'].fillna('00').apply(lambda x: porte_map.get(str(x), str(x)))
-            else: df_disp['Porte'] = '-'
-            
-            # Enrich Status
-            if 'situacao_cadastral' in df_disp.columns:
-                df_disp['Status'] = df_disp['situacao_cadastral'].apply(get_status_description)
-            else: df_disp['Status'] = '-'
-            
-            # Enrich Type
-            if 'identificador_matriz_filial' in df_disp.columns:
-                df_disp['tipo_label'] = df_disp['identificador_matriz_filial'].map({'1': 'MATRIZ', '2': 'FILIAL'}).fillna('?')
-            else: df_disp['tipo_label'] = '-'
-            
-            # Capital Format
-            df_disp['Capital (R$)'] = df_disp['capital_social'].apply(lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-
-            # Descriptions (Safe Get)
-            if 'cnae_desc' not in df_disp.columns: df_disp['cnae_desc'] = df_disp.get('cnae_fiscal_principal', '-')
-            if 'natureza_desc' not in df_disp.columns: df_disp['natureza_desc'] = df_disp.get('natureza_juridica', '-')
-
-            # Format Date
-            if 'data_inicio_atividade' in df_disp.columns:
-                df_disp['Data Abertura'] = pd.to_datetime(df_disp['data_inicio_atividade'], errors='coerce').dt.strftime('%d/%m/%Y')
-            else: df_disp['Data Abertura'] = '-'
-
-            # Format Address
-            def get_address(row):
-                parts = [row.get('tipo_logradouro', ''), row.get('logradouro', ''), row.get('numero', '')]
-                addr = " ".join([str(p) for p in parts if p]).strip()
-                if row.get('complemento'): addr += f" ({row['complemento']})"
-                if row.get('bairro'): addr += f" - {row['bairro']}"
-                if row.get('cep'): addr += f", CEP {row['cep']}"
-                return addr.strip() or '-'
-            
-            df_disp['Endereço'] = df_disp.apply(get_address, axis=1)
-            df_disp['Cidade/UF'] = df_disp['municipio_nome'] + "/" + df_disp['uf']
-
-            # Format Contact
-            def get_contact(row):
-                contacts = []
-                if row.get('correio_eletronico'): contacts.append(str(row['correio_eletronico']).lower())
-                if row.get('telefone_1'): 
-                    ddd = str(row.get('ddd_1', '')).strip()
-                    tel = str(row.get('telefone_1', '')).strip()
-                    if tel: contacts.append(f"({ddd}) {tel}")
-                return " | ".join(contacts) or '-'
-            
-            df_disp['Contato'] = df_disp.apply(get_contact, axis=1)
-
-            # Format Subclass (Code + Description)
-            if 'cnae_fiscal_principal' in df_disp.columns:
-                df_disp['Subclasse'] = df_disp.apply(
-                    lambda x: f"{format_cnae(x.get('cnae_fiscal_principal', ''))} - {x.get('cnae_desc', '')}", 
-                    axis=1
-                )
-                
-                # Enrich Typology (Level 1 Analysis)
-                # Apply classification to each row based on CNAE
-                typ_series = df_disp['cnae_fiscal_principal'].fillna('').apply(get_industrial_typology)
-                df_disp['Tipo Indústria'] = typ_series.apply(lambda x: x['tipo_industria'])
-                df_disp['Posição Cadeia'] = typ_series.apply(lambda x: x['cadeia_valor'])
-
-            else:
-                 df_disp['Subclasse'] = df_disp.get('cnae_desc', '-')
-                 df_disp['Tipo Indústria'] = '-'
-                 df_disp['Posição Cadeia'] = '-'
-
-            st.dataframe(
-                df_disp,
-                height=600,
-                width="stretch",
-                column_order=[
-                    "cnpj_real", 
-                    "razao_social",
-                    "tipo_label", 
-                    "Status",
-                    "Data Abertura",
-                    "Porte",
-                    "Capital (R$)", 
-                    "Cidade/UF",
-                    "natureza_desc", 
-                    "Subclasse",
-                    "Tipo Indústria",
-                    "Posição Cadeia",
-                    "Endereço",
-                    "Contato"
-                ],
-                column_config={
-                    "cnpj_real": st.column_config.TextColumn("CNPJ", width="medium"),
-                    "razao_social": st.column_config.TextColumn("Razão Social / Nome Empresarial", width="large"),
-                    "tipo_label": st.column_config.TextColumn("Tipo", width="small"),
-                    "Status": st.column_config.TextColumn("Situação", width="small"),
-
-                    "Data Abertura": st.column_config.TextColumn("Início Ativ.", width="small"),
-                    "Porte": st.column_config.TextColumn("Porte", width="small"),
-                    "Capital (R$)": st.column_config.TextColumn("Capital Social", width="medium"),
-                    "Cidade/UF": st.column_config.TextColumn("Localização", width="medium"),
-                    "natureza_desc": st.column_config.TextColumn("Natureza Jurídica", width="medium"),
-                    "Subclasse": st.column_config.TextColumn("Atividade (Subclasse CNAE)", width="large"),
-                    "Tipo Indústria": st.column_config.TextColumn("Tipologia (Nível 1)", width="medium"),
-                    "Posição Cadeia": st.column_config.TextColumn("Cadeia de Valor", width="small"),
-                    "Endereço": st.column_config.TextColumn("Endereço Completo", width="large"),
-                    "Contato": st.column_config.TextColumn("Contatos", width="medium"),
-                },
-                hide_index=True
-            )
-
-            # --- SECTION 6: DYNAMICS (Moved from Strategy Page to enforce Structure -> Flow) ---
-            st.divider()
-            st.subheader("Vitalidade do Setor (Fluxo & Atratividade)")
-            st.caption("Monitoramento de **Novas Entradas** como indicador antecedente de aquecimento (Leading Indicator).")
-            
-            # 1. Fetch Company Trend (Micro)
-            trend_filters = filters.copy()
-            trend_filters.pop('limit', None)
-            df_trend = db.get_opening_trend(**trend_filters)
-            
-            # 2. Fetch IBGE Data (Macro)
-            df_ibge = fetch_industry_data()
-            
-            has_correlation = False
-            
-            if not df_trend.empty and not df_ibge.empty:
-                # Prepare Micro Data
-                df_micro = df_trend.copy()
-                df_micro['date'] = pd.to_datetime(df_micro['month_year'], format='%Y%m')
-                df_micro = df_micro.groupby('date')['count'].sum()
-                
-                # Prepare Macro Data
-                df_macro_raw = df_ibge[df_ibge['variable'].str.contains('Índice', na=False)].copy()
-                df_macro = df_macro_raw.groupby('date')['value'].mean()
-                
-                # Align
-                common_idx = df_micro.index.intersection(df_macro.index).sort_values()
-                
-                if len(common_idx) > 6:
-                    has_correlation = True
-                    df_chart = pd.DataFrame({
-                        'date': common_idx,
-                        'Novas Empresas': df_micro.loc[common_idx].values,
-                        'Indústria (IBGE)': df_macro.loc[common_idx].values
-                    })
-                    
-                    # SAFEGUARD: Correlation requires variance
-                    try:
-                        if df_chart['Novas Empresas'].nunique() <= 1 or df_chart['Indústria (IBGE)'].nunique() <= 1:
-                            corr = 0.0 # No variance -> No correlation
-                        else:
-                            corr = df_chart['Novas Empresas'].corr(df_chart['Indústria (IBGE)'])
-                            if pd.isna(corr): corr = 0.0
-                    except:
-                        corr = 0.0
-
-                    if corr > 0.7: insight = "Forte Correlação Positiva"
-                    elif corr < -0.7: insight = "Forte Correlação Negativa"
-                    elif abs(corr) < 0.3: insight = "Sem Correlação Clara"
-                    else: insight = "Correlação Moderada"
-                    
-                    st.metric("Correlação (Abertura vs Produção)", f"{corr:.2f}", insight, help=TOOLTIPS["kpi_correlacao"])
-                    
-                    # Chart
-                    base = alt.Chart(df_chart).encode(x=alt.X('date:T', axis=alt.Axis(format='%Y'), title=None))
-                    line_micro = base.mark_line(color='#ff7f0e').encode(y=alt.Y('Novas Empresas', axis=alt.Axis(titleColor='#ff7f0e')))
-                    line_macro = base.mark_line(color='#1f77b4', strokeDash=[5,5]).encode(y=alt.Y('Indústria (IBGE)', axis=alt.Axis(titleColor='#1f77b4')))
-                    
-                    st.altair_chart((line_micro + line_macro).resolve_scale(y='independent'), width="stretch")
-            
-            if not has_correlation and not df_trend.empty:
-                 # Fallback Trend Only
-                 chart_fb = alt.Chart(df_trend).mark_line(point=True, color='#ff7f0e').encode(
-                     x=alt.X('month_year:O', title='Mês'),
-                     y=alt.Y('count:Q', title='Novas Empresas')
-                 )
-                 st.altair_chart(chart_fb, width="stretch")
-
-        except Exception as e:
-            st.error(f"Erro na análise de mercado: {e}")
@@ -0,0 +1,103 @@
+"""
+Datasets of the 'Estrutura de Mercado' page and the filter keys each one reads.
+
+Every dataset is one db query. Its dependency key is the subset of filter values
+the query actually uses, plus the arguments the view fixes (e.g. the ranking forces
+branch_mode and limit; the trend ignores limit). The last result of each dataset is
+kept in session state with its key: after a filter change only the datasets whose
+key changed are fetched again, the others are reused as they are.
+
+Results live in the process-wide byte-bounded cache of src.memory, compacted
+(categorical codes, Arrow strings), and sessions hold references to the shared frames
+instead of private copies; consumers treat them as read-only. Session entries whose
+frame has been evicted from the shared cache count against SESSION_MAX_BYTES.
+"""
+import streamlit as st
+from .. import memory
+
+# Filters applied by BigQueryDatabase._build_where_clause (render_structure_filters keys)
+WHERE_KEYS = (
+    "search_term", "min_capital", "max_capital", "portes", "only_active", "ufs", "municipio_codes",
+    "naturezas", "cnaes", "sectors", "groups", "classes", "date_start", "date_end", "branch_mode",
+)
+
+def _without(*keys) -> tuple:
+    return tuple(k for k in WHERE_KEYS if k not in keys)
+
+# name -> (db method, filter keys it depends on, fixed arguments)
+DATASETS = {
+    "metrics": ("get_aggregation_metrics", WHERE_KEYS, {}),
+    "metrics_hq": ("get_aggregation_metrics", _without("branch_mode"), {"branch_mode": "Somente Matrizes"}),
+    "sectors": ("get_sector_distribution", WHERE_KEYS, {}),
+    "geo": ("get_geo_distribution", WHERE_KEYS, {}),
+    "benchmark_geo": ("get_benchmark_geo", (), {}),
+    "maturity": ("get_maturity_profile", WHERE_KEYS, {}),
+    "legal_nature": ("get_legal_nature_profile", WHERE_KEYS, {}),
+    "ranking": ("get_filtered_companies", _without("branch_mode"), {"limit": 100, "branch_mode": "Somente Matrizes"}),
+    "companies": ("get_filtered_companies", WHERE_KEYS + ("limit",), {}),
+    "trend": ("get_opening_trend", WHERE_KEYS, {}),
+    # Closings ignore only_active (the query filters situacao 08 itself)
+    "closings": ("get_closing_trend", _without("only_active"), {}),
+}
+
+SESSION_KEY = "_market_datasets"
+
+def _freeze(value):
+    return tuple(value) if isinstance(value, (list, tuple)) else value
+
+def dependency_key(name: str, filters: dict) -> tuple:
+    """Values of the filters the dataset depends on, plus its fixed arguments."""
+    _, depends, fixed = DATASETS[name]
+    # Unset filters are left out, so the db method defaults apply
+    key = {k: _freeze(filters[k]) for k in depends if filters.get(k) is not None}
+    key.update(fixed)
+    return tuple(sorted(key.items()))
+
+def _fetch(db, method_name: str, key: tuple):
+    # Shared across sessions; the key holds only the arguments the query reads
+    kwargs = {k: list(v) if isinstance(v, tuple) else v for k, v in key}
+    return memory.cached(("dataset", method_name, key), lambda: memory.compact(getattr(db, method_name)(**kwargs)))
+
+def _trim(store: dict, current: str):
+    # Frames evicted from the shared cache are kept alive by the session alone: the
+    # largest such entries are dropped (and fetched again if needed) beyond the budget
+    private = {name: memory.private_bytes(entry[1]) for name, entry in store.items() if name != current}
+    total = sum(private.values())
+    for name, size in sorted(private.items(), key=lambda p: -p[1]):
+        if total <= memory.SESSION_MAX_BYTES or not size:
+            break
+        del store[name]
+        total -= size
+
+def get_dataset(db, name: str, filters: dict):
+    """The dataset for the current filters (reused from the session if its key is unchanged)."""
+    key = dependency_key(name, filters)
+    store = st.session_state.setdefault(SESSION_KEY, {})
+    cached = store.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    value = _fetch(db, DATASETS[name][0], key)
+    store[name] = (key, value)
+    _trim(store, name)
+    return value
+
+def warm_dataset(db, name: str, filters: dict):
+    """Fills the shared cache for the dataset without touching session state (safe off-thread)."""
+    _fetch(db, DATASETS[name][0], dependency_key(name, filters))
+
+# Establishment key of the listings (get_filtered_companies) and of get_company_details
+DETAIL_KEYS = ["cnpj_basico", "cnpj_ordem", "cnpj_dv"]
+
+def _fetch_details(db, keys: tuple):
+    return memory.cached(("details", keys), lambda: memory.compact(db.get_company_details(list(keys))))
+
+def with_details(db, df):
+    """Listing rows plus their address and contact columns, fetched in one batch."""
+    if df.empty:
+        return df
+    keys = tuple(sorted(set(df[DETAIL_KEYS].astype(str).itertuples(index=False, name=None))))
+    details = _fetch_details(db, keys)
+    if details.empty:
+        return df
+    details = details.astype({k: str for k in DETAIL_KEYS}).drop_duplicates(DETAIL_KEYS)
+    return df.astype({k: str for k in DETAIL_KEYS}).merge(details, on=DETAIL_KEYS, how='left')
@@ -4,6 +4,8 @@ import altair as alt
 from ..database import CNPJDatabase
 from ..ibge import fetch_industry_data
 from ..utils import format_currency
+from .tooltips import TOOLTIPS
+from .market import get_adjusted_flows, seasonal_flows_compatible
 
 def _get_trend_icon(value):
     if value > 0.5: return "⬆️"
@@ -40,6 +42,16 @@ def render_home_view(db: CNPJDatabase, filters: dict):
     # Flows (Open/Close) l12m
     df_open = db.get_opening_trend(**filters)
     df_close = db.get_closing_trend(**filters)
+    # Seasonally adjusted openings and closings, so the balance compares like with like
+    if seasonal_flows_compatible(filters) and st.checkbox(
+        "Série dessazonalizada", value=False, key="seasonal_home", help=TOOLTIPS["seasonal_adjusted"]
+    ):
+        df_sa_open = get_adjusted_flows(db, 'abertura_ativa' if filters.get('only_active') else 'abertura', filters)
+        df_sa_close = get_adjusted_flows(db, 'baixa', filters)
+        if df_sa_open.empty or df_sa_close.empty:
+            st.caption("⚠️ Série dessazonalizada indisponível (execute scripts/build_seasonal_flows.py).")
+        else:
+            df_open, df_close = df_sa_open, df_sa_close
     
     open_l12m = 0
     close_l12m = 0
@@ -0,0 +1,1049 @@
+"""
+'Estrutura de Mercado' page: structure filters, market sections and the
+openings x production views.
+
+Kept apart from the 'Atividade Industrial' page (dashboard.py) so each page imports
+only its own dependencies: the session datasets, listing tables, prefetch and
+lead-lag analysis load only when this page runs.
+"""
+import streamlit as st
+import pandas as pd
+import altair as alt
+from ..database import CNPJDatabase
+from ..utils.formatters import (
+    format_count,
+    format_currency as format_currency_br,
+    format_percentage,
+)
+from ..ibge import fetch_industry_data
+from ..leadlag import MAX_LAG, NATIONAL, get_division_labels, get_sector_lead_lag, rank_leading_relationships
+from .. import cnae
+from ..classification import get_divisions_for_typology, get_divisions_for_value_chain
+from .tooltips import TOOLTIPS
+from .datasets import get_dataset, with_details
+from .charts import chart_data
+from .tables import format_company_table
+from .options import get_municipality_index, municipality_options, municipality_codes
+from .prefetch import start_prefetch
+
+@st.cache_data(max_entries=32)
+def get_options_cached(_db, method_name):
+    try:
+        return getattr(_db, method_name)()
+    except:
+        return pd.DataFrame()
+
+def generate_structural_summary(key_suffix: str) -> str:
+    """Generates a text summary of the active filters."""
+    # 1. Geography
+    ufs = st.session_state.get(f"ufs_{key_suffix}", [])
+    cities = st.session_state.get(f"city_{key_suffix}", [])
+    
+    geo_text = "Nacional"
+    if cities:
+        geo_text = f"Local ({len(cities)} municípios)"
+    elif ufs:
+        geo_text = f"Regional ({', '.join(ufs)})"
+
+    # 2. Industry Scope
+    macro = st.session_state.get(f"macro_{key_suffix}", "Todos")
+    typ = st.session_state.get(f"typ_{key_suffix}", "Todas")
+    chain = st.session_state.get(f"chain_{key_suffix}", "Todas")
+    sectors = st.session_state.get(f"div_{key_suffix}", [])
+    groups = st.session_state.get(f"grp_{key_suffix}", [])
+    classes = st.session_state.get(f"cls_{key_suffix}", [])
+    
+    scope_parts = []
+    
+    # Priority to specific hierarchy
+    if classes:
+        scope_parts.append(f"{len(classes)} Classes Selecionadas")
+    elif groups:
+        scope_parts.append(f"{len(groups)} Grupos Selecionados")
+    elif sectors:
+        scope_parts.append(f"{len(sectors)} Setores Selecionados")
+    else:
+        # Otherwise describe the Strategy filters
+        if macro != "Todos":
+            scope_parts.append(macro)
+            
+        if typ != "Todas":
+            scope_parts.append(typ)
+            
+        if chain != "Todas":
+            scope_parts.append(f"Posição {chain}")
+            
+    if not scope_parts:
+        scope_text = "Complexo Industrial Completo (05-33)"
+    else:
+        scope_text = " • ".join(scope_parts)
+
+    return f"**Escopo da Análise:** {scope_text} — **Abrangência:** {geo_text}"
+
+# --- LOCAL PAGE FILTERS (Top of Page) ---
+
+def _render_common_geo_activity(db: CNPJDatabase, key_suffix: str):
+    """Helper to render Geo/Activity filters common to all pages."""
+    # 1. Geography
+    c1, c2 = st.columns(2)
+    with c1:
+        states = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA", "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
+        sel_ufs = st.multiselect("Estados", states, key=f"ufs_{key_suffix}")
+    
+    with c2:
+        # Index built once per process: options and codes are dict lookups
+        muni_index = get_municipality_index(db)
+        sel_city_codes = []
+        if muni_index:
+            muni_opts = municipality_options(muni_index, sel_ufs)
+            sel_city_names = st.multiselect("Municípios", muni_opts, placeholder="Todas", key=f"city_{key_suffix}")
+            if sel_city_names:
+                sel_city_codes = municipality_codes(muni_index, sel_city_names)
+        else:
+            st.warning("Lista de Municípios indisponível (Erro de Carregamento)")
+    
+    # Dividers removed for clean layout
+
+    # 2. Structural Segmentation REMOVED (User Request)
+    sel_macro = "Todos"
+    sel_typology = "Todas"
+    sel_chain = "Todas"
+
+    # 3. CNAE Hierarchy Filters (Dependent)
+    sel_divs = []
+    sel_groups = []
+    sel_classes = []
+    
+    if cnae.is_available():
+        # A. Apply Intersection Logic (Macro/Typology/Chain -> Allowed Divisions)
+        # Hard-limited to the Industrial Range (05-33): Agriculture (01-03) and Services (34+) never appear
+        allowed_divs = set(cnae.INDUSTRIAL_DIVISIONS)
+        
+        # Macro
+        if "Transformação" in sel_macro:
+            allowed_divs &= set([str(x).zfill(2) for x in range(10, 34)])
+        elif "Extrativa" in sel_macro:
+            allowed_divs &= set([str(x).zfill(2) for x in range(5, 10)])
+            
+        # Typology
+        if sel_typology != "Todas":
+            allowed_divs &= set(get_divisions_for_typology(sel_typology))
+            
+        # Chain
+        if sel_chain != "Todas":
+            allowed_divs &= set(get_divisions_for_value_chain(sel_chain))
+        
+        st.markdown("##### Estudo Setorial (Hierarquia CNAE)")
+        c_h1, c_h2, c_h3 = st.columns(3)
+        
+        # B. Level 1: Division (option lists come prebuilt and sorted from the CNAE artifact)
+        with c_h1:
+            div_opts = cnae.labels('div', allowed_divs)
+            sel_div_labels = st.multiselect("1. Divisão (Setor)", div_opts, placeholder="Todos os Setores", key=f"div_{key_suffix}")
+            if sel_div_labels:
+                sel_divs = [cnae.code_of('div', s) for s in sel_div_labels]
+        scope_divs = sel_divs or sorted(allowed_divs)
+        
+        # C. Level 2: Group
+        with c_h2:
+            grp_opts = cnae.child_labels('grp', scope_divs)
+            sel_grp_labels = st.multiselect("2. Grupo", grp_opts, placeholder="Todos os Grupos", key=f"grp_{key_suffix}", disabled=len(sel_divs)==0)
+            if sel_grp_labels:
+                sel_groups = [cnae.code_of('grp', s) for s in sel_grp_labels]
+            
+        # D. Level 3: Class
+        with c_h3:
+            cls_opts = cnae.child_labels('cls', sel_groups) if sel_groups else cnae.descendant_labels('cls', 'div', scope_divs)
+            sel_cls_labels = st.multiselect("3. Classe", cls_opts, placeholder="Todas as Classes", key=f"cls_{key_suffix}", disabled=len(sel_groups)==0)
+            if sel_cls_labels:
+                 sel_classes = [cnae.code_of('cls', s) for s in sel_cls_labels]
+        
+        # Scope Enforcement (User Plan): If no filter selected, Division is ALL allowed.
+        if not sel_divs:
+            sel_divs = list(allowed_divs)
+             
+    # Clean up empty lists to None/Empty
+    
+    return sel_ufs, sel_city_codes, sel_divs, sel_groups, sel_classes
+
+def render_structure_filters(db: CNPJDatabase) -> dict:
+    """Filters for 'Estrutura de Mercado' (Full Company Details)."""
+    with st.expander("Filtros & Segmentação", expanded=False):
+
+        # 0. Search
+        c_search, c_empty = st.columns([3, 1])
+        with c_search:
+            search_query = st.text_input("Busca Rápida (Nome ou CNPJ)", placeholder="Ex: PETROBRAS ou 33.000.167...", key='search_struct')
+        
+
+        # 1. Global & Hierarchy
+        sel_ufs, sel_city_codes, sel_sectors, sel_groups, sel_classes = _render_common_geo_activity(db, "struct")
+        
+      
+        
+        # 1.1 CNAE Specific (Subclass - Final Level)
+        sel_cnaes = []
+        
+        if cnae.is_available():
+            # Dependent Filtering (Based on Hierarchy; scope 05-33 comes from the divisions above)
+            if sel_classes:
+                cnae_opts = cnae.child_labels('sub', sel_classes)
+            elif sel_groups:
+                cnae_opts = cnae.descendant_labels('sub', 'grp', sel_groups)
+            else:
+                cnae_opts = cnae.descendant_labels('sub', 'div', sel_sectors or cnae.INDUSTRIAL_DIVISIONS)
+            
+            sel_cnaes_ui = st.multiselect(
+                "4. Subclasse (Atividade Específica)", 
+                cnae_opts, 
+                placeholder="Selecione (Limitado por Divisão/Grupo/Classe acima)", 
+                key='f_cnae_specific',
+                disabled=False,
+                help=TOOLTIPS["cnae_subclasse"]
+            )
+            
+            if sel_cnaes_ui:
+                sel_cnaes = [c.split(" - ")[0] for c in sel_cnaes_ui]
+                # Metadata logic moved to render_dashboard for Header Card placement
+                            
+        else:
+            st.warning("Lista de CNAEs indisponível.")
+        
+        # 2. Detailed Filters (Always Visible)
+        st.markdown("##### Filtros Avançados")
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            sel_portes_ui = st.multiselect("Porte", ["01 (ME)", "03 (EPP)", "05 (Demais)"], default=["05 (Demais)"], key='f_porte_struct', help=TOOLTIPS["porte"])
+            sel_portes = [p.split()[0] for p in sel_portes_ui] if sel_portes_ui else []
+            
+        with c2:
+            sel_branch_mode = st.radio("Escopo", ["Todos", "Somente Matrizes", "Somente Filiais"], index=0, horizontal=True, key='f_scope_struct', help=TOOLTIPS["escopo_geo"])
+            
+        with c3:
+            d_range = st.date_input("Data Abertura", [], key='f_date_struct')
+            d_start = d_range[0].strftime("%Y%m%d") if len(d_range) == 2 else None
+            d_end = d_range[1].strftime("%Y%m%d") if len(d_range) == 2 else None
+
+        # 3. Capital
+        c_cap1, c_cap2 = st.columns(2)
+        min_cap = c_cap1.number_input("Capital Mín.", 0.0, step=100000.0, format="%.0f", key='f_min_cap_struct')
+        max_cap = c_cap2.number_input("Capital Máx.", 0.0, step=100000.0, format="%.0f", key='f_max_cap_struct')
+
+    return {
+        "ufs": sel_ufs, "municipio_codes": sel_city_codes, 
+        "sectors": sel_sectors, "groups": sel_groups, "classes": sel_classes,
+        "cnaes": sel_cnaes,
+        "portes": sel_portes, "branch_mode": sel_branch_mode,
+        "min_capital": min_cap, "max_capital": max_cap if max_cap > 0 else None,
+        "date_start": d_start, "date_end": d_end, "limit": 1000, "only_active": True,
+        "search_term": search_query.strip() if search_query else None
+    }
+
+def render_strategy_filters(db: CNPJDatabase) -> dict:
+    """Filters for 'Dinâmica Estratégica' (Micro correlation)."""
+    with st.expander("Filtros de Correlação (Micro)", expanded=False):
+        sel_ufs, sel_city_codes, sel_sectors, sel_groups, sel_classes = _render_common_geo_activity(db, "strat")
+        st.caption("Filtre o segmento Micro para correlacionar com a Produção Industrial Nacional.")
+        
+    return {
+        "ufs": sel_ufs, "municipio_codes": sel_city_codes, 
+        "sectors": sel_sectors, "groups": sel_groups, "classes": sel_classes,
+        "portes": ["05"], "branch_mode": "Todos", "limit": 1000, "only_active": True,
+        "min_capital": 0.0, "max_capital": None, "date_start": None, "date_end": None
+    }
+
+def render_strategic_view(db: CNPJDatabase, filters):
+    st.subheader("Dinâmica Industrial (Micro + Macro)")
+    st.markdown("""
+    **Como Evolui?**
+    Aqui cruzamos a **Estrutura** (Novas Empresas) com a **Atividade** (Produção IBGE) para entender o ciclo econômico.
+    *Objetivo: Identificar correlações entre investimento empresarial e produção real.*
+    """)
+    
+    try:
+        # 1. Fetch Company Trend (Micro)
+        # Remove 'limit' as aggregation queries don't need it
+        trend_filters = filters.copy()
+        trend_filters.pop('limit', None)
+        
+        df_trend = db.get_opening_trend(**trend_filters)
+        
+        # 2. Fetch IBGE Data (Macro)
+        df_ibge = fetch_industry_data()
+        
+        # Logic: Try Correlation -> If fails, Show Trend Only
+        has_correlation = False
+        
+        if not df_trend.empty and not df_ibge.empty:
+            # Prepare Micro Data
+            df_micro = df_trend.copy()
+            df_micro['date'] = pd.to_datetime(df_micro['month_year'], format='%Y%m')
+            df_micro = df_micro.groupby('date')['count'].sum()
+            
+            # Prepare Macro Data
+            df_macro_raw = df_ibge[df_ibge['variable'].str.contains('Índice', na=False)].copy()
+            df_macro = df_macro_raw.groupby('date')['value'].mean()
+            
+            # Align
+            common_idx = df_micro.index.intersection(df_macro.index).sort_values()
+            
+            if len(common_idx) > 6:
+                has_correlation = True
+                # Create ALIGNED DataFrame
+                df_chart = pd.DataFrame({
+                    'date': common_idx,
+                    'Novas Empresas': df_micro.loc[common_idx].values,
+                    'Indústria (IBGE)': df_macro.loc[common_idx].values
+                })
+                
+                # Calculate Correlation with Safeguard
+                try:
+                    if df_chart['Novas Empresas'].nunique() <= 1 or df_chart['Indústria (IBGE)'].nunique() <= 1:
+                        corr = 0.0
+                    else:
+                        corr = df_chart['Novas Empresas'].corr(df_chart['Indústria (IBGE)'])
+                        if pd.isna(corr): corr = 0.0
+                except:
+                    corr = 0.0
+                
+                # Insight Text
+                if corr > 0.7: insight = "Forte Correlação Positiva"
+                elif corr < -0.7: insight = "Forte Correlação Negativa"
+                elif abs(corr) < 0.3: insight = "Sem Correlação Clara"
+                else: insight = "Correlação Moderada"
+                
+                # --- KPI CARD FOR CORRELATION ---
+                st.markdown("##### Sincronia de Mercado")
+                
+                c_kpi, c_desc = st.columns([1, 2])
+                c_kpi.metric("Correlação de Pearson", f"{corr:.2f}", insight)
+                
+                with c_desc:
+                    st.markdown("""
+                    <div style="background-color: var(--secondary-background-color); padding: 15px; border-radius: 8px; border: 1px solid rgba(128, 128, 128, 0.2);">
+                        <span style="font-weight: 600; font-size: 0.9em; opacity: 0.8;">O que isso significa?</span><br>
+                        <span style="font-size: 0.85em; opacity: 0.7;">
+                            O coeficiente mede se a <b>abertura de empresas</b> segue o ritmo da <b>produção industrial</b>.
+                            Valores próximos de <b>1.0</b> indicam que fábricas abrem exatamente quando a produção sobe.
+                        </span>
+                    </div>
+                    """, unsafe_allow_html=True)
+
+                st.divider()
+
+                # --- DUAL AXIS CHART ---
+                st.markdown("### Cruzamento de Tendências")
+                st.caption("Comparativo entre a abertura de empresas (no seu filtro) e a Produção Industrial Nacional.", help=TOOLTIPS["chart_evolution"])
+                
+                df_chart = chart_data(df_chart, ('date', 'Novas Empresas', 'Indústria (IBGE)'),
+                                      x='date', y=('Novas Empresas', 'Indústria (IBGE)'))
+                base = alt.Chart(df_chart).encode(x=alt.X('date:T', axis=alt.Axis(format='%Y'), title=None))
+                
+                line_micro = base.mark_line(color='#ff7f0e', strokeWidth=3).encode(
+                    y=alt.Y('Novas Empresas', axis=alt.Axis(title='Novas Empresas', titleColor='#ff7f0e'))
+                )
+                
+                line_macro = base.mark_line(color='#1f77b4', strokeDash=[5,5], strokeWidth=3).encode(
+                    y=alt.Y('Indústria (IBGE)', axis=alt.Axis(title='Benchmark Nacional (IBGE)', titleColor='#1f77b4'))
+                )
+                
+                combined = (line_micro + line_macro).resolve_scale(y='independent').encode(
+                    tooltip=[
+                        alt.Tooltip('date:T', title='Data', format='%b/%Y'),
+                        alt.Tooltip('Novas Empresas', title='Novas Empresas', format=',d'),
+                        alt.Tooltip('Indústria (IBGE)', title='Indústria (idx)', format='.2f')
+                    ]
+                ).properties(height=400)
+                
+                st.altair_chart(combined, width="stretch")
+                
+                st.info("💡 **Dica de Leitura:** A linha **Laranja (Sua Seleção)** mostra o ímpeto empreendedor. A linha **Azul (Tracejada)** é o ritmo do Brasil. Se a laranja sobe antes, é antecipação de ciclo.")
+                
+                with st.expander("Insight Avançado: O efeito 'Time Lag'", expanded=False):
+                     st.write("""
+                     **Atenção:** Frequentemente existe uma defasagem (atraso) entre a abertura da empresa (linha laranja) e o início da produção (linha azul).
+                     *   Fábricas demoram para ser construídas.
+                     *   Se a linha laranja sobe hoje e a azul não, pode indicar **aumento de capacidade futura** (investimento em andamento).
+                     """)
+
+        if not has_correlation:
+            # FALLBACK VIEW
+            if not df_trend.empty:
+                st.markdown("##### Tendência de Abertura Identificada")
+                st.caption("Evolução histórica de novos CNPJs.", help=TOOLTIPS["chart_evolution"])
+                
+                # Prepare Data
+                df_fb = df_trend.copy()
+                df_fb['date'] = pd.to_datetime(df_fb['month_year'], format='%Y%m')
+                
+                # Process Tooltip
+                if 'companies' in df_fb.columns:
+                    df_fb['Empresas'] = df_fb['companies'].apply(lambda x: ", ".join(list(x)) if x is not None else "")
+                else:
+                    df_fb['Empresas'] = "-"
+                # Drop the company-name arrays and month strings before the frame is sent
+                df_fb = chart_data(df_fb, ('date', 'count', 'Empresas'), x='date', y='count')
+
+                chart_fb = alt.Chart(df_fb).mark_line(point=True, color='#ff7f0e').encode(
+                    x=alt.X('date:T', title='Data'),
+                    y=alt.Y('count:Q', title='Novas Empresas'),
+                    tooltip=[
+                        alt.Tooltip('date:T', title='Data', format='%b/%Y'), 
+                        alt.Tooltip('count', title='Qtd', format=',d'),
+                        alt.Tooltip('Empresas', title='Empresas')
+                    ]
+                ).properties(height=350)
+                st.altair_chart(chart_fb, width="stretch")
+                
+                reason = "dados esparsos" if not df_trend.empty else "falta de dados"
+                if df_ibge.empty: reason = "dados do IBGE indisponíveis no momento"
+                
+                st.info(f"""
+                **Por que não vejo a Correlação?** 
+                Para calcular o índice estatístico (Pearson), é necessário cruzar históricos contínuos. 
+                Neste caso ({reason}), exibimos apenas a **tendência de abertura**.
+                """)
+            else:
+                 st.warning("Sem dados suficientes para gerar visualização com os filtros atuais.")
+            
+    except Exception as e:
+        st.error(f"Erro ao gerar visão estratégica: {e}")
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=64)
+def get_seasonal_flows_cached(_db, kind: str, sectors: tuple, ufs: tuple, portes: tuple):
+    try:
+        return _db.get_seasonal_flows(kind=kind, sectors=list(sectors), ufs=list(ufs), portes=list(portes))
+    except Exception:
+        return pd.DataFrame()
+
+def seasonal_flows_compatible(filters) -> bool:
+    """The pre-computed decomposition is keyed by division x UF x porte only."""
+    finer = ['municipio_codes', 'groups', 'classes', 'cnaes', 'naturezas', 'search_term', 'max_capital']
+    return (not any(filters.get(k) for k in finer)
+            and not filters.get('min_capital')
+            and filters.get('branch_mode', "Todos") == "Todos")
+
+def get_adjusted_flows(db, kind: str, filters: dict) -> pd.DataFrame:
+    """Seasonally adjusted series of a flow kind as (month_year, count), within the date filter."""
+    df_sa = get_seasonal_flows_cached(db, kind, tuple(filters.get('sectors') or []),
+                                      tuple(filters.get('ufs') or []), tuple(filters.get('portes') or []))
+    if not df_sa.empty and filters.get('date_start'):
+        df_sa = df_sa[df_sa['month_year'].between(filters['date_start'][:6], filters['date_end'][:6])]
+    return df_sa.assign(count=df_sa['adjusted'])[['month_year', 'count']] if not df_sa.empty else df_sa
+
+@st.cache_data(ttl=3600 * 6, show_spinner=False, max_entries=8)
+def get_opening_panel_cached(_db, portes: tuple, branch_mode: str):
+    # Openings since one year before the oldest PIM-PF month (120 months + lag window)
+    start_year = pd.Timestamp.now().year - 12
+    try:
+        return _db.get_opening_panel(portes=list(portes), branch_mode=branch_mode,
+                                     only_active=False, date_start=f"{start_year}0101")
+    except Exception:
+        return pd.DataFrame()
+
+def render_lead_lag_section(db: CNPJDatabase, filters):
+    """Openings x production cross-correlation for every division x UF (opt-in)."""
+    run = st.checkbox("Analisar defasagens (Abertura → Produção) em todos os setores e UFs", value=False,
+                      key="leadlag_market", help=TOOLTIPS["lead_lag"])
+    if not run:
+        return
+
+    with st.spinner("Calculando correlações defasadas..."):
+        df_panel = get_opening_panel_cached(db, tuple(filters.get('portes') or []), filters.get('branch_mode', "Todos"))
+        df_ll = get_sector_lead_lag(df_panel)
+
+    if df_ll.empty:
+        st.info("Dados insuficientes para a análise de defasagem.")
+        return
+
+    # Lag profile of the current selection (one division; one UF or Brasil)
+    sectors = filters.get('sectors') or []
+    ufs = filters.get('ufs') or []
+    if len(sectors) == 1:
+        target_uf = ufs[0] if len(ufs) == 1 else NATIONAL
+        series_label = get_division_labels().get(sectors[0][:2])
+        profile = df_ll[(df_ll['sector_code'] == series_label) & (df_ll['uf'] == target_uf)]
+        if not profile.empty and (profile['lag'] >= 1).any():
+            best = profile[profile['lag'] >= 1].loc[lambda d: d['corr'].abs().idxmax()]
+            st.caption(f"Perfil de defasagem da seleção ({target_uf}): maior correlação antecedente "
+                       f"em **{int(best['lag'])} meses** (r = {best['corr']:.2f}).")
+            chart_lag = alt.Chart(profile).mark_bar().encode(
+                x=alt.X('lag:O', title='Defasagem (meses; positivo = abertura antecede produção)'),
+                y=alt.Y('corr:Q', title='Correlação', scale=alt.Scale(domain=[-1, 1])),
+                color=alt.condition(alt.datum.corr > 0, alt.value('#2ca02c'), alt.value('#d62728')),
+                tooltip=[alt.Tooltip('lag', title='Defasagem'), alt.Tooltip('corr', title='Correlação', format='.2f'),
+                         alt.Tooltip('n_obs', title='Meses')]
+            ).properties(height=250)
+            st.altair_chart(chart_lag, width="stretch")
+
+    st.markdown("**Relações Antecedentes mais Fortes (Setor × UF)**")
+    df_rank = rank_leading_relationships(df_ll, top=20)
+    st.dataframe(
+        df_rank.rename(columns={
+            'sector_code': 'Divisão', 'uf': 'UF', 'lag': 'Defasagem (meses)',
+            'corr': 'Correlação', 'corr_lag0': 'Correlação Simultânea', 'n_obs': 'Meses'
+        }).style.format({'Correlação': '{:.2f}', 'Correlação Simultânea': '{:.2f}'}),
+        hide_index=True, width="stretch"
+    )
+    st.caption(f"Séries em diferença de 12 meses; defasagens de -{MAX_LAG} a +{MAX_LAG} meses. "
+               "Correlação não implica causalidade. BR = Brasil.")
+
+# --- MARKET VIEW SECTIONS ---
+# Each section reads its datasets (datasets.py) inside a fragment (_market_section):
+# it renders as soon as its data arrives, its widgets and chart selections rerun only
+# that section, and a filter change refetches only the datasets that depend on it.
+
+def _market_kpis(db: CNPJDatabase, filters: dict):
+    with st.spinner("Calculando indicadores..."):
+        metrics_view = get_dataset(db, 'metrics', filters)
+        metrics_fin = get_dataset(db, 'metrics_hq', filters)
+        df_sectors = get_dataset(db, 'sectors', filters)
+    true_total = metrics_view.get('count', 0)
+    true_avg_cap = metrics_fin.get('avg_cap', 0.0)
+
+    # Helper: Concentration
+    total_mkt = true_total if true_total > 0 else 1
+    concentration = 0
+    leader_name = "-"
+    if not df_sectors.empty:
+        top_sec = df_sectors.iloc[0]
+        concentration = (top_sec['count'] / total_mkt) * 100
+        leader_name = top_sec['sector_code']
+
+    # Helper: Formats (Brazilian Standard - ABNT NBR 5891)
+    fmt_total = format_count(true_total, abbreviate=False)
+    fmt_cap = format_currency_br(true_avg_cap, context="kpi")
+    fmt_cap_tooltip = format_currency_br(true_avg_cap, context="tooltip")
+
+    st.markdown("##### Indicadores Chave")
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric(
+        "Estabelecimentos Ativos",
+        fmt_total,
+        "Total em Operação",
+        help=TOOLTIPS["kpi_active_companies"]
+    )
+    k2.metric(
+        "Capital Médio",
+        fmt_cap,
+        "Solidez Financeira",
+        help=f"{TOOLTIPS['kpi_avg_capital']}\n\nValor exato: {fmt_cap_tooltip}"
+    )
+    k3.metric(
+        "Setor Líder",
+        leader_name,
+        "Maior Volume",
+        help=TOOLTIPS["kpi_setor_lider"]
+    )
+    k4.metric(
+        "Concentração",
+        format_percentage(concentration, precision=1),
+        "Share do Top 1",
+        help=TOOLTIPS["kpi_concentration"]
+    )
+
+def _market_geography(db: CNPJDatabase, filters: dict):
+    sel_uf_click = alt.selection_point(fields=['uf'], name='sel_uf')
+
+    # 1. Geo Distribution (Stacked)
+    col_geo_title, col_geo_toggle = st.columns([2, 1])
+    with col_geo_title:
+        st.markdown("##### Distribuição Geográfica")
+    with col_geo_toggle:
+        geo_mode = st.radio("Visão:", ["Volume Absoluto", "Especialização (QL)"], horizontal=True, label_visibility="collapsed")
+
+    with st.spinner("Carregando distribuição geográfica..."):
+        df_geo = get_dataset(db, 'geo', filters)
+
+    if df_geo.empty:
+        st.info("Sem dados geográficos.")
+        return
+
+    # --- LOGIC: SPECIALIZATION (QL) ---
+    df_bench = get_dataset(db, 'benchmark_geo', filters) if geo_mode == "Especialização (QL)" else pd.DataFrame()
+    if geo_mode == "Especialização (QL)" and not df_bench.empty:
+        # 1. Merge Sector Data with Benchmark
+        df_merged = df_geo.merge(df_bench, on='uf', how='inner', suffixes=('', '_bench'))
+
+        # 2. Calculate Shares
+        total_sector = df_merged['count'].sum()
+        total_industry = df_bench['total_count'].sum()
+
+        df_merged['share_sector'] = df_merged['count'] / total_sector
+        df_merged['share_industry'] = df_merged['total_count'] / total_industry
+
+        # 3. Calculate QL = Share Sector / Share Industry
+        df_merged['ql'] = df_merged['share_sector'] / df_merged['share_industry']
+
+        # 4. Pre-calculate Color in Python to avoid Altair/Vega complex nesting error
+        def get_color(val):
+            if val > 1.2: return '#2ca02c' # Green
+            if val < 0.8: return '#d62728' # Red
+            return 'lightgray'
+
+        df_merged['color_hex'] = df_merged['ql'].apply(get_color)
+
+        # LIMIT TO TOP 10 SPECIALIZED to avoid UI clutter
+        df_viz = df_merged.sort_values('ql', ascending=False).head(10)
+
+        # 5. Render Chart
+        chart_geo = alt.Chart(df_viz).mark_bar().add_params(sel_uf_click).encode(
+            x=alt.X('ql:Q', title='Índice de Especialização (QL)', axis=alt.Axis(grid=True)),
+            y=alt.Y('uf:N', sort='-x', title=None),
+            # Use pre-calculated color, scale=None means "use the raw values as visuals"
+            color=alt.Color('color_hex:N', scale=None, legend=None),
+            # Use Opacity to indicate selection state (High opacity if selected or nothing selected)
+            opacity=alt.condition(sel_uf_click, alt.value(1), alt.value(0.3)),
+            tooltip=[
+                alt.Tooltip('uf', title='Estado'),
+                alt.Tooltip('ql', title='Índice QL', format='.2f'),
+                alt.Tooltip('count', title='Qtd. Empresas')
+            ]
+        ).properties(height=350, title="Top 10: Grau de Especialização Regional (1.0 = Média BR)")
+
+        geo_event = st.altair_chart(chart_geo, width="stretch", on_select="rerun", key="struct_geo_ql")
+
+        st.caption("ℹ️ **Como ler:** QL > 1 indica que o Estado é **especializado** neste setor (Hub). Reduz o viés populacional de SP/RJ.")
+
+    else:
+        # --- LOGIC: ABSOLUTE VOLUME (Legacy) ---
+        # Reverted to Top 10 per user request
+        chart_geo = alt.Chart(df_geo.head(10)).mark_bar().add_params(sel_uf_click).encode(
+            x=alt.X('count:Q', title='Qtd', axis=alt.Axis(grid=False)),
+            y=alt.Y('uf:N', sort='-x', title=None, axis=alt.Axis(labelOverlap=False)), # Force all labels
+            color=alt.condition(sel_uf_click, alt.value('#2ecc71'), alt.value('lightgray')),
+            tooltip=['uf', 'count']
+        ).properties(height=300, title="Top Estados (Contagem Absoluta)")
+
+        st.caption("ℹ️ Entenda a Distribuição Geográfica", help=TOOLTIPS["chart_geo"])
+        geo_event = st.altair_chart(chart_geo, width="stretch", on_select="rerun", key="struct_geo")
+
+    # Geo Click: the UF becomes a page filter, so every section reruns with it
+    if geo_event and geo_event.selection.get('sel_uf'):
+        clicked_uf = geo_event.selection['sel_uf'][0]['uf']
+        st.session_state['ufs_struct'] = [clicked_uf]
+        st.rerun()
+
+def _market_sectors(db: CNPJDatabase, filters: dict):
+    sel_sec_click = alt.selection_point(fields=['sector_code'], name='sel_sec')
+
+    # 2. Sector Distribution (Stacked)
+    with st.spinner("Carregando distribuição setorial..."):
+        df_sectors = get_dataset(db, 'sectors', filters)
+    if df_sectors.empty:
+        st.info("Sem dados setoriais.")
+        return
+
+    # Enrich with Description
+    df_divs = get_options_cached(db, 'get_industrial_divisions')
+    if not df_divs.empty and 'sector_code' in df_sectors.columns:
+        # Create mapping
+        # Less truncation needed now that we have full width
+        df_divs = df_divs.copy()
+        df_divs['short_desc'] = df_divs['label'].apply(lambda x: x.split(" - ")[1][:50] + "..." if len(x.split(" - ")[1]) > 50 else x.split(" - ")[1])
+        df_divs['hybrid_label'] = df_divs['division_code'] + " - " + df_divs['short_desc']
+
+        df_sectors = df_sectors.merge(df_divs[['division_code', 'hybrid_label', 'label']], left_on='sector_code', right_on='division_code', how='left')
+        df_sectors['display_label'] = df_sectors['hybrid_label'].fillna(df_sectors['sector_code'])
+        df_sectors['full_label'] = df_sectors['label'].fillna(df_sectors['sector_code'])
+    else:
+        df_sectors = df_sectors.copy()
+        df_sectors['display_label'] = df_sectors['sector_code']
+        df_sectors['full_label'] = df_sectors['sector_code']
+
+    chart_sec = alt.Chart(df_sectors.head(10)).mark_bar().add_params(sel_sec_click).encode(
+        x=alt.X('count:Q', title='Qtd', axis=alt.Axis(grid=False)),
+        y=alt.Y('display_label:N', sort='-x', title=None, axis=alt.Axis(labelLimit=400)), # Increased Label Limit
+        color=alt.condition(sel_sec_click, alt.value('#9b59b6'), alt.value('lightgray')),
+        tooltip=[alt.Tooltip('full_label', title='Setor'), alt.Tooltip('count', title='Qtd', format=',d')]
+    ).properties(height=350, title="Top Setores (Distribuição Industrial)") # Increased Height
+
+    st.caption("ℹ️ Entenda a Distribuição Setorial", help=TOOLTIPS["chart_sector"])
+    sec_event = st.altair_chart(chart_sec, width="stretch", on_select="rerun", key="struct_sec")
+
+    # Sector Click: select the division in the hierarchy filter (widget key div_struct,
+    # options are the CNAE artifact labels) and clear the levels below it
+    if sec_event and sec_event.selection.get('sel_sec'):
+        clicked_code = sec_event.selection['sel_sec'][0]['sector_code']
+        div_labels = cnae.labels('div', [clicked_code]) if cnae.is_available() else []
+        if div_labels:
+            st.session_state['div_struct'] = div_labels
+            for key in ('grp_struct', 'cls_struct', 'f_cnae_specific'):
+                st.session_state[key] = []
+            st.rerun()
+
+def _market_maturity(db: CNPJDatabase, filters: dict):
+    st.markdown("#### Ciclo de Maturidade", help=TOOLTIPS["chart_maturidade"])
+    st.caption("Distribuição por idade das empresas.")
+
+    with st.spinner("Carregando perfil de maturidade..."):
+        df_maturity = get_dataset(db, 'maturity', filters)
+    if df_maturity.empty:
+        st.info("Sem dados de idade disponíveis.")
+        return
+
+    chart_maturity = alt.Chart(df_maturity).mark_bar().encode(
+        x=alt.X('count:Q', title='Quantidade', axis=alt.Axis(format='d')),
+        y=alt.Y('category:N', sort=None, title=None),
+        color=alt.Color('category:N', legend=None, scale=alt.Scale(
+            domain=['1. Novas Entrantes (< 3 anos)', '2. Jovens (3 a 9 anos)', '3. Consolidadas (10 a 20 anos)', '4. Veteranas (> 20 anos)'],
+            range=['#fee5d9', '#fcae91', '#fb6a4a', '#cb181d']
+        )),
+        tooltip=[
+            alt.Tooltip('category', title='Faixa Etária'),
+            alt.Tooltip('count', title='Empresas', format=',d')
+        ]
+    ).properties(height=300, title='Resiliência de Mercado')
+    st.altair_chart(chart_maturity, width="stretch")
+
+    # Insight
+    total = df_maturity['count'].sum()
+    new_pct = (df_maturity[df_maturity['category'].str.contains('Novas')]['count'].sum() / total * 100) if total > 0 else 0
+
+    if new_pct > 40:
+        st.info(f"**Mercado Vibrante:** {new_pct:.1f}% são novas entrantes (< 3 anos). Alta rotatividade e baixa barreira de entrada.")
+    elif new_pct < 15:
+        st.warning(f"**Mercado Consolidado:** Apenas {new_pct:.1f}% são novas. Dominado por veteranas. Alta barreira de entrada.")
+    else:
+        st.success(f"**Mercado Equilibrado:** {new_pct:.1f}% de novas empresas. Mix saudável entre inovação e experiência.")
+
+def _market_legal_nature(db: CNPJDatabase, filters: dict):
+    st.markdown("#### Grau de Formalização")
+    st.caption("Distribuição por natureza jurídica.")
+
+    with st.spinner("Carregando natureza jurídica..."):
+        df_nature = get_dataset(db, 'legal_nature', filters)
+    if df_nature.empty:
+        st.info("Sem dados de natureza jurídica disponíveis.")
+        return
+
+    chart_nature = alt.Chart(df_nature).mark_arc(innerRadius=60).encode(
+        theta=alt.Theta('count:Q'),
+        color=alt.Color('category:N', legend=alt.Legend(title='Tipo Jurídico', orient='bottom'), scale=alt.Scale(
+            domain=['Sociedade Limitada (LTDA)', 'S.A. (Corporação)', 'Empresário Individual / SLU', 'Cooperativa', 'Pública / Estatal', 'Outros'],
+            range=['#1f77b4', '#ff7f0e', '#2ca02c', '#9467bd', '#7f7f7f', '#c7c7c7']
+        )),
+        tooltip=[
+            alt.Tooltip('category', title='Natureza'),
+            alt.Tooltip('count', title='Empresas', format=',d')
+        ]
+    ).properties(height=300, title='Estrutura Corporativa')
+    st.altair_chart(chart_nature, width="stretch")
+
+    # Insight
+    total = df_nature['count'].sum()
+    sa_pct = (df_nature[df_nature['category'].str.contains('S.A.')]['count'].sum() / total * 100) if total > 0 else 0
+
+    if sa_pct > 20:
+        st.success(f"**Alta Sofisticação:** {sa_pct:.1f}% são S.A. (governança corporativa). Mercado profissionalizado.")
+    elif sa_pct < 5:
+        st.info(f"**Mercado Familiar:** Apenas {sa_pct:.1f}% de S.A. Dominado por LTDA (empresas familiares).")
+    else:
+        st.info(f"**Mix Corporativo:** {sa_pct:.1f}% de S.A. Equilíbrio entre estruturas familiares e profissionais.")
+
+def _market_ranking(db: CNPJDatabase, filters: dict):
+    st.markdown("##### Maiores Capacidades Instaladas (Capital Social)")
+
+    # Fetch Top 100 for Ranking
+    with st.spinner("Carregando ranking..."):
+        df_top100 = get_dataset(db, 'ranking', filters)
+
+    if not df_top100.empty:
+         df_top100 = df_top100.sort_values('capital_social', ascending=False).reset_index(drop=True)
+
+         c_podium, c_chart = st.columns([1, 2])
+
+         with c_podium:
+             st.caption("**Top 3 (Matrizes)**")
+             for i in range(min(3, len(df_top100))):
+                 row = df_top100.iloc[i]
+                 val = row['capital_social']
+                 val_fmt = f"R$ {val/1e9:,.1f} B" if val > 1e9 else f"R$ {val/1e6:,.1f} M"
+                 st.markdown(f"""
+                 <div style="background-color: var(--secondary-background-color); border-radius: 8px; padding: 10px; margin-bottom: 8px; border: 1px solid rgba(128, 128, 128, 0.2); border-left: 4px solid #f1c40f; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
+                    <div style="font-size: 0.8rem; font-weight: 600; opacity: 0.7;">#{i+1} LÍDER</div>
+                    <div style="font-size: 0.95rem; font-weight: 700; word-wrap: break-word; white-space: normal;">{row['razao_social']}</div>
+                    <div style="font-size: 0.8rem; opacity: 0.8;">{val_fmt}</div>
+                 </div>
+                 """, unsafe_allow_html=True)
+
+         with c_chart:
+             st.caption("**Ranking Top 10 (Capital Social)**", help=TOOLTIPS["chart_ranking_capital"])
+             chart_rank = alt.Chart(df_top100.head(10)).mark_bar().encode(
+                 x=alt.X('capital_social:Q', title='Capital (R$)', axis=alt.Axis(format=',.2s', grid=False)),
+                 y=alt.Y('razao_social:N', sort='-x', title=None, axis=alt.Axis(labelLimit=200)),
+                 color=alt.value('#3b82f6'),
+                 tooltip=['razao_social', alt.Tooltip('capital_social', title='Capital Social (R$)', format=',.2f')]
+             ).properties(height=280)
+             st.altair_chart(chart_rank, width="stretch")
+    else:
+        st.info("Ranking indisponível para esta seleção.")
+
+    st.caption("⚠️ **Nota de Leitura:** O ranking baseia-se no **Capital Social** (Investimento/Capacidade), e não no Faturamento/Receita.")
+
+def _market_companies(db: CNPJDatabase, filters: dict):
+    # 5. Detailed Asset List (Unified View - No Rank)
+    st.markdown("### Detalhamento da Base (Em Estoque)")
+
+    with st.spinner("Carregando estabelecimentos..."):
+        df_companies = get_dataset(db, 'companies', filters)
+    if df_companies.empty:
+        st.warning("Nenhum estabelecimento encontrado com os filtros atuais.")
+        return
+
+    # The listing query brings no address/contact columns; they are fetched in one batch
+    # for every listed row (export) or for the selected rows only
+    full_details = st.toggle(
+        "Incluir endereço e contato de todos", value=False, key="companies_details",
+        help="Busca endereço e contatos dos estabelecimentos listados (consulta adicional), para exportar a tabela completa."
+    )
+    if full_details:
+        with st.spinner("Carregando endereços e contatos..."):
+            df_companies = with_details(db, df_companies)
+
+    detail_columns = ["Endereço", "Contato"]
+    df_disp = format_company_table(df_companies)
+    grid_event = st.dataframe(
+        df_disp,
+        height=600,
+        width="stretch",
+        on_select="rerun",
+        selection_mode="multi-row",
+        key="companies_grid",
+        column_order=[
+            "cnpj_real",
+            "razao_social",
+            "tipo_label",
+            "Status",
+            "Data Abertura",
+            "Porte",
+            "Capital (R$)",
+            "Cidade/UF",
+            "natureza_desc",
+            "Subclasse",
+            "Tipo Indústria",
+            "Posição Cadeia",
+        ] + (detail_columns if full_details else []),
+        column_config={
+            "cnpj_real": st.column_config.TextColumn("CNPJ", width="medium"),
+            "razao_social": st.column_config.TextColumn("Razão Social / Nome Empresarial", width="large"),
+            "tipo_label": st.column_config.TextColumn("Tipo", width="small"),
+            "Status": st.column_config.TextColumn("Situação", width="small"),
+
+            "Data Abertura": st.column_config.TextColumn("Início Ativ.", width="small"),
+            "Porte": st.column_config.TextColumn("Porte", width="small"),
+            "Capital (R$)": st.column_config.TextColumn("Capital Social", width="medium"),
+            "Cidade/UF": st.column_config.TextColumn("Localização", width="medium"),
+            "natureza_desc": st.column_config.TextColumn("Natureza Jurídica", width="medium"),
+            "Subclasse": st.column_config.TextColumn("Atividade (Subclasse CNAE)", width="large"),
+            "Tipo Indústria": st.column_config.TextColumn("Tipologia (Nível 1)", width="medium"),
+            "Posição Cadeia": st.column_config.TextColumn("Cadeia de Valor", width="small"),
+            "Endereço": st.column_config.TextColumn("Endereço Completo", width="large"),
+            "Contato": st.column_config.TextColumn("Contatos", width="medium"),
+        },
+        hide_index=True
+    )
+
+    # Positions from a previous listing can outlive a filter change
+    selected = [i for i in (grid_event.selection.rows if grid_event else []) if i < len(df_companies)]
+    if full_details:
+        return
+    if not selected:
+        st.caption("Selecione linhas da tabela para ver endereço e contatos.")
+        return
+    with st.spinner("Carregando endereços e contatos..."):
+        df_sel = format_company_table(with_details(db, df_companies.iloc[selected]))
+    st.dataframe(
+        df_sel,
+        width="stretch",
+        column_order=["cnpj_real", "razao_social", "Cidade/UF"] + detail_columns,
+        column_config={
+            "cnpj_real": st.column_config.TextColumn("CNPJ", width="medium"),
+            "razao_social": st.column_config.TextColumn("Razão Social / Nome Empresarial", width="large"),
+            "Cidade/UF": st.column_config.TextColumn("Localização", width="medium"),
+            "Endereço": st.column_config.TextColumn("Endereço Completo", width="large"),
+            "Contato": st.column_config.TextColumn("Contatos", width="medium"),
+        },
+        hide_index=True
+    )
+
+def _market_vitality(db: CNPJDatabase, filters: dict):
+    st.subheader("Vitalidade do Setor (Fluxo & Atratividade)")
+    st.caption("Monitoramento de **Novas Entradas** como indicador antecedente de aquecimento (Leading Indicator).")
+
+    # 1. Fetch Company Trend (Micro)
+    with st.spinner("Carregando aberturas e baixas..."):
+        df_trend = get_dataset(db, 'trend', filters)
+
+        df_close = get_dataset(db, 'closings', filters)
+
+    # Seasonally adjusted openings and closings (batch decomposition) when the filters match its keys
+    if seasonal_flows_compatible(filters) and st.checkbox(
+        "Série dessazonalizada", value=False, key="seasonal_market", help=TOOLTIPS["seasonal_adjusted"]
+    ):
+        df_sa_open = get_adjusted_flows(db, 'abertura_ativa' if filters.get('only_active') else 'abertura', filters)
+        df_sa_close = get_adjusted_flows(db, 'baixa', filters)
+        if df_sa_open.empty or df_sa_close.empty:
+            st.caption("⚠️ Série dessazonalizada indisponível (execute scripts/build_seasonal_flows.py).")
+        else:
+            df_trend, df_close = df_sa_open, df_sa_close
+            st.caption("Aberturas e baixas com ajuste sazonal (decomposição aditiva clássica, pré-calculada).")
+
+    # 2. Fetch IBGE Data (Macro)
+    df_ibge = fetch_industry_data()
+
+    has_correlation = False
+
+    if not df_trend.empty and not df_ibge.empty:
+        # Prepare Micro Data
+        df_micro = df_trend.copy()
+        df_micro['date'] = pd.to_datetime(df_micro['month_year'], format='%Y%m')
+        df_micro = df_micro.groupby('date')['count'].sum()
+
+        # Prepare Macro Data
+        df_macro_raw = df_ibge[df_ibge['variable'].str.contains('Índice', na=False)].copy()
+        df_macro = df_macro_raw.groupby('date')['value'].mean()
+
+        # Align
+        common_idx = df_micro.index.intersection(df_macro.index).sort_values()
+
+        if len(common_idx) > 6:
+            has_correlation = True
+            df_chart = pd.DataFrame({
+                'date': common_idx,
+                'Novas Empresas': df_micro.loc[common_idx].values,
+                'Indústria (IBGE)': df_macro.loc[common_idx].values
+            })
+
+            # SAFEGUARD: Correlation requires variance
+            try:
+                if df_chart['Novas Empresas'].nunique() <= 1 or df_chart['Indústria (IBGE)'].nunique() <= 1:
+                    corr = 0.0 # No variance -> No correlation
+                else:
+                    corr = df_chart['Novas Empresas'].corr(df_chart['Indústria (IBGE)'])
+                    if pd.isna(corr): corr = 0.0
+            except:
+                corr = 0.0
+
+            if corr > 0.7: insight = "Forte Correlação Positiva"
+            elif corr < -0.7: insight = "Forte Correlação Negativa"
+            elif abs(corr) < 0.3: insight = "Sem Correlação Clara"
+            else: insight = "Correlação Moderada"
+
+            st.metric("Correlação (Abertura vs Produção)", f"{corr:.2f}", insight, help=TOOLTIPS["kpi_correlacao"])
+
+            # Chart
+            df_chart = chart_data(df_chart, ('date', 'Novas Empresas', 'Indústria (IBGE)'),
+                                  x='date', y=('Novas Empresas', 'Indústria (IBGE)'))
+            base = alt.Chart(df_chart).encode(x=alt.X('date:T', axis=alt.Axis(format='%Y'), title=None))
+            line_micro = base.mark_line(color='#ff7f0e').encode(y=alt.Y('Novas Empresas', axis=alt.Axis(titleColor='#ff7f0e')))
+            line_macro = base.mark_line(color='#1f77b4', strokeDash=[5,5]).encode(y=alt.Y('Indústria (IBGE)', axis=alt.Axis(titleColor='#1f77b4')))
+
+            st.altair_chart((line_micro + line_macro).resolve_scale(y='independent'), width="stretch")
+
+    if not has_correlation and not df_trend.empty:
+         # Fallback Trend Only
+         df_fb = chart_data(df_trend, ('month_year', 'count'), x='month_year', y='count')
+         chart_fb = alt.Chart(df_fb).mark_line(point=True, color='#ff7f0e').encode(
+             x=alt.X('month_year:O', title='Mês'),
+             y=alt.Y('count:Q', title='Novas Empresas')
+         )
+         st.altair_chart(chart_fb, width="stretch")
+
+    _render_net_flows(df_trend, df_close)
+    render_lead_lag_section(db, filters)
+
+def _render_net_flows(df_open: pd.DataFrame, df_close: pd.DataFrame):
+    """Openings x closings per month and the balance of the last 12 months (same series as the trend)."""
+    if df_open.empty and df_close.empty:
+        return
+    df_flows = pd.concat([
+        df_open[['month_year', 'count']].assign(flow='Aberturas'),
+        df_close[['month_year', 'count']].assign(flow='Baixas'),
+    ], ignore_index=True)
+    last_months = sorted(df_flows['month_year'].unique())[-12:]
+    recent = df_flows[df_flows['month_year'].isin(last_months)].groupby('flow')['count'].sum()
+    open_l12m, close_l12m = recent.get('Aberturas', 0), recent.get('Baixas', 0)
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Aberturas (12 meses)", format_count(open_l12m))
+    c2.metric("Baixas (12 meses)", format_count(close_l12m))
+    balance = open_l12m - close_l12m
+    c3.metric("Saldo Líquido (12 meses)", ("+" if balance >= 0 else "-") + format_count(abs(balance)), "Aberturas - Baixas")
+
+    df_flows = chart_data(df_flows, ('month_year', 'count', 'flow'), x='month_year', y='count')
+    chart = alt.Chart(df_flows).mark_line().encode(
+        x=alt.X('month_year:O', title='Mês'),
+        y=alt.Y('count:Q', title='Estabelecimentos'),
+        color=alt.Color('flow:N', title=None, scale=alt.Scale(range=['#ff7f0e', '#d62728']),
+                        legend=alt.Legend(orient='bottom')),
+        tooltip=['month_year', 'flow', alt.Tooltip('count:Q', format=',.0f')]
+    )
+    st.altair_chart(chart, width="stretch")
+
+@st.fragment
+def _market_section(section, *args):
+    """Renders one section as a fragment; a failing query only takes down its own section."""
+    try:
+        section(*args)
+    except Exception as e:
+        st.error(f"Erro na análise de mercado: {e}")
+
+def render_market_intelligence_view(db: CNPJDatabase, filters):
+    """
+    Landing Page: Market Structure Analysis (Detailed).
+    """
+    # Dynamic Description
+    summary_text = generate_structural_summary("struct")
+    st.info(summary_text)
+
+    # CSS: Card Style for Metrics
+    st.markdown("""
+    <style>
+    div[data-testid="stMetric"] {
+        background-color: var(--background-color);
+        border: 1px solid rgba(128, 128, 128, 0.2);
+        padding: 15px;
+        border-radius: 8px;
+        box-shadow: 0 1px 2px rgba(0,0,0,0.05);
+    }
+    </style>
+    """, unsafe_allow_html=True)
+
+    # --- SECTION 1: KPIS (Top Row) ---
+    _market_section(_market_kpis, db, filters)
+    st.markdown("---")
+
+    # --- SECTION 1.5: DISTRIBUTION & INTERACTIVITY (Bidirectional) ---
+    st.markdown("##### Distribuição da Base (Clique para Filtrar)")
+    _market_section(_market_geography, db, filters)
+    st.divider() # Visual separation between charts
+    _market_section(_market_sectors, db, filters)
+    st.markdown("---")
+
+    # 4.5 Qualitative Profile (Maturity & Sophistication)
+    st.markdown("### Perfil Qualitativo")
+    st.caption("Análise da maturidade e sofisticação jurídica do mercado.")
+    c_age, c_nature = st.columns(2)
+    with c_age:
+        _market_section(_market_maturity, db, filters)
+    with c_nature:
+        _market_section(_market_legal_nature, db, filters)
+    st.divider()
+
+    # --- SECTION 2: LEADERSHIP (Podium + Chart) ---
+    _market_section(_market_ranking, db, filters)
+    st.markdown("---")
+    st.divider()
+
+    _market_section(_market_companies, db, filters)
+
+    # --- SECTION 6: DYNAMICS (Moved from Strategy Page to enforce Structure -> Flow) ---
+    st.divider()
+    _market_section(_market_vitality, db, filters)
+
+    # Warm the cache for the likely next clicks (top UFs / sectors) while the page is read
+    try:
+        start_prefetch(db, filters, get_dataset(db, 'geo', filters), get_dataset(db, 'sectors', filters), st.session_state)
+    except Exception:
+        pass
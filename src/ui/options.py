@@ -0,0 +1,49 @@
+"""
+Option indexes for the cascading filters, built once per process.
+
+The municipality list (~5,570 rows) is indexed by UF and by name, so narrowing the
+options to the selected states and mapping the selected names back to codes are
+dict lookups instead of DataFrame filters on every rerun. The CNAE cascade reads
+its adjacency lists and pre-sorted labels from the CNAE artifact (src/cnae.py).
+"""
+import streamlit as st
+
+@st.cache_resource(show_spinner=False)
+def municipality_index(_db) -> dict:
+    """
+    names      every municipality name, in the order of get_all_municipios (sorted)
+    by_uf      UF -> names of its municipalities (same order)
+    positions  UF -> positions of its municipalities in `names`
+    codes_of   name -> codes (homonyms in different states share a name)
+    """
+    df = _db.get_all_municipios()
+    if df is None or df.empty:
+        # Not cached: the next rerun tries again
+        raise ValueError("empty municipality list")
+    names = df['descricao'].tolist()
+    index = {"names": names, "by_uf": {}, "positions": {}, "codes_of": {}}
+    for pos, (name, code, uf) in enumerate(zip(names, df['codigo'].tolist(), df['uf'].tolist())):
+        index["by_uf"].setdefault(uf, []).append(name)
+        index["positions"].setdefault(uf, []).append(pos)
+        index["codes_of"].setdefault(name, []).append(code)
+    return index
+
+def get_municipality_index(db):
+    """The index, or None when the list could not be loaded."""
+    try:
+        return municipality_index(db)
+    except Exception:
+        return None
+
+def municipality_options(index: dict, ufs) -> list:
+    """Municipality names of the selected UFs (all of them if none is selected)."""
+    if not ufs:
+        return index["names"]
+    if len(ufs) == 1:
+        return index["by_uf"].get(ufs[0], [])
+    positions = sorted(p for uf in ufs for p in index["positions"].get(uf, []))
+    return [index["names"][p] for p in positions]
+
+def municipality_codes(index: dict, names) -> list:
+    """Codes of the selected municipality names."""
+    return [code for name in names for code in index["codes_of"].get(name, [])]
@@ -0,0 +1,77 @@
+"""
+Speculative prefetch of the market view's likely drill-downs.
+
+A click on a UF bar replaces the UF filter with that state, and a click on a sector
+bar replaces the division filter with that division (clearing group, class and
+subclass). After the page renders, a background thread warms the shared dataset
+cache (datasets.py) for the top UFs and sectors of the current geo and sector
+distributions, within a query and time budget: the top-of-page datasets of every
+candidate first, the most likely click first within each. The drill-down rerun then
+finds its datasets cached.
+"""
+import time
+import threading
+from .datasets import dependency_key, warm_dataset, DATASETS
+
+TOP_UFS = 3
+TOP_SECTORS = 3
+MAX_QUERIES = 24
+MAX_SECONDS = 30.0
+WARM_TTL = 3600  # ttl of the shared dataset cache
+
+# Visible first: a drill-down that runs out of budget still has its top of page warm
+WARM_ORDER = ["metrics", "metrics_hq", "sectors", "geo", "maturity", "legal_nature", "ranking", "companies", "trend", "closings"]
+
+_warmed = {}  # (dataset, method, key) -> time it was warmed
+_lock = threading.Lock()
+
+def drilldown_candidates(filters: dict, df_geo, df_sectors) -> list:
+    """Next filter states of a UF or sector click, ordered by the share of the clicked bar."""
+    candidates = []
+    if df_geo is not None and not df_geo.empty:
+        for row in df_geo.head(TOP_UFS).itertuples():
+            if list(filters.get('ufs') or []) != [row.uf]:
+                candidates.append((row.count, {**filters, 'ufs': [row.uf]}))
+    if df_sectors is not None and not df_sectors.empty:
+        for row in df_sectors.head(TOP_SECTORS).itertuples():
+            if list(filters.get('sectors') or []) != [row.sector_code]:
+                candidates.append((row.count, {**filters, 'sectors': [row.sector_code],
+                                               'groups': [], 'classes': [], 'cnaes': []}))
+    return [f for _, f in sorted(candidates, key=lambda c: -c[0])]
+
+def _run(db, candidates: list):
+    t0, queries = time.time(), 0
+    # Expired keys go first: the dict lives as long as the server process
+    with _lock:
+        for key in [k for k, warmed in _warmed.items() if t0 - warmed >= WARM_TTL]:
+            del _warmed[key]
+    for name in WARM_ORDER:
+        for filters in candidates:
+            key = (name, DATASETS[name][0], dependency_key(name, filters))
+            if queries >= MAX_QUERIES or time.time() - t0 > MAX_SECONDS:
+                return
+            with _lock:
+                if time.time() - _warmed.get(key, 0) < WARM_TTL:
+                    continue
+                _warmed[key] = time.time()
+            try:
+                warm_dataset(db, name, filters)
+            except Exception:
+                with _lock:
+                    _warmed.pop(key, None)
+            queries += 1
+
+def start_prefetch(db, filters: dict, df_geo, df_sectors, state: dict):
+    """
+    Starts the background warm-up unless the previous one of this session is still
+    running (`state` is the session's st.session_state).
+    """
+    previous = state.get('_prefetch_thread')
+    if previous is not None and previous.is_alive():
+        return
+    candidates = drilldown_candidates(filters, df_geo, df_sectors)
+    if not candidates:
+        return
+    thread = threading.Thread(target=_run, args=(db, candidates), daemon=True, name="market-prefetch")
+    state['_prefetch_thread'] = thread
+    thread.start()
@@ -0,0 +1,125 @@
+"""
+Display columns of the company listing, built column-wise.
+
+Listings run to thousands of rows (unbounded searches), so no column is built with a
+per-row DataFrame.apply: text columns are concatenated as whole Series, and the
+columns derived from codes (status, opening date, CNAE subclass, typology) evaluate their
+function once per distinct code and map the results back through the factorized
+codes (a few dozen distinct values per listing).
+"""
+import numpy as np
+import pandas as pd
+from ..utils import get_status_description, format_cnae
+from ..classification import get_industrial_typology
+
+PORTE_LABELS = {'00': 'N/D', '01': 'Micro', '03': 'Pequeno', '05': 'Médio/Gd'}
+TYPE_LABELS = {'1': 'MATRIZ', '2': 'FILIAL'}
+_DECIMAL_SWAP = str.maketrans({',': '.', '.': ','})  # 1,234.50 -> 1.234,50
+
+def by_unique(values: pd.Series, fn) -> np.ndarray:
+    """fn applied once per distinct value (nulls included), expanded back to every row."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    lookup = np.empty(len(uniques), dtype=object)
+    for i, value in enumerate(uniques):
+        lookup[i] = fn(value)
+    return lookup[codes]
+
+def _text(df: pd.DataFrame, column: str) -> pd.Series:
+    # Nulls and missing columns read as empty text
+    if column not in df.columns:
+        return pd.Series('', index=df.index)
+    return df[column].fillna('').astype(str)
+
+def _join(parts, sep: str) -> pd.Series:
+    """Row-wise sep.join of the non-empty parts."""
+    out = parts[0]
+    for part in parts[1:]:
+        out = out + np.where((out != '') & (part != ''), sep, '') + part
+    return out
+
+def _suffix(text: pd.Series, prefix: str, suffix: str = '') -> np.ndarray:
+    return np.where(text != '', prefix + text + suffix, '')
+
+def _plain(df: pd.DataFrame) -> pd.DataFrame:
+    # Shared datasets hold categorical / Arrow string columns (memory.compact); the
+    # shaping below concatenates and fills them as Python objects, nulls as None
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            values = df[col].astype(object)
+            df[col] = values.where(values.notna(), None)
+    return df
+
+def format_capital(values: pd.Series) -> pd.Series:
+    """'R$ 1.234.567,89' (Brazilian separators) for every value."""
+    return 'R$ ' + values.map('{:,.2f}'.format).str.translate(_DECIMAL_SWAP)
+
+def format_address(df: pd.DataFrame) -> pd.Series:
+    street = _join([_text(df, 'tipo_logradouro'), _text(df, 'logradouro'), _text(df, 'numero')], ' ').str.strip()
+    addr = (street + _suffix(_text(df, 'complemento'), ' (', ')') + _suffix(_text(df, 'bairro'), ' - ')
+            + _suffix(_text(df, 'cep'), ', CEP ')).str.strip()
+    return addr.replace('', '-')
+
+def format_contact(df: pd.DataFrame) -> pd.Series:
+    email = _text(df, 'correio_eletronico').str.lower()
+    tel = _text(df, 'telefone_1').str.strip()
+    phone = pd.Series(np.where(tel != '', '(' + _text(df, 'ddd_1').str.strip() + ') ' + tel, ''), index=df.index)
+    return _join([email, phone], ' | ').replace('', '-')
+
+def format_company_table(df_companies: pd.DataFrame) -> pd.DataFrame:
+    """Display columns of the company listing (CNPJ, labels, address, contact, typology)."""
+    df_disp = _plain(df_companies)
+
+    # Format CNPJ
+    if 'cnpj_ordem' in df_disp.columns and 'cnpj_dv' in df_disp.columns:
+        df_disp['cnpj_basico'] = df_disp['cnpj_basico'].astype(str).str.zfill(8)
+        df_disp['cnpj_ordem'] = df_disp['cnpj_ordem'].astype(str).str.zfill(4)
+        df_disp['cnpj_dv'] = df_disp['cnpj_dv'].astype(str).str.zfill(2)
+        df_disp['cnpj_real'] = df_disp['cnpj_basico'].str[:2] + "." + df_disp['cnpj_basico'].str[2:5] + "." + df_disp['cnpj_basico'].str[5:] + "/" + df_disp['cnpj_ordem'] + "-" + df_disp['cnpj_dv']
+    else:
+        df_disp['cnpj_real'] = df_disp['cnpj_basico']
+
+    # Labels from codes (unknown codes are shown as they are)
+    if 'porte_empresa' in df_disp.columns:
+        porte = df_disp['porte_empresa'].fillna('00').astype(str)
+        df_disp['Porte'] = porte.map(PORTE_LABELS).fillna(porte)
+    else: df_disp['Porte'] = '-'
+
+    if 'situacao_cadastral' in df_disp.columns:
+        df_disp['Status'] = by_unique(df_disp['situacao_cadastral'], get_status_description)
+    else: df_disp['Status'] = '-'
+
+    if 'identificador_matriz_filial' in df_disp.columns:
+        df_disp['tipo_label'] = df_disp['identificador_matriz_filial'].map(TYPE_LABELS).fillna('?')
+    else: df_disp['tipo_label'] = '-'
+
+    df_disp['Capital (R$)'] = format_capital(df_disp['capital_social'])
+
+    # Descriptions (Safe Get)
+    if 'cnae_desc' not in df_disp.columns: df_disp['cnae_desc'] = df_disp.get('cnae_fiscal_principal', '-')
+    if 'natureza_desc' not in df_disp.columns: df_disp['natureza_desc'] = df_disp.get('natureza_juridica', '-')
+
+    if 'data_inicio_atividade' in df_disp.columns:
+        # Parsed and formatted once per distinct date
+        codes, uniques = pd.factorize(df_disp['data_inicio_atividade'], use_na_sentinel=False)
+        dates = pd.to_datetime(pd.Series(uniques, dtype=object), errors='coerce').dt.strftime('%d/%m/%Y')
+        df_disp['Data Abertura'] = dates.to_numpy(dtype=object)[codes]
+    else: df_disp['Data Abertura'] = '-'
+
+    df_disp['Endereço'] = format_address(df_disp)
+    df_disp['Cidade/UF'] = df_disp['municipio_nome'] + "/" + df_disp['uf']
+    df_disp['Contato'] = format_contact(df_disp)
+
+    if 'cnae_fiscal_principal' in df_disp.columns:
+        cnae_codes = df_disp['cnae_fiscal_principal']
+        df_disp['Subclasse'] = by_unique(cnae_codes, format_cnae) + " - " + df_disp['cnae_desc'].astype(str)
+        # Typology (Level 1): one lookup array per field, indexed by the factorized CNAE
+        codes, uniques = pd.factorize(cnae_codes.fillna(''), use_na_sentinel=False)
+        typology = [get_industrial_typology(code) for code in uniques]
+        df_disp['Tipo Indústria'] = np.array([t['tipo_industria'] for t in typology], dtype=object)[codes]
+        df_disp['Posição Cadeia'] = np.array([t['cadeia_valor'] for t in typology], dtype=object)[codes]
+    else:
+        df_disp['Subclasse'] = df_disp.get('cnae_desc', '-')
+        df_disp['Tipo Indústria'] = '-'
+        df_disp['Posição Cadeia'] = '-'
+    return df_disp
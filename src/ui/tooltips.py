@@ -158,5 +158,22 @@ TOOLTIPS = {
     \n**ME (Micro):** Até R$ 360 mil.
     \n**EPP (Pequeno Porte):** De R$ 360 mil até R$ 4,8 milhões.
     \n**Demais (Médio/Grande):** Acima de R$ 4,8 milhões (S.A.s e Ltda de grande porte).
+    """,
+    
+    "composite_weight": """
+    **O que mostra:** Como os setores selecionados são combinados no Índice Composto.
+    \n**Estabelecimentos:** Peso proporcional ao número de unidades ativas de cada setor no local.
+    \n**Capital Social:** Peso proporcional ao capital declarado pelas matrizes (proxy de porte produtivo).
+    \n**O que NÃO significa:** Não é o peso oficial do IBGE (valor da transformação industrial), apenas uma aproximação pela base CNPJ.
+    """,
+    "lead_lag": """
+    **O que mostra:** Para cada setor e estado, a correlação entre a variação anual das aberturas de CNPJ e a variação anual da produção física (PIM-PF), deslocando uma série em relação à outra de -12 a +12 meses.
+    \n**Como interpretar:** Uma defasagem positiva com correlação alta indica que as aberturas costumam **antecipar** a produção naquele número de meses.
+    \n**Atenção:** Usa todos os portes selecionados e todas as situações cadastrais (fluxo de entrada); o cálculo é compartilhado e atualizado a cada hora.
+    """,
+    "seasonal_adjusted": """
+    **O que mostra:** Aberturas e baixas sem o efeito sazonal (picos de janeiro e de prazos fiscais), calculadas em lote para cada setor × UF × porte; o saldo líquido usa as duas séries ajustadas.
+    \n**Como interpretar:** Variações que permanecem após o ajuste refletem mudança real no ritmo de entrada, não calendário.
+    \n**Disponível quando:** Os filtros usam apenas Divisão, UF, Porte e Data (sem Grupo/Classe/Subclasse, Município, Capital ou Escopo específico).
     """
 }